@@ -15,10 +15,11 @@ def get_supabase_client() -> Client:
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     try:
-        user = auth_service.supabase.auth.get_user(token)
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return {"user_id": str(user.user.id), "email": user.user.email}
+        return await auth_service.get_current_user(token)
+    except HTTPException as e:
+        if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            raise
+        raise HTTPException(status_code=401, detail="Invalid token")
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
@@ -70,8 +71,7 @@ async def update_profile(user: UserUpdate, current_user: dict = Depends(get_curr
 @router.post("/volunteer/questionnaire")
 async def submit_questionnaire(responses: List[QuestionnaireResponseCreate], current_user: dict = Depends(get_current_user)):
     try:
-        profile = await auth_service.get_profile(current_user["user_id"])
-        if profile["role"] != "volunteer":
+        if current_user["role"] != "volunteer":
             raise HTTPException(status_code=403, detail="Only volunteers can submit questionnaires")
         result = await auth_service.submit_questionnaire(current_user["user_id"], responses)
         return {"message": result}
@@ -81,8 +81,7 @@ async def submit_questionnaire(responses: List[QuestionnaireResponseCreate], cur
 @router.get("/volunteer/questionnaire", response_model=List[QuestionnaireResponseResponse])
 async def get_questionnaire_responses(current_user: dict = Depends(get_current_user)):
     try:
-        profile = await auth_service.get_profile(current_user["user_id"])
-        if profile["role"] != "volunteer":
+        if current_user["role"] != "volunteer":
             raise HTTPException(status_code=403, detail="Only volunteers can view questionnaires")
         responses = await auth_service.get_questionnaire_responses(current_user["user_id"])
         return [QuestionnaireResponseResponse(**response) for response in responses]
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, WebSocket, Depends, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, Depends, WebSocketDisconnect, HTTPException
 from ..services.auth_service import AuthService
 from ..services.chat_service import ChatService
 from fastapi.security import OAuth2PasswordBearer
@@ -11,15 +11,33 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 async def get_current_user(token: str) -> dict:
     try:
-        user = auth_service.supabase.auth.get_user(token)
-        if not user:
-            raise Exception("Invalid token")
-        return {"user_id": str(user.user.id), "email": user.user.email}
-    except Exception as e:
-        raise Exception(f"Authentication failed: {str(e)}")
+        return await auth_service.get_current_user(token)
+    except HTTPException as e:
+        raise Exception(f"Authentication failed: {e.detail}")
+
+async def get_admin_user(token: str = Depends(oauth2_scheme)) -> dict:
+    user = await auth_service.get_current_user(token)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access this endpoint")
+    return user
+
+@router.get("/metrics")
+async def chat_metrics(current_user: dict = Depends(get_admin_user)):
+    return {
+        **chat_service.metrics(),
+        "auth": {"tokens": auth_service.token_verifier.metrics(), "profile_cache": auth_service.profile_cache.metrics()}
+    }
+
+@router.on_event("startup")
+async def start_chat_service():
+    await chat_service.start()
+
+@router.on_event("shutdown")
+async def shutdown_chat_service():
+    await chat_service.close()
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, stream: bool = False):
     await websocket.accept()
     try:
         # Receive JWT token
@@ -27,11 +45,11 @@ async def websocket_endpoint(websocket: WebSocket):
         user = await get_current_user(token)
         
         # Check for existing session
-        session = chat_service.supabase.table("sessions").select("*").eq("user_id", user["user_id"]).order("updated_at", desc=True).limit(1).execute()
-        if session.data:
-            await websocket.send_text(f"Resuming session: {json.dumps(session.data[0]['session_state'])}")
+        session = await chat_service.store.get_latest_session(user["user_id"])
+        if session:
+            await websocket.send_text(f"Resuming session: {json.dumps(session['session_state'])}")
         
-        await chat_service.handle_chat(websocket, user["user_id"], user["email"])
+        await chat_service.handle_chat(websocket, user["user_id"], user["email"], stream=stream)
     except WebSocketDisconnect:
         await websocket.close()
     except Exception as e:
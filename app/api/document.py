@@ -1,32 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from typing import Optional
+import asyncio
 from ..services.auth_service import AuthService
 from ..services.document_service import DocumentService
+from ..services.ingest_jobs import IngestJobQueue
+from ..services.openai_scheduler import get_openai_scheduler
+from ..services.upload_spool import spool_upload
+from ..schemas.document import IngestJobStatus
 from ..schemas.user import UserResponse
 from fastapi.security import OAuth2PasswordBearer
 
 router = APIRouter(prefix="/document", tags=["document"])
 auth_service = AuthService()
 document_service = DocumentService()
+ingest_jobs = IngestJobQueue(document_service)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
-    try:
-        user = auth_service.supabase.auth.get_user(token)
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        profile = await auth_service.get_profile(str(user.user.id))
-        if profile["role"] != "admin":
-            raise HTTPException(status_code=403, detail="Only admins can access this endpoint")
-        return {"user_id": str(user.user.id), "email": user.user.email}
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=str(e))
+    user = await auth_service.get_current_user(token)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access this endpoint")
+    return user
+
+@router.on_event("shutdown")
+async def shutdown():
+    await ingest_jobs.close()
+    await document_service.close()
 
-@router.post("/upload", response_model=dict)
-async def upload_pdf(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+@router.get("/metrics")
+async def document_metrics(current_user: dict = Depends(get_current_user)):
+    return {**ingest_jobs.metrics(), "openai": get_openai_scheduler().metrics()}
+
+@router.post("/upload", response_model=IngestJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def upload_pdf(file: UploadFile = File(...), campaign_id: Optional[str] = Form(None),
+                     current_user: dict = Depends(get_current_user)):
+    """Accept the PDF and queue it for ingest; poll GET /document/jobs/{job_id} for progress."""
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    if campaign_id:
+        try:
+            await document_service.check_campaign(campaign_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
-        if not file.filename.endswith(".pdf"):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-        result = await document_service.upload_pdf(file, current_user["user_id"])
-        return result
+        upload = await spool_upload(file)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return ingest_jobs.submit(upload, file.filename, current_user["user_id"], campaign_id)
+    except asyncio.QueueFull:
+        upload.close()
+        raise HTTPException(status_code=503, detail="Too many uploads queued, try again later")
+
+@router.get("/jobs/{job_id}", response_model=IngestJobStatus)
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
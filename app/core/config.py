@@ -0,0 +1,99 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Authentication
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")  # Project JWT secret; verifies HS256 access tokens locally
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", "")  # e.g. <SUPABASE_URL>/auth/v1/.well-known/jwks.json, for asymmetric signing keys
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE", "authenticated")  # Required "aud" claim
+AUTH_JWT_LEEWAY = float(os.getenv("AUTH_JWT_LEEWAY", "10"))  # Seconds of clock skew tolerated on "exp"
+AUTH_PROFILE_CACHE_TTL = float(os.getenv("AUTH_PROFILE_CACHE_TTL", "60"))  # Seconds a profile (and role) is reused by auth checks
+AUTH_PROFILE_CACHE_SIZE = int(os.getenv("AUTH_PROFILE_CACHE_SIZE", "10000"))  # LRU capacity
+
+# Supabase data access
+DB_THREAD_POOL_SIZE = int(os.getenv("DB_THREAD_POOL_SIZE", "32"))  # Max concurrent blocking PostgREST calls per worker
+CHANGE_CURSOR_LAG = float(os.getenv("CHANGE_CURSOR_LAG", "60"))  # Seconds re-read behind a change cursor; must exceed the longest write transaction
+
+# Write-behind conversation log
+CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", "200"))  # Rows per multi-row insert
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.5"))  # Seconds between time-based flushes
+CONVERSATION_QUEUE_MAX = int(os.getenv("CONVERSATION_QUEUE_MAX", "10000"))  # Rows kept for retry before dropping the oldest
+
+# Handoff classifier (cosine similarity against handoff intent embeddings)
+HANDOFF_SIMILARITY_LOW = float(os.getenv("HANDOFF_SIMILARITY_LOW", "0.80"))  # At or below: not a handoff
+HANDOFF_SIMILARITY_HIGH = float(os.getenv("HANDOFF_SIMILARITY_HIGH", "0.90"))  # At or above: handoff; in between asks the LLM
+
+# Semantic answer cache
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # Min cosine similarity for a cache hit
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))  # LRU capacity
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # Seconds before a cached answer expires
+
+# Shared embedding service
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))  # How long to gather requests into one API call
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "128"))  # Inputs per embeddings API call
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # LRU entries keyed by sha256 of the input
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")  # .npz file to load at startup and save at shutdown; empty disables
+
+# OpenAI rate limits, shared by every embeddings and chat call in the worker
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))  # Requests per minute budget
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))  # Tokens per minute budget (prompt + expected completion)
+OPENAI_BULK_RESERVE = float(os.getenv("OPENAI_BULK_RESERVE", "0.2"))  # Share of each budget bulk calls must leave for interactive ones
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))  # Retries of a call rejected with 429
+OPENAI_RETRY_BASE = float(os.getenv("OPENAI_RETRY_BASE", "0.5"))  # Seconds; backoff doubles per retry, with jitter
+OPENAI_RETRY_MAX = float(os.getenv("OPENAI_RETRY_MAX", "20"))  # Upper bound on a single backoff, in seconds
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "500"))  # Reserved per chat call when max_tokens is unset
+
+# LLM deadlines and hedging
+LLM_ANSWER_SOFT_DEADLINE = float(os.getenv("LLM_ANSWER_SOFT_DEADLINE", "4"))  # Seconds without a token before a streamed reply gets a "still working" frame
+LLM_ANSWER_DEADLINE = float(os.getenv("LLM_ANSWER_DEADLINE", "20"))  # Seconds to the first token (streamed) or full answer before falling back
+LLM_HANDOFF_DEADLINE = float(os.getenv("LLM_HANDOFF_DEADLINE", "3"))  # Seconds for the LLM handoff check; on expiry the message is not a handoff
+LLM_SUMMARY_DEADLINE = float(os.getenv("LLM_SUMMARY_DEADLINE", "30"))  # Seconds per summary fold; on expiry the messages stay pending
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))  # Time-to-first-token percentile after which a duplicate request is sent
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # Samples per stage before hedging starts; 0 disables hedging
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))  # Max share of a stage's calls that may be hedged
+
+# Conversation history
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "10"))  # Recent messages kept in memory per conversation
+SUMMARY_EVERY_N_TURNS = int(os.getenv("SUMMARY_EVERY_N_TURNS", "3"))  # Turns between background summary folds
+
+# Volunteer matching
+VOLUNTEER_TOP_K = int(os.getenv("VOLUNTEER_TOP_K", "5"))  # Candidates checked against the graph per handoff
+VOLUNTEER_MATCH_STRATEGY = os.getenv("VOLUNTEER_MATCH_STRATEGY", "index")  # "index" (in-process) or "pgvector" (match_volunteers RPC)
+VOLUNTEER_INDEX_PAGE_SIZE = int(os.getenv("VOLUNTEER_INDEX_PAGE_SIZE", "1000"))  # Profiles per request when syncing the index
+VOLUNTEER_INDEX_SYNC_INTERVAL = float(os.getenv("VOLUNTEER_INDEX_SYNC_INTERVAL", "30"))  # Seconds between profile change-cursor polls
+
+# Graph read cache
+GRAPH_CACHE_TTL = float(os.getenv("GRAPH_CACHE_TTL", "300"))  # Seconds a cached User->Campaign->Document traversal stays valid
+
+# Retrieval
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))  # Documents passed to the QA prompt
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "8"))  # Candidates taken from each of the vector and BM25 lists before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))  # Reciprocal-rank fusion constant; larger flattens the rank weighting
+LEXICAL_INDEX_PAGE_SIZE = int(os.getenv("LEXICAL_INDEX_PAGE_SIZE", "500"))  # Rows per request when syncing the BM25 index
+LEXICAL_INDEX_SYNC_INTERVAL = float(os.getenv("LEXICAL_INDEX_SYNC_INTERVAL", "30"))  # Seconds between BM25 change-cursor polls
+
+# Local document index
+DOCUMENT_RETRIEVAL_BACKEND = os.getenv("DOCUMENT_RETRIEVAL_BACKEND", "rpc")  # "rpc" (match_campaign_documents) or "local" (in-process mirror)
+DOCUMENT_INDEX_SYNC_INTERVAL = float(os.getenv("DOCUMENT_INDEX_SYNC_INTERVAL", "30"))  # Seconds between change-cursor polls
+DOCUMENT_INDEX_PAGE_SIZE = int(os.getenv("DOCUMENT_INDEX_PAGE_SIZE", "500"))  # Rows per request when syncing the mirror
+DOCUMENT_INDEX_NPROBE = int(os.getenv("DOCUMENT_INDEX_NPROBE", "8"))  # IVF lists scanned per query
+DOCUMENT_INDEX_MIN_IVF_ROWS = int(os.getenv("DOCUMENT_INDEX_MIN_IVF_ROWS", "5000"))  # Below this every row is scanned exactly
+
+# Document ingest
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))  # Tokens per chunk (cl100k_base)
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))  # Tokens shared by consecutive chunks of a page
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))  # Embedding batches in flight per upload
+INGEST_INSERT_BATCH = int(os.getenv("INGEST_INSERT_BATCH", "200"))  # Chunk rows per bulk insert
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))  # Processes extracting PDF text
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))  # Pages per extraction task; larger PDFs are split across workers
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # Bytes read from the request per step while spooling
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))  # Uploads larger than this are rejected
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # Directory for spooled uploads; None uses the system temp dir
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # Upload jobs processed concurrently per app process
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "100"))  # Queued upload jobs before new uploads are refused
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))  # Tries per job before it is marked failed
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "2"))  # Seconds before the first retry; doubles per attempt
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "1000"))  # Finished jobs kept for GET /document/jobs/{id}
@@ -0,0 +1,45 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+
+class LatencyRecorder:
+    """Keeps the most recent latency samples per stage, in milliseconds."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, stage: str, elapsed_ms: float):
+        if stage not in self._samples:
+            self._samples[stage] = deque(maxlen=self.window)
+            self._counts[stage] = 0
+        self._samples[stage].append(elapsed_ms)
+        self._counts[stage] += 1
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def percentile(self, stage: str, q: float) -> float:
+        samples = sorted(self._samples.get(stage, ()))
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self) -> dict:
+        return {
+            stage: {
+                "count": self._counts[stage],
+                "mean_ms": round(sum(samples) / len(samples), 2),
+                "p50_ms": round(self.percentile(stage, 0.5), 2),
+                "p95_ms": round(self.percentile(stage, 0.95), 2),
+                "p99_ms": round(self.percentile(stage, 0.99), 2)
+            }
+            for stage, samples in self._samples.items()
+        }
@@ -0,0 +1,87 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from ..core.config import GRAPH_CACHE_TTL
+from .vector import document_set_version
+
+logger = logging.getLogger(__name__)
+
+class LoadCancelled(Exception):
+    """The request loading a shared entry was cancelled; its waiters load it again."""
+
+class GraphReadCache:
+    """TTL cache for graph traversals keyed by (user_id, campaign_id).
+
+    campaign_id is "*" for lookups across all of a user's campaigns. Concurrent
+    misses for the same key share one query, so a burst of connections at a
+    campaign event runs each traversal once. Empty results are not cached: they
+    mostly mean the user has not joined yet, and joining must take effect at once.
+    """
+
+    def __init__(self, ttl: float = GRAPH_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any, frozenset]] = {}  # key -> (expires, value, campaign ids)
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    async def get_or_load(self, user_id: str, campaign_id: Optional[str],
+                          loader: Callable[[], Awaitable[Any]], campaigns: Callable[[Any], Iterable[str]]) -> Any:
+        key = (user_id, campaign_id or "*")
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.stats["hits"] += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(future)
+            except LoadCancelled:
+                continue  # The leading request went away; this one still wants the answer
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            if value:
+                self._entries[key] = (time.monotonic() + self.ttl, value, frozenset(campaigns(value)))
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_exception(LoadCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate_user(self, user_id: str):
+        """Call after writing or removing any of the user's PARTICIPATES_IN edges."""
+        for key in [k for k in self._entries if k[0] == user_id]:
+            del self._entries[key]
+        self.stats["invalidations"] += 1
+
+    def invalidate_campaign(self, campaign_id: str):
+        for key in [k for k, entry in self._entries.items() if k[1] == campaign_id or campaign_id in entry[2]]:
+            del self._entries[key]
+        self.stats["invalidations"] += 1
+
+    def clear(self, *_):
+        self._entries.clear()
+        self.stats["invalidations"] += 1
+        logger.debug("Graph read cache cleared")
+
+    def metrics(self) -> dict:
+        return {"entries": len(self._entries), **self.stats}
+
+# Campaign links invalidate the campaign's traversals and any change to the document set
+# drops every cached traversal. Membership written outside the app (scripts/update_neo4j.py)
+# cannot reach this cache and shows up after GRAPH_CACHE_TTL, unless the lookup was empty.
+graph_cache = GraphReadCache()
+document_set_version.subscribe(graph_cache.clear)
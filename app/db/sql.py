@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from supabase import Client
+from postgrest.exceptions import APIError
+from ..core.config import DB_THREAD_POOL_SIZE, CONVERSATION_BATCH_SIZE, CONVERSATION_FLUSH_INTERVAL, CONVERSATION_QUEUE_MAX
+
+logger = logging.getLogger(__name__)
+
+# supabase-py only ships a blocking client, so every execute() runs on this bounded pool
+_executor = ThreadPoolExecutor(max_workers=DB_THREAD_POOL_SIZE, thread_name_prefix="supabase")
+
+async def execute(query) -> Any:
+    """Run a PostgREST query builder's blocking execute() off the event loop."""
+    return await run_blocking(query.execute)
+
+async def run_blocking(func, *args) -> Any:
+    """Run any other blocking supabase call (e.g. storage) on the same pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+async def changed_rows(supabase: Client, table: str, columns: str, column: str, cursor: Optional[Tuple[str, str]],
+                       page_size: int, key: str = "chunk_id", lag: float = 0.0) -> AsyncIterator[List[Dict]]:
+    """Pages of rows after `cursor`, a (timestamp, key) keyset over (column, key).
+
+    A now() timestamp is when the writing transaction started, not when it
+    committed, so a row can become visible after a read has passed its
+    timestamp. The first page therefore starts `lag` seconds behind the cursor;
+    rows in that window are read again and must be applied idempotently. Later
+    pages continue strictly after the last row read.
+    """
+    since = None
+    if cursor is not None and lag:
+        since = (datetime.fromisoformat(cursor[0]) - timedelta(seconds=lag)).isoformat()
+        cursor = None
+    while True:
+        query = supabase.table(table).select(columns)
+        if cursor is not None:
+            timestamp, last = cursor
+            query = query.or_(f'{column}.gt."{timestamp}",and({column}.eq."{timestamp}",{key}.gt.{last})')
+        elif since is not None:
+            query = query.gte(column, since)
+        response = await execute(query.order(column).order(key).limit(page_size))
+        if response.data:
+            yield response.data
+        if len(response.data) < page_size:
+            return
+        cursor = (response.data[-1][column], str(response.data[-1][key]))
+
+def is_row_error(error: Exception) -> bool:
+    """True when Postgres rejected the rows themselves (SQLSTATE class 22 or 23), not the request."""
+    return isinstance(error, APIError) and str(error.code or "").startswith(("22", "23"))
+
+def shutdown():
+    _executor.shutdown(wait=True)
+    logger.info("Supabase executor shut down")
+
+class ConversationStore:
+    """Async access to the conversations and sessions tables."""
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+
+    async def start_conversation(self, user_id: str) -> str:
+        response = await execute(self.supabase.table("conversations").insert({
+            "user_id": user_id,
+            "message": "Chat started",
+            "sender": "bot"
+        }))
+        return str(response.data[0]["conversation_id"])
+
+    async def get_recent_messages(self, conversation_id: str, limit: int) -> List[Dict]:
+        """Return the last `limit` messages of a conversation, oldest first."""
+        response = await execute(
+            self.supabase.table("conversations").select("message, sender").eq("conversation_id", conversation_id)
+            .order("created_at", desc=True).limit(limit)
+        )
+        return list(reversed(response.data))
+
+    async def create_session(self, user_id: str, conversation_id: str, session_state: dict):
+        await execute(self.supabase.table("sessions").insert({
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "session_state": session_state
+        }))
+
+    async def update_session(self, conversation_id: str, session_state: dict):
+        await execute(self.supabase.table("sessions").update({
+            "session_state": session_state,
+            "updated_at": "now()"
+        }).eq("conversation_id", conversation_id))
+
+    async def get_latest_session(self, user_id: str) -> Optional[Dict]:
+        response = await execute(
+            self.supabase.table("sessions").select("*").eq("user_id", user_id).order("updated_at", desc=True).limit(1)
+        )
+        return response.data[0] if response.data else None
+
+class ConversationLogWriter:
+    """Write-behind buffer for conversation rows, flushed as multi-row inserts.
+
+    Rows are stamped with created_at when enqueued so ordering survives batching.
+    A flush happens when the buffer reaches batch_size or every flush_interval seconds.
+    A batch the database rejects because of its rows (a constraint or data error)
+    is split in halves until the rows that fail on their own are found; those are
+    logged and dropped. Any other failure keeps the rows queued for the next flush.
+    """
+
+    def __init__(self, supabase: Client, batch_size: int = CONVERSATION_BATCH_SIZE,
+                 flush_interval: float = CONVERSATION_FLUSH_INTERVAL, max_queue: int = CONVERSATION_QUEUE_MAX):
+        self.supabase = supabase
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._buffer: List[Dict] = []
+        self._lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failed_batches": 0, "dropped": 0,
+                      "rejected": 0}
+
+    def enqueue(self, user_id: str, conversation_id: str, message: str, sender: str):
+        self._buffer.append({
+            "user_id": user_id,
+            "message": message,
+            "sender": sender,
+            "conversation_id": conversation_id,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+        self.stats["enqueued"] += 1
+        if len(self._buffer) > self.max_queue:
+            overflow = len(self._buffer) - self.max_queue
+            del self._buffer[:overflow]
+            self.stats["dropped"] += overflow
+            logger.warning(f"Conversation log queue full, dropped {overflow} oldest rows")
+        self._ensure_task()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                unwritten = await self._write(batch)
+                if unwritten:
+                    # Put the rows back in front and retry on the next flush
+                    self._buffer[:0] = unwritten
+                    break
+
+    async def _write(self, batch: List[Dict]) -> List[Dict]:
+        """Insert the batch, splitting it around rejected rows; returns the rows left unwritten by a failure."""
+        parts = [batch]  # Stack of row runs still to insert, the earliest last
+        while parts:
+            rows = parts.pop()
+            try:
+                await self._insert(rows)
+                logger.debug(f"Flushed {len(rows)} conversation rows")
+                continue
+            except Exception as e:
+                if not is_row_error(e):
+                    self.stats["failed_batches"] += 1
+                    logger.error(f"Failed to flush {len(rows)} conversation rows: {str(e)}", exc_info=True)
+                    return rows + [row for part in reversed(parts) for row in part]
+                if len(rows) == 1:
+                    self._reject(rows, e)
+                    continue
+            middle = len(rows) // 2
+            parts += [rows[middle:], rows[:middle]]
+        return []
+
+    async def _insert(self, rows: List[Dict]):
+        await execute(self.supabase.table("conversations").insert(rows))
+        self.stats["flushed"] += len(rows)
+        self.stats["batches"] += 1
+
+    def _reject(self, rows: List[Dict], error: Exception):
+        self.stats["rejected"] += len(rows)
+        for row in rows:
+            logger.error(f"Dropped conversation row that cannot be written ({error.code}): conversation "
+                         f"{row['conversation_id']}, {row['sender']} at {row['created_at']}: {row['message']!r:.200}")
+
+    async def close(self):
+        task, self._task = self._task, None
+        if task is not None:
+            # Cancel only while holding the lock so an in-flight batch is never interrupted
+            async with self._lock:
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._buffer:
+            logger.error(f"{len(self._buffer)} conversation rows could not be written at shutdown")
+
+    def metrics(self) -> dict:
+        return {"queue_depth": len(self._buffer), **self.stats}
@@ -0,0 +1,76 @@
+import logging
+from typing import Callable, List
+from supabase import Client
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from .sql import execute
+from ..core.config import RETRIEVAL_K
+
+logger = logging.getLogger(__name__)
+
+class DocumentSetVersion:
+    """Process-wide counter bumped whenever the corpus changes, by a local ingest or an index sync."""
+
+    def __init__(self):
+        self.value = 0
+        self._listeners: List[Callable[[int], None]] = []
+
+    def subscribe(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def bump(self) -> int:
+        self.value += 1
+        logger.info(f"Document set version bumped to {self.value}")
+        for listener in self._listeners:
+            listener(self.value)
+        return self.value
+
+document_set_version = DocumentSetVersion()
+
+class CampaignDocumentRetriever(BaseRetriever):
+    """Vector search restricted to the documents reachable from the user's campaigns.
+
+    The campaign and document filters are pushed into the match_campaign_documents
+    RPC (scripts/sql/match_campaign_documents.sql) instead of filtering afterwards.
+    """
+
+    supabase: Client
+    embeddings: Embeddings
+    campaign_ids: List[str]
+    document_ids: List[str]
+    k: int = RETRIEVAL_K
+    include_shared: bool = True
+
+    def _params(self, embedding: List[float]) -> dict:
+        return {
+            "query_embedding": embedding,
+            "match_count": self.k,
+            "filter_campaign_ids": self.campaign_ids,
+            "filter_document_ids": self.document_ids,
+            "include_shared": self.include_shared
+        }
+
+    @staticmethod
+    def _to_documents(rows: List[dict]) -> List[Document]:
+        return [
+            Document(page_content=row.get("content") or "", metadata={
+                "document_id": str(row["document_id"]),
+                "campaign_id": row.get("campaign_id"),
+                "file_name": row.get("file_name"),
+                "chunk_index": row.get("chunk_index"),
+                "page_number": row.get("page_number"),
+                "similarity": row.get("similarity")
+            })
+            for row in rows
+        ]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        response = self.supabase.rpc("match_campaign_documents", self._params(self.embeddings.embed_query(query))).execute()
+        return self._to_documents(response.data)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        embedding = await self.embeddings.aembed_query(query)
+        response = await execute(self.supabase.rpc("match_campaign_documents", self._params(embedding)))
+        return self._to_documents(response.data)
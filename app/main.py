@@ -10,6 +10,9 @@ from app.services.chat_service import ChatService
 from app.services.email_service import EmailService
 from app.api.document import router as document_router
 from app.api.chat import router as chat_router
+from app.db import sql
+from app.services.embedding_service import get_embedding_service
+from app.services.pdf_extract import shutdown_pdf_pool
 import os
 from dotenv import load_dotenv
 import logging
@@ -194,4 +197,10 @@ async def get_questionnaire(current_user: dict = Depends(oauth2_scheme)):
 
 # Include routers for document and chat
 app.include_router(document_router)
-app.include_router(chat_router)
\ No newline at end of file
+app.include_router(chat_router)
+
+@app.on_event("shutdown")
+async def shutdown():
+    get_embedding_service().save()
+    shutdown_pdf_pool()
+    sql.shutdown()
\ No newline at end of file
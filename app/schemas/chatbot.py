@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+
+class StreamFrame(BaseModel):
+    type: Literal["start", "delta", "status", "end"]
+    message_id: str
+    content: Optional[str] = None  # Token for delta, progress note for status, full reply text for end
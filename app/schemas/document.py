@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Literal, Optional
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    file_name: str
+    status: Literal["queued", "running", "retrying", "succeeded", "failed"] = "queued"
+    attempts: int = 0
+    pages_extracted: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_inserted: int = 0
+    chunks_reused: int = 0  # Chunks whose embedding was found by content hash instead of calling the API
+    skipped: bool = False  # The same file was already ingested for this campaign
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
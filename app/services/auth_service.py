@@ -1,12 +1,16 @@
 import os
 from supabase import create_client, Client
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import logging
 from uuid import UUID
 from typing import List
 from ..schemas.user import QuestionnaireResponseCreate, UserCreate, UserUpdate
 from fastapi import HTTPException, status
+from .embedding_service import get_embedding_service
+from .volunteer_index import get_volunteer_index
+from .token_verifier import get_token_verifier
+from .profile_cache import get_profile_cache
+from ..db.sql import execute, run_blocking
 
 # Configure logging
 logging.basicConfig(
@@ -29,22 +33,48 @@ class AuthService:
             raise ValueError("Supabase configuration missing")
         self.supabase: Client = create_client(supabase_url, supabase_key)
         logger.info("Supabase client initialized")
-        self.openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        logger.info("OpenAI client initialized")
+        self.embedding_service = get_embedding_service()
+        logger.info("Embedding service initialized")
+        self.token_verifier = get_token_verifier()
+        self.profile_cache = get_profile_cache()
+        if not self.token_verifier.enabled:
+            logger.warning("SUPABASE_JWT_SECRET and SUPABASE_JWKS_URL not set; tokens are verified by Supabase Auth")
+
+    async def verify_token(self, token: str) -> dict:
+        """user_id and email from a valid access token; checked locally when a JWT secret or JWKS is configured."""
+        if self.token_verifier.enabled:
+            claims = await self.token_verifier.verify(token)
+            return {"user_id": claims["sub"], "email": claims.get("email")}
+        user = await run_blocking(self.supabase.auth.get_user, token)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        return {"user_id": str(user.user.id), "email": user.user.email}
+
+    async def get_cached_profile(self, user_id: str) -> dict:
+        """Profile for auth checks, served from the short-TTL profile cache."""
+        profile = self.profile_cache.get(user_id)
+        if profile is None:
+            profile = await self.get_profile(user_id)
+            self.profile_cache.put(user_id, profile)
+        return profile
 
     async def get_current_user(self, token: str) -> dict:
         """Verify JWT token and return user details."""
         try:
-            user = self.supabase.auth.get_user(token)
-            if not user:
-                logger.error("Invalid or expired token")
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-            logger.debug(f"User authenticated: {user.user.email}, ID: {user.user.id}")
-            profile = await self.get_profile(str(user.user.id))
-            return {"user_id": str(user.user.id), "email": user.user.email, "role": profile["role"]}
+            user = await self.verify_token(token)
+            logger.debug(f"User authenticated: {user['email']}, ID: {user['user_id']}")
         except Exception as e:
             logger.error(f"Token validation failed: {str(e)}", exc_info=True)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+        # The role only ever comes from the profile row; users can edit their own token metadata
+        try:
+            profile = await self.get_cached_profile(user["user_id"])
+        except LookupError as e:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+        except Exception as e:
+            logger.error(f"Profile lookup failed for user_id {user['user_id']}: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Profile lookup unavailable")
+        return {**user, "role": profile["role"]}
 
     async def register_user(self, user: UserCreate) -> dict:
         try:
@@ -107,10 +137,10 @@ class AuthService:
 
     async def get_profile(self, user_id: str) -> dict:
         try:
-            response = self.supabase.table("profiles").select("*").eq("user_id", user_id).execute()
+            response = await execute(self.supabase.table("profiles").select("*").eq("user_id", user_id))
             if not response.data:
                 logger.error(f"Profile not found for user_id: {user_id}")
-                raise Exception("Profile not found")
+                raise LookupError("Profile not found")
             logger.debug(f"Profile retrieved for user_id: {user_id}, Data: {response.data[0]}")
             return response.data[0]
         except Exception as e:
@@ -123,19 +153,18 @@ class AuthService:
             if user.location:
                 update_data["location"] = user.location
             if user.political_standpoint and user.role != "volunteer":
-                embedding = await self.openai.embeddings.create(
-                    input=user.political_standpoint,
-                    model="text-embedding-ada-002"
-                )
-                update_data["political_standpoint"] = embedding.data[0].embedding
+                update_data["political_standpoint"] = await self.embedding_service.embed(user.political_standpoint)
                 logger.debug(f"Generated embedding for political_standpoint: {user.political_standpoint}")
             
             response = self.supabase.table("profiles").update(update_data).eq("user_id", user_id).execute()
+            self.profile_cache.invalidate(user_id)
             if not response.data:
                 logger.error(f"Failed to update profile for user_id: {user_id}")
                 raise Exception("Profile update failed")
             logger.info(f"Profile updated for user_id: {user_id}")
-            return await self.get_profile(user_id)
+            profile = await self.get_profile(user_id)
+            get_volunteer_index().upsert(profile)
+            return profile
         except Exception as e:
             logger.error(f"Failed to update profile for user_id {user_id}: {str(e)}", exc_info=True)
             raise
@@ -154,13 +183,14 @@ class AuthService:
             
             # Generate political standpoint embedding
             combined_answers = " ".join([r.answer for r in responses])
-            embedding = await self.openai.embeddings.create(
-                input=combined_answers,
-                model="text-embedding-ada-002"
-            )
-            self.supabase.table("profiles").update({
-                "political_standpoint": embedding.data[0].embedding
+            embedding = await self.embedding_service.embed(combined_answers)
+            profile_response = self.supabase.table("profiles").update({
+                "political_standpoint": embedding,
+                "updated_at": "now()"
             }).eq("user_id", user_id).execute()
+            self.profile_cache.invalidate(user_id)
+            if profile_response.data:
+                get_volunteer_index().upsert(profile_response.data[0])
             logger.info(f"Questionnaire submitted and embedding updated for user_id: {user_id}")
             return "Questionnaire submitted successfully"
         except Exception as e:
@@ -1,15 +1,35 @@
 import os
 from supabase import create_client, Client
-from neo4j import GraphDatabase
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import SupabaseVectorStore
-from langchain.chains import RetrievalQA
-from langchain_openai import ChatOpenAI
+from neo4j import AsyncGraphDatabase
+from langchain_classic.chains import RetrievalQA
+from langchain_core.callbacks import AsyncCallbackHandler
 from dotenv import load_dotenv
 import logging
-from fastapi import WebSocket
-from typing import List, Dict
+import asyncio
+import time
+from collections import deque
+from uuid import uuid4
+from fastapi import WebSocket, WebSocketDisconnect
+from typing import AsyncIterator, Callable, Deque, List, Dict, Tuple
 from .email_service import EmailService
+from .handoff_classifier import HandoffClassifier, HANDOFF_PROMPT
+from .semantic_cache import SemanticAnswerCache
+from .embedding_service import ServiceEmbeddings, get_embedding_service
+from .openai_scheduler import BACKGROUND, get_openai_scheduler
+from .llm_hedging import HedgedChatOpenAI, get_hedge_policy, with_deadline
+from .conversation_summarizer import ConversationSummarizer
+from .volunteer_index import get_volunteer_index, parse_embedding
+from .hybrid_search import HybridRetriever, get_lexical_index
+from .document_index import LocalDocumentRetriever, get_document_index
+from ..db.sql import ConversationStore, ConversationLogWriter, execute
+from ..db.vector import CampaignDocumentRetriever, document_set_version
+from ..db.neo4j import graph_cache
+from ..core.metrics import LatencyRecorder
+from ..core.config import (
+    HISTORY_WINDOW, VOLUNTEER_TOP_K, VOLUNTEER_MATCH_STRATEGY, HYBRID_FETCH_K, DOCUMENT_RETRIEVAL_BACKEND,
+    LLM_ANSWER_SOFT_DEADLINE, LLM_ANSWER_DEADLINE, LLM_HANDOFF_DEADLINE
+)
+from ..schemas.chatbot import StreamFrame
 import json
 
 # Configure logging
@@ -23,6 +43,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+QA_FALLBACK = "Sorry, I couldn't process your query. Please try again."
+QA_TIMEOUT_FALLBACK = "Sorry, this is taking longer than expected. Please try again in a moment."
+STILL_WORKING = "Still working on your answer..."
+
+class TokenQueueHandler(AsyncCallbackHandler):
+    """Forwards LLM tokens from a chain run to a PendingAnswer."""
+
+    def __init__(self, answer: "PendingAnswer"):
+        self.answer = answer
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if token:
+            self.answer.push(token)
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+def normalize_query(text: str) -> str:
+    """Case, whitespace and trailing punctuation folded, so retyped copies of a question match."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+class PendingAnswer:
+    """A QA chain run that was started before its reply is needed.
+
+    Several readers can share one run: tokens are kept so a late reader replays
+    them before following the live stream. Each reader finishes with exactly one
+    of result(), tokens() or release(); the run is cancelled once none is left.
+    """
+
+    def __init__(self, on_idle: Callable[["PendingAnswer"], None] = None):
+        self.task: asyncio.Task = None
+        self.buffer: List[str] = []
+        self.readers = 1
+        self.on_idle = on_idle
+        self.cached = False
+        self._changed = asyncio.Event()
+
+    def push(self, token: str):
+        self.buffer.append(token)
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def join(self) -> "PendingAnswer":
+        self.readers += 1
+        return self
+
+    def release(self):
+        self.readers -= 1
+        if self.readers > 0:
+            return
+        if self.on_idle is not None:
+            self.on_idle(self)
+        if not self.task.done():
+            self.task.cancel()
+        elif not self.task.cancelled():
+            self.task.exception()  # Mark a failed speculative run as retrieved
+
+    async def result(self) -> str:
+        try:
+            # Shielded: a reader that gives up (e.g. on a deadline) must not cancel the run for the others
+            return await asyncio.shield(self.task)
+        finally:
+            self.release()
+
+    def claim_cache(self) -> bool:
+        """True for the first reader to ask, which stores the shared answer in the cache."""
+        claimed, self.cached = not self.cached, True
+        return claimed
+
+    def succeeded(self) -> bool:
+        return self.task.done() and not self.task.cancelled() and self.task.exception() is None
+
+    async def tokens(self) -> AsyncIterator[str]:
+        """Yield buffered and newly generated tokens until the run completes."""
+        index = 0
+        try:
+            while True:
+                changed = self._changed
+                if index < len(self.buffer):
+                    index += 1
+                    yield self.buffer[index - 1]
+                elif self.task.done():
+                    break
+                else:
+                    await changed.wait()
+            result = await self.task
+            if not index:
+                yield result
+        finally:
+            self.release()
+
 class ChatService:
     def __init__(self):
         load_dotenv()
@@ -37,149 +151,324 @@ class ChatService:
             raise ValueError("Configuration missing")
         
         self.supabase: Client = create_client(supabase_url, supabase_key)
+        self.store = ConversationStore(self.supabase)
+        self.log_writer = ConversationLogWriter(self.supabase)
+        self.windows: Dict[str, Deque[Tuple[str, str]]] = {}  # conversation_id -> recent (sender, message)
         logger.info("Supabase client initialized")
         
-        self.neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        self.neo4j_driver = AsyncGraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
         logger.info("Neo4j driver initialized")
         
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-ada-002", openai_api_key=os.getenv("OPENAI_API_KEY"))
-        self.vector_store = SupabaseVectorStore(
-            client=self.supabase,
-            embedding=self.embeddings,
-            table_name="document_embeddings",
-            query_name="match_documents"
-        )
-        self.llm = ChatOpenAI(model="gpt-4o-mini", openai_api_key=os.getenv("OPENAI_API_KEY"))
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vector_store.as_retriever(search_kwargs={"k": 3})
+        self.embeddings = ServiceEmbeddings(get_embedding_service())
+        self.llm = HedgedChatOpenAI(model="gpt-4o-mini", streaming=True, openai_api_key=os.getenv("OPENAI_API_KEY"),
+                                    stage="answer")
+        self.handoff_llm = self.llm.model_copy(update={"stage": "handoff"})
+        self.hedge = get_hedge_policy()
+        self.handoff_classifier = HandoffClassifier(self.embeddings)
+        self.answer_cache = SemanticAnswerCache()
+        document_set_version.subscribe(self.answer_cache.invalidate)
+        self.latency = LatencyRecorder()
+        # Summary folds are off the reply path, so they queue behind chat and handoff calls
+        self.summarizer = ConversationSummarizer(
+            self.llm.model_copy(update={"priority": BACKGROUND, "stage": "summary"}), latency=self.latency
         )
+        self.volunteer_index = get_volunteer_index()
+        self.lexical_index = get_lexical_index()
+        self.document_index = get_document_index() if DOCUMENT_RETRIEVAL_BACKEND == "local" else None
+        self.inflight: Dict[Tuple, PendingAnswer] = {}  # (normalized query, document set version, scope) -> running answer
+        self.stats = {"speculative_cancelled": 0, "answers_coalesced": 0, "embed_failures": 0}
         self.email_service = EmailService()
         logger.info("LangChain QA chain and email service initialized")
 
-    def close(self):
-        self.neo4j_driver.close()
+    async def start(self):
+        await self.lexical_index.start(self.supabase)
+        if VOLUNTEER_MATCH_STRATEGY == "index":
+            await self.volunteer_index.start(self.supabase)
+        if self.document_index is not None:
+            await self.document_index.start(self.supabase)
+
+    async def close(self):
+        await self.lexical_index.stop()
+        await self.volunteer_index.stop()
+        if self.document_index is not None:
+            await self.document_index.stop()
+        await self.log_writer.close()
+        logger.info("Conversation log flushed")
+        await self.neo4j_driver.close()
         logger.info("Neo4j driver closed")
 
-    def get_user_documents(self, user_id: str) -> List[Dict]:
+    def metrics(self) -> dict:
+        return {
+            "conversation_log": self.log_writer.metrics(),
+            "handoff_classifier": self.handoff_classifier.metrics(),
+            "answer_cache": self.answer_cache.metrics(),
+            "embeddings": self.embeddings.service.metrics(),
+            "openai": get_openai_scheduler().metrics(),
+            "llm_stages": self.hedge.metrics(),
+            "summarizer": self.summarizer.metrics(),
+            "volunteer_index": self.volunteer_index.metrics(),
+            "graph_cache": graph_cache.metrics(),
+            "lexical_index": self.lexical_index.metrics(),
+            "document_index": self.document_index.metrics() if self.document_index is not None else None,
+            "latency": self.latency.summary(),
+            "answers_inflight": len(self.inflight),
+            **self.stats
+        }
+
+    async def get_user_documents(self, user_id: str, campaign_id: str = None) -> List[Dict]:
+        """Documents reachable from the user's campaigns (or one campaign), served from the graph cache."""
         try:
-            with self.neo4j_driver.session() as session:
-                result = session.run("""
-                    MATCH (u:User {user_id: $user_id})-[:PARTICIPATES_IN]->(c:Campaign)-[:CONTAINS_DOCUMENT]->(d:Document)
-                    RETURN d.document_id AS document_id, d.file_name AS file_name
-                """, user_id=user_id)
-                documents = [{"document_id": record["document_id"], "file_name": record["file_name"]} for record in result]
-                logger.debug(f"Retrieved documents for user_id {user_id}: {documents}")
-                return documents
+            return await graph_cache.get_or_load(
+                user_id, campaign_id,
+                lambda: self._load_user_documents(user_id, campaign_id),
+                lambda documents: [doc["campaign_id"] for doc in documents]
+            )
         except Exception as e:
             logger.error(f"Failed to retrieve documents for user_id {user_id}: {str(e)}", exc_info=True)
             raise
 
-    def get_conversation_history(self, user_id: str) -> str:
+    async def _load_user_documents(self, user_id: str, campaign_id: str = None) -> List[Dict]:
+        async with self.neo4j_driver.session() as session:
+            result = await session.run("""
+                MATCH (u:User {user_id: $user_id})-[:PARTICIPATES_IN]->(c:Campaign)-[:CONTAINS_DOCUMENT]->(d:Document)
+                WHERE $campaign_id IS NULL OR c.campaign_id = $campaign_id
+                RETURN c.campaign_id AS campaign_id, d.document_id AS document_id, d.file_name AS file_name
+            """, user_id=user_id, campaign_id=campaign_id)
+            documents = [record.data() async for record in result]
+        logger.debug(f"Retrieved documents for user_id {user_id}: {documents}")
+        return documents
+
+    def remember(self, conversation_id: str, sender: str, message: str):
+        window = self.windows.setdefault(conversation_id, deque(maxlen=HISTORY_WINDOW))
+        window.append((sender, message))
+
+    async def get_conversation_history(self, conversation_id: str) -> str:
         try:
-            response = self.supabase.table("conversations").select("message, sender").eq("user_id", user_id).order("created_at").execute()
-            history = "\n".join([f"{r['sender']}: {r['message']}" for r in response.data[-10:]])  # Last 10 messages
-            logger.debug(f"Conversation history for user_id {user_id}: {history}")
+            window = self.windows.get(conversation_id)
+            if window is None:
+                # Cold start (e.g. after a restart): load only the last HISTORY_WINDOW rows
+                messages = await self.store.get_recent_messages(conversation_id, HISTORY_WINDOW)
+                window = self.windows[conversation_id] = deque(
+                    ((r["sender"], r["message"]) for r in messages), maxlen=HISTORY_WINDOW
+                )
+            history = "\n".join([f"{sender}: {message}" for sender, message in window])
+            logger.debug(f"Conversation history for conversation_id {conversation_id}: {history}")
             return history
         except Exception as e:
-            logger.error(f"Failed to get conversation history for user_id {user_id}: {str(e)}", exc_info=True)
+            logger.error(f"Failed to get conversation history for conversation_id {conversation_id}: {str(e)}", exc_info=True)
             return ""
 
-    async def detect_handoff(self, message: str) -> bool:
+    async def detect_handoff(self, message: str, embedding: List[float] = None) -> bool:
         try:
-            prompt = f"""
-            Determine if the following user message indicates a request for human assistance or handoff.
-            Examples of handoff triggers: "talk to a person", "human help", "escalate", "contact a volunteer".
-            Message: {message}
-            Return "true" if a handoff is requested, "false" otherwise.
-            """
-            response = await self.llm.acall(prompt)
+            decision, tier, score = await self.handoff_classifier.classify(message, embedding)
+            if decision is not None:
+                logger.debug(f"Handoff detection ({tier}, score {score:.3f}) for message '{message}': {decision}")
+                return decision
+            response = await with_deadline(
+                "handoff", self.handoff_llm.ainvoke(HANDOFF_PROMPT.format(message=message)), LLM_HANDOFF_DEADLINE, self.hedge
+            )
             result = response.content.strip().lower() == "true"
-            logger.debug(f"Handoff detection for message '{message}': {result}")
+            logger.debug(f"Handoff detection (llm, score {score:.3f}) for message '{message}': {result}")
             return result
+        except asyncio.TimeoutError:
+            return False
         except Exception as e:
             logger.error(f"Handoff detection failed: {str(e)}", exc_info=True)
             return False
 
-    async def summarize_conversation(self, history: str) -> str:
-        try:
-            prompt = f"""
-            Summarize the following conversation history in 2-3 sentences, focusing on the user's main concerns or questions:
-            {history}
-            """
-            response = await self.llm.acall(prompt)
-            summary = response.content.strip()
-            logger.debug(f"Conversation summary: {summary}")
-            return summary
-        except Exception as e:
-            logger.error(f"Conversation summarization failed: {str(e)}", exc_info=True)
-            return "Unable to summarize conversation."
+    async def find_volunteer_candidates(self, user_id: str, standpoint, strategy: str) -> List[Dict]:
+        """Top VOLUNTEER_TOP_K volunteers by political standpoint similarity, best first."""
+        if strategy == "pgvector":
+            # One kNN query; see scripts/sql/match_volunteers.sql
+            response = await execute(self.supabase.rpc("match_volunteers", {
+                "query_embedding": standpoint,
+                "match_count": VOLUNTEER_TOP_K,
+                "exclude_user_id": user_id
+            }))
+            return response.data
+        await self.volunteer_index.ensure_loaded(self.supabase)
+        return self.volunteer_index.top_k(parse_embedding(standpoint), VOLUNTEER_TOP_K, role="volunteer", exclude=user_id)
 
-    async def match_volunteer(self, user_id: str, user_message: str) -> Dict:
+    async def confirm_volunteer(self, user_id: str, user_location: str, candidates: List[Dict]) -> Dict:
+        """Check all candidates against the graph in one query and return the best one that passes."""
+        async with self.neo4j_driver.session() as session:
+            result = await session.run("""
+                UNWIND $candidates AS candidate
+                MATCH (u:User {user_id: $user_id})-[:LOCATED_IN]->(l:Location {name: $user_location})
+                MATCH (v:User {user_id: candidate.user_id})-[:LOCATED_IN]->(vl:Location {name: candidate.location})
+                MATCH (v)-[:PARTICIPATES_IN]->(c:Campaign)
+                WITH DISTINCT v, candidate
+                RETURN v.user_id AS user_id, v.email AS email
+                ORDER BY candidate.rank
+                LIMIT 1
+            """, user_id=user_id, user_location=user_location, candidates=[
+                {"user_id": str(c["user_id"]), "location": c["location"], "rank": rank} for rank, c in enumerate(candidates)
+            ])
+            return await result.single()
+
+    async def match_volunteer(self, user_id: str, user_message: str, strategy: str = VOLUNTEER_MATCH_STRATEGY) -> Dict:
         try:
             # Get user profile
-            user_profile = self.supabase.table("profiles").select("political_standpoint, location").eq("user_id", user_id).execute().data[0]
-            user_embedding = user_profile["political_standpoint"]
-            user_location = user_profile["location"]
+            user_profile = (await execute(
+                self.supabase.table("profiles").select("political_standpoint, location").eq("user_id", user_id)
+            )).data[0]
+            if not user_profile["political_standpoint"]:
+                logger.warning(f"No political standpoint embedding for user_id {user_id}")
+                return None
 
             # Vector search for similar political standpoint
-            similar_profiles = self.supabase.table("profiles").select("user_id, email, location").neq("user_id", user_id).execute()
-            best_match = None
-            min_distance = float("inf")
-            for profile in similar_profiles.data:
-                if profile["political_standpoint"]:
-                    # Compute cosine distance (simplified, using pgvector directly would be better)
-                    response = self.supabase.rpc("cosine_distance", {
-                        "id": profile["user_id"],
-                        "query_embedding": user_embedding
-                    }).execute()
-                    distance = response.data[0]["distance"]
-                    if distance < min_distance and profile["role"] == "volunteer":
-                        min_distance = distance
-                        best_match = profile
+            with self.latency.measure(f"volunteer_candidates_{strategy}"):
+                candidates = await self.find_volunteer_candidates(user_id, user_profile["political_standpoint"], strategy)
 
             # Neo4j: Check location proximity and campaign participation
-            if best_match:
-                with self.neo4j_driver.session() as session:
-                    result = session.run("""
-                        MATCH (u:User {user_id: $user_id})-[:LOCATED_IN]->(l:Location)
-                        MATCH (v:User {user_id: $volunteer_id})-[:LOCATED_IN]->(vl:Location)
-                        MATCH (v)-[:PARTICIPATES_IN]->(c:Campaign)
-                        WHERE l.name = $user_location AND vl.name = $volunteer_location
-                        RETURN v.user_id AS user_id, v.email AS email
-                    """, user_id=user_id, volunteer_id=best_match["user_id"],
-                        user_location=user_location, volunteer_location=best_match["location"])
-                    match = result.single()
-                    if match:
-                        logger.info(f"Matched volunteer: {match['email']}")
-                        return {"user_id": match["user_id"], "email": match["email"]}
+            if candidates:
+                with self.latency.measure("volunteer_graph_check"):
+                    match = await self.confirm_volunteer(user_id, user_profile["location"], candidates)
+                if match:
+                    logger.info(f"Matched volunteer: {match['email']} ({strategy} strategy)")
+                    return {"user_id": match["user_id"], "email": match["email"]}
             logger.warning(f"No suitable volunteer found for user_id {user_id}")
             return None
         except Exception as e:
             logger.error(f"Volunteer matching failed for user_id {user_id}: {str(e)}", exc_info=True)
             return None
 
-    async def handle_chat(self, websocket: WebSocket, user_id: str, email: str):
+    def build_qa_chain(self, documents: List[Dict]) -> RetrievalQA:
+        """Hybrid QA chain whose retrieval only searches the given campaign documents (plus shared ones)."""
+        scope = {
+            "supabase": self.supabase,
+            "embeddings": self.embeddings,
+            "campaign_ids": sorted({str(doc["campaign_id"]) for doc in documents}),
+            "document_ids": sorted({str(doc["document_id"]) for doc in documents}),
+            "k": HYBRID_FETCH_K
+        }
+        if self.document_index is not None:
+            vector = LocalDocumentRetriever(index=self.document_index, **scope)
+        else:
+            vector = CampaignDocumentRetriever(**scope)
+        retriever = HybridRetriever(vector=vector, lexical=self.lexical_index)
+        return RetrievalQA.from_chain_type(llm=self.llm, chain_type="stuff", retriever=retriever)
+
+    def start_answer(self, qa_chain: RetrievalQA, query: str, key: Tuple = None) -> PendingAnswer:
+        """Start retrieval and generation in the background; tokens are buffered until read.
+
+        Runs are single-flight per key: while one is in progress for the same key,
+        callers join it instead of starting their own retrieval and completion.
+        """
+        shared = self.inflight.get(key) if key is not None else None
+        if shared is not None:
+            self.stats["answers_coalesced"] += 1
+            return shared.join()
+
+        def forget(answer: PendingAnswer):
+            if key is not None and self.inflight.get(key) is answer:
+                del self.inflight[key]
+
+        answer = PendingAnswer(on_idle=forget)
+
+        async def run() -> str:
+            with self.latency.measure("answer"):
+                result = await qa_chain.ainvoke({"query": query}, config={"callbacks": [TokenQueueHandler(answer)]})
+            return result["result"]
+
+        answer.task = asyncio.create_task(run())
+        answer.task.add_done_callback(lambda _: (forget(answer), answer._notify()))
+        if key is not None:
+            self.inflight[key] = answer
+        return answer
+
+    async def handle_handoff(self, user_id: str, conversation_id: str, user_message: str) -> str:
+        # Use the precomputed running summary; fall back to the raw window before the first fold
+        with self.latency.measure("summarize"):
+            summary = self.summarizer.current(conversation_id) or await self.get_conversation_history(conversation_id)
+        with self.latency.measure("match_volunteer"):
+            volunteer = await self.match_volunteer(user_id, user_message)
+        if not volunteer:
+            return "No suitable volunteer found. Please try again later."
+        with self.latency.measure("notify"):
+            await self.email_service.send_notification(
+                volunteer["email"],
+                "Handoff Request",
+                f"A user needs assistance. Summary: {summary}"
+            )
+        return f"Handoff initiated. A volunteer ({volunteer['email']}) has been notified."
+
+    def fallback_answer(self, query_embedding: List[float], version: int, cache_scope: str) -> str:
+        """Reply for an answer that missed its deadline: a cached answer to the same question, stored meanwhile by another request."""
+        if query_embedding is None:
+            return QA_TIMEOUT_FALLBACK
+        cached = self.answer_cache.lookup(query_embedding, version, cache_scope)
+        return cached or QA_TIMEOUT_FALLBACK
+
+    async def send_stream(self, websocket: WebSocket, tokens: AsyncIterator[str], fallback: Callable[[], str] = None,
+                          soft_deadline: float = None, deadline: float = None) -> str:
+        """Send a reply as start/delta/end frames and return the full text.
+
+        Without a first token after `soft_deadline` seconds a status frame is sent;
+        after `deadline` seconds the stream is abandoned and fallback() is sent instead.
+        """
+        message_id = str(uuid4())
+        await websocket.send_json(StreamFrame(type="start", message_id=message_id).model_dump(exclude_none=True))
+        loop = asyncio.get_running_loop()
+        soft_at = loop.time() + soft_deadline if soft_deadline else None
+        deadline_at = loop.time() + deadline if deadline else None
+        iterator = tokens.__aiter__()
+        parts = []
+        try:
+            while True:
+                next_token = asyncio.ensure_future(iterator.__anext__())
+                while not parts:
+                    # Before the first token: wake up for the status frame and for the deadline
+                    wakeups = [at for at in (soft_at, deadline_at) if at is not None]
+                    timeout = max(0.0, min(wakeups) - loop.time()) if wakeups else None
+                    done, _ = await asyncio.wait({next_token}, timeout=timeout)
+                    if done:
+                        break
+                    if deadline_at is not None and loop.time() >= deadline_at:
+                        next_token.cancel()
+                        await asyncio.gather(next_token, return_exceptions=True)
+                        raise asyncio.TimeoutError
+                    soft_at = None
+                    await websocket.send_json(StreamFrame(type="status", message_id=message_id, content=STILL_WORKING).model_dump(exclude_none=True))
+                try:
+                    token = await next_token
+                except StopAsyncIteration:
+                    break
+                parts.append(token)
+                await websocket.send_json(StreamFrame(type="delta", message_id=message_id, content=token).model_dump(exclude_none=True))
+        except WebSocketDisconnect:
+            raise
+        except asyncio.TimeoutError:
+            self.hedge.record_timeout("answer")
+            logger.warning(f"No answer token within {deadline}s, sending fallback")
+            parts.append(fallback() if fallback else QA_TIMEOUT_FALLBACK)
+            await websocket.send_json(StreamFrame(type="delta", message_id=message_id, content=parts[-1]).model_dump(exclude_none=True))
+        except Exception as e:
+            logger.error(f"QA chain failed: {str(e)}", exc_info=True)
+            if not parts:
+                parts.append(QA_FALLBACK)
+                await websocket.send_json(StreamFrame(type="delta", message_id=message_id, content=QA_FALLBACK).model_dump(exclude_none=True))
+        finally:
+            await iterator.aclose()
+        response = "".join(parts)
+        await websocket.send_json(StreamFrame(type="end", message_id=message_id, content=response).model_dump(exclude_none=True))
+        return response
+
+    async def handle_chat(self, websocket: WebSocket, user_id: str, email: str, stream: bool = False):
         try:
             # Initialize session
             session_state = {"last_message": "", "conversation_id": None}
-            conversation_id = self.supabase.table("conversations").insert({
-                "user_id": user_id,
-                "message": "Chat started",
-                "sender": "bot"
-            }).execute().data[0]["conversation_id"]
-            session_state["conversation_id"] = str(conversation_id)
-            self.supabase.table("sessions").insert({
-                "user_id": user_id,
-                "conversation_id": conversation_id,
-                "session_state": session_state
-            }).execute()
+            conversation_id = await self.store.start_conversation(user_id)
+            session_state["conversation_id"] = conversation_id
+            await self.store.create_session(user_id, conversation_id, session_state)
             logger.debug(f"Session initialized for user_id {user_id}, conversation_id {conversation_id}")
 
             # Get user-related documents from Neo4j
-            documents = self.get_user_documents(user_id)
+            documents = await self.get_user_documents(user_id)
             context = f"Related documents: {', '.join([doc['file_name'] for doc in documents])}"
+            cache_scope = ",".join(sorted(str(doc["document_id"]) for doc in documents))
+            await self.lexical_index.ensure_loaded(self.supabase)
+            qa_chain = self.build_qa_chain(documents)
 
             while True:
                 # Receive user message
@@ -188,61 +477,87 @@ class ChatService:
                 session_state["last_message"] = user_message
 
                 # Store user message
-                self.supabase.table("conversations").insert({
-                    "user_id": user_id,
-                    "message": user_message,
-                    "sender": "user",
-                    "conversation_id": conversation_id
-                }).execute()
+                self.log_writer.enqueue(user_id, conversation_id, user_message, "user")
+                self.remember(conversation_id, "user", user_message)
                 logger.debug(f"Stored user message for user_id {user_id}")
 
                 # Update session state
-                self.supabase.table("sessions").update({
-                    "session_state": session_state,
-                    "updated_at": "now()"
-                }).eq("session_id", conversation_id).execute()
-
-                # Check for handoff
-                if await self.detect_handoff(user_message):
-                    history = self.get_conversation_history(user_id)
-                    summary = await self.summarize_conversation(history)
-                    volunteer = await self.match_volunteer(user_id, user_message)
-                    if volunteer:
-                        await self.email_service.send_notification(
-                            volunteer["email"],
-                            "Handoff Request",
-                            f"A user needs assistance. Summary: {summary}"
-                        )
-                        response = f"Handoff initiated. A volunteer ({volunteer['email']}) has been notified."
+                await self.store.update_session(conversation_id, session_state)
+
+                # Serve repeated questions from the semantic cache, otherwise start answering
+                # speculatively while checking for handoff
+                turn_start = time.perf_counter()
+                try:
+                    with self.latency.measure("embed_query"):
+                        query_embedding = await self.embeddings.aembed_query(user_message)
+                except Exception as e:
+                    # Only this turn loses the cache and the similarity handoff check; the answer still runs
+                    logger.error(f"Query embedding failed: {str(e)}", exc_info=True)
+                    self.stats["embed_failures"] += 1
+                    query_embedding = None
+                version = document_set_version.value
+                cached = self.answer_cache.lookup(query_embedding, version, cache_scope) if query_embedding is not None else None
+                # Identical questions over the same documents share one in-flight answer
+                answer_key = (normalize_query(user_message), version, cache_scope)
+                pending = None if cached else self.start_answer(qa_chain, f"{context}\nUser query: {user_message}", answer_key)
+                with self.latency.measure("detect_handoff"):
+                    if query_embedding is not None:
+                        handoff = await self.detect_handoff(user_message, query_embedding)
                     else:
-                        response = "No suitable volunteer found. Please try again later."
+                        handoff = self.handoff_classifier.match_phrase(user_message)
+                if handoff:
+                    if pending:
+                        pending.release()
+                        self.stats["speculative_cancelled"] += 1
+                    with self.latency.measure("handoff"):
+                        response = await self.handle_handoff(user_id, conversation_id, user_message)
+                    if stream:
+                        await self.send_stream(websocket, _single(response))
+                    else:
+                        await websocket.send_text(response)
+                elif cached:
+                    response = cached
+                    if stream:
+                        await self.send_stream(websocket, _single(response))
+                    else:
+                        await websocket.send_text(response)
+                elif stream:
+                    # Run hybrid search, streaming tokens as they are generated
+                    response = await self.send_stream(
+                        websocket, pending.tokens(), lambda: self.fallback_answer(query_embedding, version, cache_scope),
+                        LLM_ANSWER_SOFT_DEADLINE, LLM_ANSWER_DEADLINE
+                    )
+                    if query_embedding is not None and pending.succeeded() and pending.claim_cache():
+                        self.answer_cache.store(query_embedding, response, version, cache_scope)
                 else:
                     # Run hybrid search
                     try:
-                        response = self.qa_chain.run(f"{context}\nUser query: {user_message}")
+                        response = await with_deadline("answer", pending.result(), LLM_ANSWER_DEADLINE, self.hedge)
+                        if query_embedding is not None and pending.claim_cache():
+                            self.answer_cache.store(query_embedding, response, version, cache_scope)
+                    except asyncio.TimeoutError:
+                        response = self.fallback_answer(query_embedding, version, cache_scope)
                     except Exception as e:
                         logger.error(f"QA chain failed: {str(e)}", exc_info=True)
-                        response = "Sorry, I couldn't process your query. Please try again."
-
-                # Send bot response
-                await websocket.send_text(response)
+                        response = QA_FALLBACK
+                    await websocket.send_text(response)
+                self.latency.record("turn", (time.perf_counter() - turn_start) * 1000)
                 logger.debug(f"Sent bot response to {email}: {response}")
 
                 # Store bot response
-                self.supabase.table("conversations").insert({
-                    "user_id": user_id,
-                    "message": response,
-                    "sender": "bot",
-                    "conversation_id": conversation_id
-                }).execute()
+                self.log_writer.enqueue(user_id, conversation_id, response, "bot")
+                self.remember(conversation_id, "bot", response)
+                self.summarizer.add_turn(conversation_id, user_message, response)
                 logger.debug(f"Stored bot response for user_id {user_id}")
 
         except WebSocketDisconnect:
             logger.info(f"WebSocket disconnected for user_id {user_id}")
-            self.supabase.table("sessions").update({
-                "session_state": session_state,
-                "updated_at": "now()"
-            }).eq("session_id", conversation_id).execute()
+            await self.log_writer.flush()
+            await self.store.update_session(conversation_id, session_state)
         except Exception as e:
             logger.error(f"Chat error for user_id {user_id}: {str(e)}", exc_info=True)
-            await websocket.send_json({"error": str(e)})
\ No newline at end of file
+            await websocket.send_json({"error": str(e)})
+        finally:
+            if session_state["conversation_id"]:
+                self.windows.pop(session_state["conversation_id"], None)
+                self.summarizer.discard(session_state["conversation_id"])
\ No newline at end of file
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from langchain_core.language_models import BaseChatModel
+from .llm_hedging import with_deadline
+from ..core.config import SUMMARY_EVERY_N_TURNS, LLM_SUMMARY_DEADLINE
+from ..core.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+Update the running summary of a conversation with the new messages below.
+Keep it to 2-3 sentences, focusing on the user's main concerns or questions.
+Current summary: {summary}
+New messages:
+{messages}
+"""
+
+MAX_PENDING_MESSAGES = 100  # Unfolded messages kept per conversation if folding keeps failing
+
+class ConversationSummarizer:
+    """Keeps a running summary per conversation, folded in the background.
+
+    Every `every_n_turns` turns the messages since the last fold are merged
+    into the summary with one LLM call, off the reply path. current() never
+    calls the LLM: it returns the latest summary plus any messages not folded yet.
+    A fold that misses its deadline is abandoned and its messages stay pending.
+    """
+
+    def __init__(self, llm: BaseChatModel, every_n_turns: int = SUMMARY_EVERY_N_TURNS, latency: Optional[LatencyRecorder] = None,
+                 deadline: float = LLM_SUMMARY_DEADLINE):
+        self.llm = llm
+        self.every_n_turns = every_n_turns
+        self.deadline = deadline
+        self.latency = latency or LatencyRecorder()
+        self._summaries: Dict[str, str] = {}
+        self._pending: Dict[str, Deque[Tuple[int, str, str]]] = {}  # (sequence number, sender, message)
+        self._seq = itertools.count()
+        self._turns: Dict[str, int] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.stats = {"folds": 0, "fold_failures": 0}
+
+    def add_turn(self, conversation_id: str, user_message: str, bot_message: str):
+        pending = self._pending.setdefault(conversation_id, deque(maxlen=MAX_PENDING_MESSAGES))
+        pending.append((next(self._seq), "user", user_message))
+        pending.append((next(self._seq), "bot", bot_message))
+        self._turns[conversation_id] = self._turns.get(conversation_id, 0) + 1
+        task = self._tasks.get(conversation_id)
+        if self._turns[conversation_id] >= self.every_n_turns and (task is None or task.done()):
+            self._turns[conversation_id] = 0
+            self._tasks[conversation_id] = asyncio.create_task(self._fold(conversation_id))
+
+    async def _fold(self, conversation_id: str):
+        pending = self._pending[conversation_id]
+        folded = list(pending)
+        try:
+            with self.latency.measure("summary_fold"):
+                response = await with_deadline("summary", self.llm.ainvoke(SUMMARY_PROMPT.format(
+                    summary=self._summaries.get(conversation_id, "(none yet)"),
+                    messages="\n".join(f"{sender}: {message}" for _, sender, message in folded)
+                )), self.deadline)
+            self._summaries[conversation_id] = response.content.strip()
+            # Messages added while the LLM call was running stay pending for the next fold; they are
+            # told apart by sequence number, as an overflowing deque shifts its front
+            last = folded[-1][0]
+            while pending and pending[0][0] <= last:
+                pending.popleft()
+            self.stats["folds"] += 1
+            logger.debug(f"Folded {len(folded)} messages into summary for conversation_id {conversation_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["fold_failures"] += 1
+            logger.error(f"Summary fold failed for conversation_id {conversation_id}: {str(e)}", exc_info=True)
+
+    def current(self, conversation_id: str) -> str:
+        summary = self._summaries.get(conversation_id, "")
+        pending = self._pending.get(conversation_id)
+        if pending:
+            recent = "\n".join(f"{sender}: {message}" for _, sender, message in pending)
+            summary = f"{summary}\nRecent messages:\n{recent}" if summary else recent
+        return summary
+
+    def discard(self, conversation_id: str):
+        task = self._tasks.pop(conversation_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+        self._summaries.pop(conversation_id, None)
+        self._pending.pop(conversation_id, None)
+        self._turns.pop(conversation_id, None)
+
+    def metrics(self) -> dict:
+        return {"conversations": len(self._pending), **self.stats}
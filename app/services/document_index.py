@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from supabase import Client
+from langchain_core.documents import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from .volunteer_index import parse_embedding
+from ..db.sql import changed_rows
+from ..db.vector import CampaignDocumentRetriever, document_set_version
+from ..core.config import (
+    DOCUMENT_INDEX_SYNC_INTERVAL, DOCUMENT_INDEX_PAGE_SIZE, DOCUMENT_INDEX_NPROBE, DOCUMENT_INDEX_MIN_IVF_ROWS,
+    CHANGE_CURSOR_LAG
+)
+
+logger = logging.getLogger(__name__)
+
+class DocumentIndex:
+    """In-process mirror of document_embeddings with an IVF index over NumPy.
+
+    Small corpora are scanned exactly. Once the mirror reaches min_ivf_rows, rows
+    are clustered with k-means into about sqrt(n) lists and a query only scores
+    the rows in its nprobe closest lists. The mirror follows the table through
+    an (updated_at, chunk_id) cursor and a tombstone table (scripts/sql/document_chunks.sql),
+    re-reading CHANGE_CURSOR_LAG seconds behind each cursor for late commits.
+    """
+
+    def __init__(self, dim: int = 1536, capacity: int = 1024, nprobe: int = DOCUMENT_INDEX_NPROBE,
+                 min_ivf_rows: int = DOCUMENT_INDEX_MIN_IVF_ROWS):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.min_ivf_rows = min_ivf_rows
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._campaigns = np.zeros(capacity, dtype=np.int32)
+        self._documents = np.zeros(capacity, dtype=np.int32)
+        self._lists = np.zeros(capacity, dtype=np.int32)
+        self._ids: List[str] = []  # chunk_id per row
+        self._rows: Dict[str, int] = {}
+        self._versions: Dict[str, Optional[str]] = {}  # chunk_id -> updated_at of the applied row
+        self._meta: List[dict] = []
+        self._campaign_codes: Dict[Optional[str], int] = {None: 0}
+        self._document_codes: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_rows = 0
+        self._cursor: Optional[Tuple[str, str]] = None  # (updated_at, chunk_id) of the last applied row
+        self._deleted_cursor: Optional[Tuple[str, str]] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.stats = {"syncs": 0, "sync_failures": 0, "upserts": 0, "deletes": 0, "trainings": 0}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_matrix", "_campaigns", "_documents", "_lists"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self)] = old[:len(self)]
+            setattr(self, name, new)
+
+    def upsert(self, row: dict) -> bool:
+        """Apply a row; False when this version of it is already applied."""
+        chunk_id = str(row["chunk_id"])
+        if row.get("updated_at") is not None and self._versions.get(chunk_id) == row["updated_at"]:
+            return False
+        vector = parse_embedding(row.get("embedding"))
+        if vector is None:
+            return self.remove(chunk_id)
+        index = self._rows.get(chunk_id)
+        if index is None:
+            index = len(self)
+            self._grow(index + 1)
+            self._rows[chunk_id] = index
+            self._ids.append(chunk_id)
+            self._meta.append({})
+        document_id = str(row["document_id"])
+        self._matrix[index] = vector
+        self._campaigns[index] = self._campaign_codes.setdefault(row.get("campaign_id"), len(self._campaign_codes))
+        self._documents[index] = self._document_codes.setdefault(document_id, len(self._document_codes))
+        self._meta[index] = {
+            "document_id": document_id,
+            "campaign_id": row.get("campaign_id"),
+            "file_name": row.get("file_name"),
+            "chunk_index": row.get("chunk_index"),
+            "page_number": row.get("page_number"),
+            "content": row.get("content")
+        }
+        if self._centroids is not None:
+            self._lists[index] = int(np.argmax(self._centroids @ vector))
+        self._versions[chunk_id] = row.get("updated_at")
+        self.stats["upserts"] += 1
+        return True
+
+    def remove(self, chunk_id: str) -> bool:
+        index = self._rows.pop(str(chunk_id), None)
+        if index is None:
+            return False
+        del self._versions[str(chunk_id)]
+        last = len(self) - 1
+        if index != last:
+            for array in (self._matrix, self._campaigns, self._documents, self._lists):
+                array[index] = array[last]
+            self._ids[index] = self._ids[last]
+            self._meta[index] = self._meta[last]
+            self._rows[self._ids[index]] = index
+        self._ids.pop()
+        self._meta.pop()
+        self.stats["deletes"] += 1
+        return True
+
+    def train(self, iterations: int = 10):
+        """Cluster the current rows into IVF lists with spherical k-means."""
+        n = len(self)
+        data = self._matrix[:n]
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0  # Empty lists keep their previous centroid
+            centroids[filled] = sums[filled] / norms[filled, None]
+        self._centroids = centroids
+        self._lists[:n] = np.argmax(data @ centroids.T, axis=1)
+        self._trained_rows = n
+        self.stats["trainings"] += 1
+        logger.info(f"Document index trained {nlist} IVF lists over {n} rows")
+
+    def _maybe_train(self):
+        n = len(self)
+        if n >= self.min_ivf_rows and (self._centroids is None or n >= 2 * self._trained_rows):
+            self.train()
+        elif n < self.min_ivf_rows:
+            self._centroids = None
+
+    def search(self, query, k: int, campaign_ids: Optional[List[str]] = None, document_ids: Optional[List[str]] = None,
+               include_shared: bool = True, nprobe: Optional[int] = None) -> List[dict]:
+        """Rows shaped like match_campaign_documents results, most similar first."""
+        n = len(self)
+        if n == 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+        if self._centroids is None:
+            candidates = np.arange(n)
+        else:
+            probe = min(nprobe or self.nprobe, self._centroids.shape[0])
+            lists = np.argpartition(-(self._centroids @ query), probe - 1)[:probe]
+            candidates = np.flatnonzero(np.isin(self._lists[:n], lists))
+        if campaign_ids is not None:
+            campaigns = [self._campaign_codes[c] for c in campaign_ids if c in self._campaign_codes]
+            documents = [self._document_codes[d] for d in (document_ids or []) if d in self._document_codes]
+            allowed = np.isin(self._campaigns[:n], campaigns) & np.isin(self._documents[:n], documents)
+            if include_shared:
+                allowed |= self._campaigns[:n] == 0
+            candidates = candidates[allowed[candidates]]
+        if len(candidates) == 0:
+            return []
+        scores = self._matrix[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"chunk_id": self._ids[candidates[i]], **self._meta[candidates[i]], "similarity": float(scores[i])}
+            for i in top
+        ]
+
+    async def sync(self, supabase: Client) -> int:
+        """Apply rows changed and deleted since the last sync; returns the number of changes."""
+        async with self._lock:
+            changes = 0
+            async for rows in changed_rows(
+                supabase, "document_embeddings",
+                "chunk_id, document_id, campaign_id, file_name, chunk_index, page_number, content, embedding, updated_at",
+                "updated_at", self._cursor, DOCUMENT_INDEX_PAGE_SIZE, lag=CHANGE_CURSOR_LAG
+            ):
+                changes += sum(self.upsert(row) for row in rows)
+                self._cursor = (rows[-1]["updated_at"], str(rows[-1]["chunk_id"]))
+            async for rows in changed_rows(supabase, "document_embeddings_deleted", "chunk_id, deleted_at", "deleted_at",
+                                           self._deleted_cursor, DOCUMENT_INDEX_PAGE_SIZE, lag=CHANGE_CURSOR_LAG):
+                changes += sum(self.remove(row["chunk_id"]) for row in rows)
+                self._deleted_cursor = (rows[-1]["deleted_at"], str(rows[-1]["chunk_id"]))
+            if changes:
+                # Answers and graph lookups cached against the old rows are now stale
+                document_set_version.bump()
+            self._maybe_train()
+            self.loaded = True
+            self.stats["syncs"] += 1
+            return changes
+
+    async def start(self, supabase: Client, interval: float = DOCUMENT_INDEX_SYNC_INTERVAL):
+        """Load the mirror, then keep following the change cursor in the background."""
+        await self.sync(supabase)
+        logger.info(f"Document index loaded with {len(self)} rows")
+        if self._task is None:
+            self._task = asyncio.create_task(self._follow(supabase, interval))
+
+    async def _follow(self, supabase: Client, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changes = await self.sync(supabase)
+                if changes:
+                    logger.debug(f"Document index applied {changes} changes")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["sync_failures"] += 1
+                logger.error(f"Document index sync failed: {str(e)}", exc_info=True)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "rows": len(self),
+            "ivf_lists": 0 if self._centroids is None else self._centroids.shape[0],
+            "nprobe": self.nprobe,
+            "cursor": self._cursor[0] if self._cursor else None,
+            "loaded": self.loaded,
+            **self.stats
+        }
+
+class LocalDocumentRetriever(CampaignDocumentRetriever):
+    """CampaignDocumentRetriever answered from the in-process DocumentIndex, with no database round trip."""
+
+    index: DocumentIndex
+
+    def _search(self, embedding: List[float]) -> List[Document]:
+        return self._to_documents(self.index.search(
+            embedding, self.k, self.campaign_ids, self.document_ids, self.include_shared
+        ))
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._search(self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return self._search(await self.embeddings.aembed_query(query))
+
+_document_index: Optional[DocumentIndex] = None
+
+def get_document_index() -> DocumentIndex:
+    global _document_index
+    if _document_index is None:
+        _document_index = DocumentIndex()
+    return _document_index
@@ -1,11 +1,26 @@
 import os
 from supabase import create_client, Client
-from openai import OpenAI
+from neo4j import AsyncGraphDatabase
 from dotenv import load_dotenv
 import logging
-import PyPDF2
-from io import BytesIO
+import asyncio
+from uuid import uuid4
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 from fastapi import UploadFile
+from ..db.vector import document_set_version
+from ..db.sql import execute, run_blocking
+from ..db.neo4j import graph_cache
+from ..schemas.document import IngestJobStatus
+from .embedding_service import get_embedding_service
+from .hybrid_search import get_lexical_index
+from .document_index import get_document_index
+from .pdf_extract import extract_pages
+from .upload_spool import SpooledUpload, spool_upload
+from .ingest import (
+    chunk_pages, chunk_hash, find_embeddings, embed_chunks, insert_chunks, delete_chunks_from, mark_complete, chunk_rows
+)
+from ..core.config import DOCUMENT_RETRIEVAL_BACKEND
 
 # Configure logging
 logging.basicConfig(
@@ -28,50 +43,191 @@ class DocumentService:
             raise ValueError("Supabase configuration missing")
         self.supabase: Client = create_client(supabase_url, supabase_key)
         logger.info("Supabase client initialized")
-        self.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        logger.info("OpenAI client initialized")
+        self.embedding_service = get_embedding_service()
+        logger.info("Embedding service initialized")
+        self.lexical_index = get_lexical_index()
+        neo4j_uri = os.getenv("NEO4J_URI")
+        self.neo4j_driver = None
+        if neo4j_uri:
+            self.neo4j_driver = AsyncGraphDatabase.driver(neo4j_uri, auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+            logger.info("Neo4j driver initialized")
+
+    async def close(self):
+        if self.neo4j_driver is not None:
+            await self.neo4j_driver.close()
+            logger.info("Neo4j driver closed")
+
+    async def check_campaign(self, campaign_id: str):
+        """Raise ValueError unless the campaign exists; chunks of an unlinked campaign document are unreachable."""
+        if self.neo4j_driver is None:
+            raise ValueError(f"Neo4j not configured; cannot ingest into campaign {campaign_id}")
+        async with self.neo4j_driver.session() as session:
+            result = await session.run("MATCH (c:Campaign {campaign_id: $campaign_id}) RETURN count(c) AS found",
+                                       campaign_id=campaign_id)
+            record = await result.single()
+        if not record["found"]:
+            raise ValueError(f"Campaign {campaign_id} not found")
+
+    async def link_to_campaign(self, document_id: str, file_name: str, campaign_id: str):
+        """Attach the document to its campaign so campaign members' retrieval can reach it."""
+        if self.neo4j_driver is None:
+            raise ValueError(f"Neo4j not configured; document {document_id} not linked to campaign {campaign_id}")
+        async with self.neo4j_driver.session() as session:
+            result = await session.run("""
+                MATCH (c:Campaign {campaign_id: $campaign_id})
+                MERGE (d:Document {document_id: $document_id})
+                SET d.file_name = $file_name
+                MERGE (c)-[:CONTAINS_DOCUMENT]->(d)
+                RETURN d.document_id AS document_id
+            """, campaign_id=campaign_id, document_id=document_id, file_name=file_name)
+            record = await result.single()
+        if record is None:
+            raise ValueError(f"Campaign {campaign_id} not found")
+        # Members' cached traversals of this campaign don't include the document yet
+        graph_cache.invalidate_campaign(campaign_id)
+        logger.info(f"Linked document {document_id} to campaign {campaign_id}")
+
+    async def find_document(self, campaign_id: Optional[str], **match) -> Optional[dict]:
+        """First chunk of a stored document in the campaign (or shared) matching the given columns.
+
+        file_sha256 is only set on chunk 0 of a completely stored document (see mark_complete),
+        so matching on it never returns a document left half-written by a failed ingest.
+        """
+        query = self.supabase.table("document_embeddings").select("document_id, file_sha256").eq("chunk_index", 0)
+        for column, value in match.items():
+            query = query.eq(column, value)
+        query = query.eq("campaign_id", campaign_id) if campaign_id else query.is_("campaign_id", "null")
+        response = await execute(query.limit(1))
+        return response.data[0] if response.data else None
+
+    async def check_existing(self, sha256: str, file_name: str, campaign_id: Optional[str]) -> Tuple[Optional[dict], Optional[dict]]:
+        """(document with these exact bytes, earlier revision with this file name) in the campaign, or shared."""
+        existing = await self.find_document(campaign_id, file_sha256=sha256)
+        previous = None if existing else await self.find_document(campaign_id, file_name=file_name)
+        return existing, previous
+
+    async def reuse(self, existing: dict, file_name: str, sha256: str, campaign_id: Optional[str]) -> dict:
+        if campaign_id:
+            await self.link_to_campaign(existing["document_id"], file_name, campaign_id)
+        logger.info(f"{file_name} (sha256 {sha256}) already ingested as document {existing['document_id']}")
+        return {
+            "document_id": existing["document_id"],
+            "file_name": file_name,
+            "sha256": sha256,
+            "chunks": 0,
+            "message": "PDF already uploaded"
+        }
+
+    async def embed_new_chunks(self, chunks: List[dict], progress: IngestJobStatus) -> List[List[float]]:
+        """Embeddings for the chunks; only text that has never been embedded goes to the API."""
+        hashes = [chunk_hash(chunk["content"]) for chunk in chunks]
+        known = await find_embeddings(self.supabase, hashes)
+        missing = [chunk for chunk, digest in zip(chunks, hashes) if digest not in known]
+        progress.chunks_reused = len(chunks) - len(missing)
+
+        def embedded(count: int):
+            progress.chunks_embedded += count
+
+        fresh = iter(await embed_chunks(self.embedding_service, missing, on_progress=embedded))
+        return [known[digest] if digest in known else next(fresh) for digest in hashes]
+
+    async def store(self, path: str, sha256: str, document_id: str, chunks: List[dict], embeddings: List[List[float]],
+                    file_name: str, user_id: str, campaign_id: Optional[str], replace: bool,
+                    progress: IngestJobStatus, update_indexes: bool = True) -> int:
+        """Upload the file, write the chunk rows and update the in-process indexes; returns rows stored.
+
+        Processes that never search (e.g. scripts/bulk_ingest.py) pass update_indexes=False;
+        the server's indexes pick the rows up through the change cursor.
+        """
+        # Upload to Supabase Storage under the content hash, so equal files share one object and
+        # different files with the same name never collide; the client streams the file from its path
+        storage_path = f"pdfs/{sha256}.pdf"
+        await run_blocking(self.supabase.storage.from_("pdfs").upload, storage_path, path,
+                           {"content-type": "application/pdf", "upsert": "true"})
+        logger.info(f"Uploaded PDF to Supabase Storage: {storage_path}")
+
+        # Link before the rows exist: once they do, a retry takes the already-ingested path
+        if campaign_id:
+            await self.link_to_campaign(document_id, file_name, campaign_id)
+
+        def stored(count: int):
+            progress.chunks_inserted += count
+
+        # Store one row per chunk; campaign_id None keeps the document shared across campaigns.
+        # A failed revision is not rolled back, which would delete the stored version. Its chunk 0 has
+        # no file hash until mark_complete, so the retry finds it by name and rewrites it.
+        rows = chunk_rows(document_id, chunks, embeddings, file_name, storage_path, user_id, campaign_id)
+        inserted = await insert_chunks(self.supabase, rows, on_progress=stored, rollback=not replace)
+        removed = await delete_chunks_from(self.supabase, document_id, len(chunks)) if replace else []
+        await mark_complete(self.supabase, document_id, sha256)
+        logger.debug(f"Stored {len(inserted)} chunk rows for {file_name}, removed {len(removed)} stale rows")
+        if not update_indexes:
+            return len(inserted)
+        # Chunks go into the BM25 index right away, so lexical search sees them without a rebuild
+        self.lexical_index.add_document(document_id, chunks, campaign_id, file_name)
+        if DOCUMENT_RETRIEVAL_BACKEND == "local":
+            # Other workers pick the rows up through the change cursor
+            document_index = get_document_index()
+            for row in inserted:
+                document_index.upsert(row)
+            for row in removed:
+                document_index.remove(row["chunk_id"])
+        document_set_version.bump()
+        return len(inserted)
+
+    async def ingest(self, upload: SpooledUpload, file_name: str, user_id: str, campaign_id: str = None,
+                     progress: Optional[IngestJobStatus] = None, document_id: str = None) -> dict:
+        """Extract, chunk, embed, store and index a spooled PDF; progress counters are updated as it goes."""
+        progress = progress or IngestJobStatus(job_id="", file_name=file_name, created_at=datetime.now(timezone.utc))
+        progress.pages_extracted = progress.chunks_total = progress.chunks_embedded = progress.chunks_inserted = 0
+        progress.chunks_reused = 0
+        logger.debug(f"Processing PDF: {file_name}, Size: {upload.size} bytes, sha256 {upload.sha256}")
+
+        if campaign_id:
+            await self.check_campaign(campaign_id)
+
+        # The same bytes already ingested for this campaign: nothing to extract, embed or store.
+        # A revision of a stored file replaces it under the same document_id.
+        existing, previous = await self.check_existing(upload.sha256, file_name, campaign_id)
+        if existing:
+            progress.skipped = True
+            return await self.reuse(existing, file_name, upload.sha256, campaign_id)
+        if previous:
+            document_id = previous["document_id"]
+            logger.info(f"{file_name} replaces the stored revision of document {document_id}")
+        document_id = document_id or str(uuid4())
+
+        # Extract text from the memory-mapped file in worker processes, page by page
+        pages = []
+        async for _, text in extract_pages(upload.path):
+            pages.append(text)
+            progress.pages_extracted += 1
+        logger.debug(f"Extracted {len(pages)} pages, {sum(len(page) for page in pages)} characters")
+
+        # Split into token windows and embed the ones not seen before
+        chunks = await asyncio.to_thread(chunk_pages, pages)
+        if not chunks:
+            raise ValueError(f"No extractable text in {file_name}")
+        progress.chunks_total = len(chunks)
+        embeddings = await self.embed_new_chunks(chunks, progress)
+        logger.debug(f"Embedded {progress.chunks_embedded} chunks of {file_name}, reused {progress.chunks_reused}")
+
+        stored = await self.store(upload.path, upload.sha256, document_id, chunks, embeddings, file_name, user_id,
+                                  campaign_id, previous is not None, progress)
+        return {
+            "document_id": document_id,
+            "file_name": file_name,
+            "sha256": upload.sha256,
+            "chunks": stored,
+            "message": "PDF uploaded successfully"
+        }
 
-    async def upload_pdf(self, file: UploadFile, user_id: str) -> dict:
+    async def upload_pdf(self, file: UploadFile, user_id: str, campaign_id: str = None) -> dict:
+        """Ingest an upload within the request; the API queues uploads on IngestJobQueue instead."""
+        file_name = file.filename
         try:
-            # Read PDF content
-            file_content = await file.read()
-            file_name = file.filename
-            logger.debug(f"Processing PDF: {file_name}, Size: {len(file_content)} bytes")
-
-            # Extract text from PDF
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() or ""
-            logger.debug(f"Extracted text length: {len(text)} characters")
-
-            # Generate embedding
-            embedding_response = self.openai.embeddings.create(
-                input=text[:8192],  # Truncate to OpenAI's max token limit
-                model="text-embedding-ada-002"
-            )
-            embedding = embedding_response.data[0].embedding
-            logger.debug(f"Generated embedding for {file_name}")
-
-            # Upload to Supabase Storage
-            storage_path = f"pdfs/{file_name}"
-            self.supabase.storage.from_("pdfs").upload(storage_path, file_content)
-            logger.info(f"Uploaded PDF to Supabase Storage: {storage_path}")
-
-            # Store metadata and embedding
-            document_data = {
-                "file_name": file_name,
-                "file_path": storage_path,
-                "uploaded_by": user_id,
-                "embedding": embedding
-            }
-            response = self.supabase.table("document_embeddings").insert(document_data).execute()
-            logger.debug(f"Inserted document metadata: {document_data}")
-            return {
-                "document_id": response.data[0]["document_id"],
-                "file_name": file_name,
-                "message": "PDF uploaded successfully"
-            }
+            with await spool_upload(file) as upload:
+                return await self.ingest(upload, file_name, user_id, campaign_id)
         except Exception as e:
             logger.error(f"Failed to upload PDF {file_name}: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
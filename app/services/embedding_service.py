@@ -0,0 +1,204 @@
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from openai import AsyncOpenAI, OpenAI
+from langchain_core.embeddings import Embeddings
+from .openai_scheduler import INTERACTIVE, OpenAIScheduler, estimate_tokens, get_openai_scheduler
+from ..core.config import (
+    EMBEDDING_MODEL, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingService:
+    """Process-wide embedding client shared by every service.
+
+    Requests made within a short window are coalesced into one embeddings API
+    call, identical inputs are deduplicated while in flight, and results are
+    kept in an LRU cache keyed by the sha256 of the model and text. API calls go
+    through the shared OpenAIScheduler at the priority of their most urgent input.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL, window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch: int = EMBEDDING_MAX_BATCH, cache_size: int = EMBEDDING_CACHE_SIZE,
+                 cache_path: str = EMBEDDING_CACHE_PATH, scheduler: Optional[OpenAIScheduler] = None):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.scheduler = scheduler or get_openai_scheduler()
+        # 429s and transient errors are retried by the scheduler, not by the clients
+        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.sync_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()  # Sync callers touch the cache from executor threads
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._queue: List[Tuple[str, str, int]] = []  # (key, text, priority)
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "api_calls": 0, "api_inputs": 0, "errors": 0}
+        if cache_path:
+            self.load()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+
+    def _cache_put(self, key: str, embedding: List[float]):
+        with self._cache_lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def embed(self, text: str, priority: int = INTERACTIVE) -> List[float]:
+        self.stats["requests"] += 1
+        key = self.key(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        self._inflight[key] = future
+        self._queue.append((key, text, priority))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    async def embed_many(self, texts: List[str], priority: int = INTERACTIVE) -> List[List[float]]:
+        return list(await asyncio.gather(*(self.embed(text, priority) for text in texts)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Urgent inputs go into the first batches, so they are not stuck behind bulk ones
+        self._queue.sort(key=lambda item: item[2])
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            self._loop.create_task(self._request(batch))
+
+    async def _request(self, batch: List[Tuple[str, str, int]]):
+        self.stats["api_calls"] += 1
+        self.stats["api_inputs"] += len(batch)
+        texts = [text for _, text, _ in batch]
+        estimate = sum(estimate_tokens(text) for text in texts)
+        try:
+            response = await self.scheduler.run(
+                lambda: self.client.embeddings.create(input=texts, model=self.model),
+                min(priority for _, _, priority in batch), estimate
+            )
+            self.scheduler.settle(estimate, response.usage.total_tokens if response.usage else None)
+            for (key, _, _), item in zip(batch, sorted(response.data, key=lambda d: d.index)):
+                self._cache_put(key, item.embedding)
+                self._inflight.pop(key).set_result(item.embedding)
+            logger.debug(f"Embedded batch of {len(batch)} inputs")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Embedding batch of {len(batch)} inputs failed: {str(e)}", exc_info=True)
+            for key, _, _ in batch:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+
+    def embed_many_sync(self, texts: List[str]) -> List[List[float]]:
+        """Blocking variant for code running outside the event loop thread."""
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not loop:
+                return asyncio.run_coroutine_threadsafe(self.embed_many(texts), loop).result()
+        results: List[Optional[List[float]]] = [self._cache_get(self.key(text)) for text in texts]
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+        self.stats["requests"] += len(texts)
+        self.stats["cache_hits"] += len(texts) - len(missing)
+        for start in range(0, len(missing), self.max_batch):
+            chunk = missing[start:start + self.max_batch]
+            self.stats["api_calls"] += 1
+            self.stats["api_inputs"] += len(chunk)
+            inputs = [texts[i] for i in chunk]
+            estimate = sum(estimate_tokens(text) for text in inputs)
+            response = self.scheduler.run_blocking(
+                lambda: self.sync_client.embeddings.create(input=inputs, model=self.model), INTERACTIVE, estimate
+            )
+            self.scheduler.settle(estimate, response.usage.total_tokens if response.usage else None)
+            for i, item in zip(chunk, sorted(response.data, key=lambda d: d.index)):
+                results[i] = item.embedding
+                self._cache_put(self.key(texts[i]), item.embedding)
+        return results
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            data = np.load(self.cache_path, allow_pickle=False)
+            for key, vector in zip(data["keys"], data["vectors"]):
+                self._cache_put(str(key), vector.tolist())
+            logger.info(f"Loaded {len(data['keys'])} cached embeddings from {self.cache_path}")
+        except Exception as e:
+            logger.error(f"Failed to load embedding cache {self.cache_path}: {str(e)}", exc_info=True)
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self._cache_lock:
+            items = list(self._cache.items())
+        if not items:
+            return
+        try:
+            np.savez(self.cache_path, keys=np.array([key for key, _ in items]),
+                     vectors=np.array([vector for _, vector in items], dtype=np.float32))
+            logger.info(f"Saved {len(items)} cached embeddings to {self.cache_path}")
+        except Exception as e:
+            logger.error(f"Failed to save embedding cache {self.cache_path}: {str(e)}", exc_info=True)
+
+    def metrics(self) -> dict:
+        return {"cache_entries": len(self._cache), "queued": len(self._queue), "inflight": len(self._inflight), **self.stats}
+
+class ServiceEmbeddings(Embeddings):
+    """LangChain Embeddings backed by the shared EmbeddingService."""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.service.embed_many_sync(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.service.embed_many_sync([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.service.embed_many(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.service.embed(text)
+
+_embedding_service: Optional[EmbeddingService] = None
+
+def get_embedding_service() -> EmbeddingService:
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
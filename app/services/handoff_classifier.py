@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import re
+import numpy as np
+from typing import List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from ..core.config import HANDOFF_SIMILARITY_LOW, HANDOFF_SIMILARITY_HIGH
+
+logger = logging.getLogger(__name__)
+
+HANDOFF_PROMPT = """
+Determine if the following user message indicates a request for human assistance or handoff.
+Examples of handoff triggers: "talk to a person", "human help", "escalate", "contact a volunteer".
+Message: {message}
+Return "true" if a handoff is requested, "false" otherwise.
+"""
+
+# Phrasings that are handoff requests in any context. Each needs the asker (I, me, we) or a
+# handoff verb aimed at a person, so "a real person or an AI?" or "put me through the steps"
+# fall through to the similarity tier instead of short-circuiting it.
+HANDOFF_PATTERNS = [
+    r"\b(i|we)\b[^.?!]{0,30}?\b(talk|speak|chat)\s+(to|with)\s+(a|an|some)?\s*(real|actual|live)?\s*(person|human|someone|somebody|volunteer|agent|representative|staff)\b(?!\s+rights)",
+    r"\bhuman\s+(help|assistance|support|agent)\b",
+    r"\bescalate\s+(this|it|my|me)\b",
+    r"\bcontact\s+(a|an|the)?\s*(volunteer|organizer|staff)\b",
+    r"\b(connect|transfer|put)\s+me\s+(to|with|through)\s+(to\s+)?(a|an|the|some)?\s*(real|actual|live)?\s*(human|person|agent|someone|somebody|staff|volunteer|organizer|representative)\b",
+]
+
+# Reference utterances embedded once and compared against each message
+HANDOFF_INTENTS = [
+    "I want to talk to a real person",
+    "Can a human help me with this?",
+    "Please connect me with a volunteer",
+    "I need to speak with someone from the campaign",
+    "Let me talk to a campaign organizer",
+    "This bot isn't helping, get me a person",
+    "Can someone from your team contact me?",
+    "I'd like to volunteer, who can I talk to?",
+    "Escalate this to a staff member",
+    "Is there a person I can chat with instead?",
+]
+
+class HandoffClassifier:
+    """In-process handoff detection in front of the LLM.
+
+    Tier 1 is a regex match on explicit phrasings, tuned for precision: on
+    data/handoff_benchmark.jsonl it catches about half the requests and none of
+    the hard negatives, and the rest are left to the later tiers. Tier 2 compares the message
+    embedding with the handoff intent embeddings: at or above the high threshold
+    it is a handoff, at or below the low threshold it is not. Anything in between
+    returns None so the caller can ask the LLM.
+    """
+
+    def __init__(self, embeddings: Embeddings, low: float = HANDOFF_SIMILARITY_LOW, high: float = HANDOFF_SIMILARITY_HIGH):
+        self.embeddings = embeddings
+        self.low = low
+        self.high = high
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in HANDOFF_PATTERNS]
+        self._intents: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"regex": 0, "similar": 0, "dissimilar": 0, "escalated": 0}
+
+    def match_phrase(self, message: str) -> bool:
+        return any(p.search(message) for p in self.patterns)
+
+    async def _intent_matrix(self) -> np.ndarray:
+        if self._intents is None:
+            async with self._lock:
+                if self._intents is None:
+                    vectors = np.asarray(await self.embeddings.aembed_documents(HANDOFF_INTENTS), dtype=np.float32)
+                    self._intents = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+                    logger.info(f"Precomputed {len(HANDOFF_INTENTS)} handoff intent embeddings")
+        return self._intents
+
+    async def similarity(self, message: str, embedding: Optional[List[float]] = None) -> float:
+        intents = await self._intent_matrix()
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(message)
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query)
+        return float(np.max(intents @ query))
+
+    async def classify(self, message: str, embedding: Optional[List[float]] = None) -> Tuple[Optional[bool], str, float]:
+        """Return (decision, tier, score); decision is None when the LLM should decide."""
+        if self.match_phrase(message):
+            self.stats["regex"] += 1
+            return True, "regex", 1.0
+        score = await self.similarity(message, embedding)
+        if score >= self.high:
+            self.stats["similar"] += 1
+            return True, "similarity", score
+        if score <= self.low:
+            self.stats["dissimilar"] += 1
+            return False, "similarity", score
+        self.stats["escalated"] += 1
+        return None, "llm", score
+
+    def metrics(self) -> dict:
+        return {"low": self.low, "high": self.high, **self.stats}
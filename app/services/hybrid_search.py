@@ -0,0 +1,297 @@
+import re
+import math
+import time
+import heapq
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from supabase import Client
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from ..db.sql import changed_rows
+from ..db.vector import CampaignDocumentRetriever, document_set_version
+from ..core.config import (
+    RETRIEVAL_K, HYBRID_FETCH_K, RRF_K, LEXICAL_INDEX_PAGE_SIZE, LEXICAL_INDEX_SYNC_INTERVAL, CHANGE_CURSOR_LAG
+)
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.'-][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its of on or that the this to was what when "
+    "where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-process inverted index over document chunks, scored with Okapi BM25.
+
+    Chunks are added at ingest time, so the index grows incrementally instead of
+    being rebuilt. Chunks written or deleted by other workers and scripts arrive
+    through the same (updated_at, chunk_id) change cursor, tombstone feed and
+    late-commit window as the DocumentIndex. A search only walks the postings of the query terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> chunk key -> term frequency
+        self._chunks: Dict[str, dict] = {}  # chunk key ("document_id:chunk_index") -> text and metadata
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, Tuple[str, ...]] = {}  # chunk key -> distinct terms, for removal
+        self._documents: Dict[str, Set[str]] = {}  # document_id -> chunk keys
+        self._row_ids: Dict[str, str] = {}  # chunk key -> chunk_id of the row it was read from
+        self._row_keys: Dict[str, str] = {}  # chunk_id -> chunk key, for tombstones
+        self._row_versions: Dict[str, Optional[str]] = {}  # chunk_id -> updated_at of the applied row
+        self._total_length = 0
+        self._cursor: Optional[Tuple[str, str]] = None
+        self._deleted_cursor: Optional[Tuple[str, str]] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.stats = {"searches": 0, "search_ms": 0.0, "syncs": 0, "sync_failures": 0}
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def _add_chunk(self, key: str, document_id: str, chunk: dict, campaign_id: Optional[str], file_name: Optional[str]):
+        terms = Counter(tokenize(chunk["content"] or ""))
+        if not terms:
+            return
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[key] = frequency
+        length = sum(terms.values())
+        self._lengths[key] = length
+        self._terms[key] = tuple(terms)
+        self._total_length += length
+        self._chunks[key] = {
+            "document_id": document_id,
+            "campaign_id": campaign_id,
+            "file_name": file_name,
+            "chunk_index": chunk["chunk_index"],
+            "page_number": chunk.get("page_number"),
+            "text": chunk["content"]
+        }
+        self._documents.setdefault(document_id, set()).add(key)
+
+    def _remove_chunk(self, key: str):
+        chunk = self._chunks.pop(key, None)
+        if chunk is None:
+            return
+        for term in self._terms.pop(key):
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(key)
+        row_id = self._row_ids.pop(key, None)
+        self._row_keys.pop(row_id, None)
+        self._row_versions.pop(row_id, None)
+        keys = self._documents[chunk["document_id"]]
+        keys.discard(key)
+        if not keys:
+            del self._documents[chunk["document_id"]]
+
+    def add_document(self, document_id: str, chunks: Iterable[dict], campaign_id: Optional[str] = None,
+                     file_name: Optional[str] = None):
+        """Index a document's chunks (content, chunk_index, page_number), replacing any indexed before."""
+        document_id = str(document_id)
+        self.remove_document(document_id)
+        for chunk in chunks:
+            self._add_chunk(f"{document_id}:{chunk['chunk_index']}", document_id, chunk, campaign_id, file_name)
+
+    def remove_document(self, document_id: str):
+        for key in list(self._documents.get(str(document_id), ())):
+            self._remove_chunk(key)
+
+    def upsert_row(self, row: dict) -> bool:
+        """Apply one document_embeddings row read from the change cursor; False if already applied."""
+        chunk_id = str(row["chunk_id"])
+        if row.get("updated_at") is not None and self._row_versions.get(chunk_id) == row["updated_at"]:
+            return False
+        document_id = str(row["document_id"])
+        key = f"{document_id}:{row['chunk_index']}"
+        self._remove_chunk(key)
+        self._add_chunk(key, document_id, row, row.get("campaign_id"), row.get("file_name"))
+        if key in self._chunks:
+            self._row_ids[key] = chunk_id
+            self._row_keys[chunk_id] = key
+            self._row_versions[chunk_id] = row.get("updated_at")
+        return True
+
+    def remove_row(self, chunk_id: str) -> bool:
+        """Drop the chunk read from a deleted row, unless a newer row has replaced it since."""
+        key = self._row_keys.get(str(chunk_id))
+        if key is None:
+            return False
+        self._remove_chunk(key)
+        return True
+
+    def search(self, query: str, k: int, campaign_ids: Optional[Set[str]] = None,
+               document_ids: Optional[Set[str]] = None, include_shared: bool = True) -> List[dict]:
+        """Top k chunks for the query, optionally limited the same way as match_campaign_documents."""
+        start = time.perf_counter()
+        n = len(self._chunks)
+        scores: Dict[str, float] = {}
+        if n:
+            average_length = self._total_length / n
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        if campaign_ids is not None:
+            scores = {
+                chunk_id: score for chunk_id, score in scores.items()
+                if self._visible(self._chunks[chunk_id], campaign_ids, document_ids, include_shared)
+            }
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        self.stats["searches"] += 1
+        self.stats["search_ms"] += (time.perf_counter() - start) * 1000
+        return [{**self._chunks[chunk_id], "chunk_id": chunk_id, "score": score} for chunk_id, score in top]
+
+    @staticmethod
+    def _visible(chunk: dict, campaign_ids: Set[str], document_ids: Optional[Set[str]], include_shared: bool) -> bool:
+        if chunk["campaign_id"] is None:
+            return include_shared
+        return chunk["campaign_id"] in campaign_ids and (document_ids is None or chunk["document_id"] in document_ids)
+
+    async def sync(self, supabase: Client) -> int:
+        """Apply chunks changed and deleted since the last sync; returns the number of changes."""
+        async with self._lock:
+            changes = 0
+            async for rows in changed_rows(
+                supabase, "document_embeddings",
+                "chunk_id, document_id, campaign_id, file_name, chunk_index, page_number, content, updated_at",
+                "updated_at", self._cursor, LEXICAL_INDEX_PAGE_SIZE, lag=CHANGE_CURSOR_LAG
+            ):
+                changes += sum(self.upsert_row(row) for row in rows)
+                self._cursor = (rows[-1]["updated_at"], str(rows[-1]["chunk_id"]))
+            async for rows in changed_rows(supabase, "document_embeddings_deleted", "chunk_id, deleted_at", "deleted_at",
+                                           self._deleted_cursor, LEXICAL_INDEX_PAGE_SIZE, lag=CHANGE_CURSOR_LAG):
+                changes += sum(self.remove_row(row["chunk_id"]) for row in rows)
+                self._deleted_cursor = (rows[-1]["deleted_at"], str(rows[-1]["chunk_id"]))
+            if changes:
+                # Chunks written by other workers and scripts change the corpus as much as local ingests
+                document_set_version.bump()
+            self.loaded = True
+            self.stats["syncs"] += 1
+            return changes
+
+    async def ensure_loaded(self, supabase: Client):
+        """Index stored document content if no sync has run yet in this process."""
+        if not self.loaded:
+            await self.sync(supabase)
+            logger.info(f"Lexical index loaded with {len(self)} chunks and {len(self._postings)} terms")
+
+    async def start(self, supabase: Client, interval: float = LEXICAL_INDEX_SYNC_INTERVAL):
+        """Load the index, then keep following the change cursor in the background."""
+        await self.ensure_loaded(supabase)
+        if self._task is None:
+            self._task = asyncio.create_task(self._follow(supabase, interval))
+
+    async def _follow(self, supabase: Client, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changes = await self.sync(supabase)
+                if changes:
+                    logger.debug(f"Lexical index applied {changes} changes")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["sync_failures"] += 1
+                logger.error(f"Lexical index sync failed: {str(e)}", exc_info=True)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        searches = self.stats["searches"]
+        return {
+            "chunks": len(self),
+            "terms": len(self._postings),
+            "loaded": self.loaded,
+            "cursor": self._cursor[0] if self._cursor else None,
+            "searches": searches,
+            "mean_search_ms": round(self.stats["search_ms"] / searches, 4) if searches else 0.0,
+            "syncs": self.stats["syncs"],
+            "sync_failures": self.stats["sync_failures"]
+        }
+
+class HybridRetriever(BaseRetriever):
+    """Fuses campaign-scoped vector results with BM25 results using reciprocal-rank fusion.
+
+    Exact policy terms are usually found by the lexical side without depending on
+    embedding similarity, so fewer fused documents are needed in the prompt.
+    """
+
+    vector: CampaignDocumentRetriever  # Its k is the number of vector candidates fused
+    lexical: BM25Index
+    k: int = RETRIEVAL_K
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+
+    def _lexical_documents(self, query: str) -> List[Document]:
+        hits = self.lexical.search(
+            query, self.fetch_k,
+            campaign_ids=set(self.vector.campaign_ids),
+            document_ids=set(self.vector.document_ids),
+            include_shared=self.vector.include_shared
+        )
+        return [
+            Document(page_content=hit["text"], metadata={
+                "document_id": hit["document_id"],
+                "campaign_id": hit["campaign_id"],
+                "file_name": hit["file_name"],
+                "chunk_index": hit["chunk_index"],
+                "page_number": hit["page_number"],
+                "bm25_score": hit["score"]
+            })
+            for hit in hits
+        ]
+
+    def fuse(self, *rankings: List[Document]) -> List[Document]:
+        scores: Dict[Tuple[str, str], float] = {}
+        documents: Dict[Tuple[str, str], Document] = {}
+        for ranking in rankings:
+            for rank, document in enumerate(ranking):
+                key = (document.metadata.get("document_id"), document.page_content)
+                scores[key] = scores.get(key, 0.0) + 1 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, document)
+        fused = []
+        for key in heapq.nlargest(self.k, scores, key=scores.get):
+            documents[key].metadata["rrf_score"] = scores[key]
+            fused.append(documents[key])
+        return fused
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        lexical = self._lexical_documents(query)
+        vector = self.vector.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.fuse(vector, lexical)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        lexical = self._lexical_documents(query)
+        vector = await self.vector.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self.fuse(vector, lexical)
+
+_lexical_index: Optional[BM25Index] = None
+
+def get_lexical_index() -> BM25Index:
+    global _lexical_index
+    if _lexical_index is None:
+        _lexical_index = BM25Index()
+    return _lexical_index
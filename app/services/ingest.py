@@ -0,0 +1,157 @@
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+from supabase import Client
+from .embedding_service import EmbeddingService
+from .openai_scheduler import BULK
+from ..db.sql import execute
+from ..core.config import (
+    CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, EMBEDDING_MODEL, EMBEDDING_MAX_BATCH, INGEST_EMBED_CONCURRENCY, INGEST_INSERT_BATCH
+)
+
+HASH_LOOKUP_BATCH = 100  # chunk_sha256 values per "in" filter, keeping the request URL short
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+
+def get_encoding():
+    """cl100k_base, the tokenizer of the OpenAI embedding models; loaded on first use."""
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+def chunk_pages(pages: List[str], chunk_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS,
+                encoding=None) -> List[dict]:
+    """Split page texts into token windows with overlap.
+
+    Chunks never span pages, so each carries its page number. start_offset and
+    end_offset are character offsets into the page-concatenated document text.
+    """
+    if not 0 <= overlap < chunk_tokens:
+        raise ValueError("overlap must be smaller than chunk_tokens")
+    encoding = encoding or get_encoding()
+    chunks = []
+    page_offset = 0
+    for page_number, page in enumerate(pages, start=1):
+        tokens = encoding.encode(page)
+        text, starts = encoding.decode_with_offsets(tokens)
+        start = 0
+        while start < len(tokens):
+            end = min(start + chunk_tokens, len(tokens))
+            begin_char = starts[start]
+            end_char = starts[end] if end < len(tokens) else len(text)
+            content = text[begin_char:end_char]
+            if content.strip():
+                chunks.append({
+                    "chunk_index": len(chunks),
+                    "page_number": page_number,
+                    "start_offset": page_offset + begin_char,
+                    "end_offset": page_offset + end_char,
+                    "token_count": end - start,
+                    "content": content
+                })
+            if end == len(tokens):
+                break
+            start = end - overlap
+        page_offset += len(page)
+    return chunks
+
+def chunk_hash(content: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\0{content}".encode("utf-8")).hexdigest()
+
+async def find_embeddings(supabase: Client, hashes: Iterable[str]) -> Dict[str, List[float]]:
+    """Embeddings already stored for any of the given chunk hashes."""
+    hashes = list(set(hashes))
+    found: Dict[str, List[float]] = {}
+    for start in range(0, len(hashes), HASH_LOOKUP_BATCH):
+        response = await execute(
+            supabase.table("document_embeddings").select("chunk_sha256, embedding")
+            .in_("chunk_sha256", hashes[start:start + HASH_LOOKUP_BATCH])
+        )
+        for row in response.data:
+            embedding = row["embedding"]
+            found[row["chunk_sha256"]] = json.loads(embedding) if isinstance(embedding, str) else embedding
+    return found
+
+async def embed_chunks(service: EmbeddingService, chunks: List[dict], batch_size: int = EMBEDDING_MAX_BATCH,
+                       concurrency: int = INGEST_EMBED_CONCURRENCY,
+                       on_progress: Optional[Callable[[int], None]] = None, priority: int = BULK) -> List[List[float]]:
+    """Embed chunk contents in API-sized batches, with at most `concurrency` batches in flight.
+
+    Batches run at bulk priority by default, behind any chat traffic on the worker.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed_batch(batch: List[dict]) -> List[List[float]]:
+        async with semaphore:
+            embeddings = await service.embed_many([chunk["content"] for chunk in batch], priority)
+        if on_progress is not None:
+            on_progress(len(batch))
+        return embeddings
+
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return [embedding for batch in results for embedding in batch]
+
+async def delete_chunks_from(supabase: Client, document_id: str, chunk_index: int) -> List[dict]:
+    """Remove a document's chunks at or after chunk_index, left over when a revision is shorter."""
+    response = await execute(
+        supabase.table("document_embeddings").delete().eq("document_id", document_id).gte("chunk_index", chunk_index)
+    )
+    return response.data
+
+async def insert_chunks(supabase: Client, rows: List[dict], batch_size: int = INGEST_INSERT_BATCH,
+                        on_progress: Optional[Callable[[int], None]] = None, rollback: bool = True) -> List[dict]:
+    """Bulk-insert chunk rows; if any batch fails, rows already inserted for the document are removed.
+
+    Rows are upserted on (document_id, chunk_index), so a retried ingest of the same document is idempotent.
+    """
+    inserted = []
+    try:
+        for start in range(0, len(rows), batch_size):
+            response = await execute(supabase.table("document_embeddings").upsert(
+                rows[start:start + batch_size], on_conflict="document_id,chunk_index"
+            ))
+            inserted.extend(response.data)
+            if on_progress is not None:
+                on_progress(len(response.data))
+    except Exception:
+        if inserted and rollback:
+            await execute(supabase.table("document_embeddings").delete().eq("document_id", rows[0]["document_id"]))
+            logger.warning(f"Rolled back {len(inserted)} chunk rows of document {rows[0]['document_id']}")
+        raise
+    return inserted
+
+async def mark_complete(supabase: Client, document_id: str, file_sha256: str):
+    """Stamp the file hash on chunk 0 once every chunk is stored; deduplication only trusts stamped documents."""
+    await execute(
+        supabase.table("document_embeddings").update({"file_sha256": file_sha256})
+        .eq("document_id", document_id).eq("chunk_index", 0)
+    )
+
+def chunk_rows(document_id: str, chunks: List[dict], embeddings: List[List[float]], file_name: str, file_path: str,
+               user_id: str, campaign_id: Optional[str] = None) -> List[dict]:
+    return [
+        {
+            "document_id": document_id,
+            "file_name": file_name,
+            "file_path": file_path,
+            "uploaded_by": user_id,
+            "campaign_id": campaign_id,
+            "file_sha256": None,  # Set by mark_complete; writing None clears the marker of a revised document
+            "chunk_index": chunk["chunk_index"],
+            "chunk_sha256": chunk_hash(chunk["content"]),
+            "page_number": chunk["page_number"],
+            "start_offset": chunk["start_offset"],
+            "end_offset": chunk["end_offset"],
+            "token_count": chunk["token_count"],
+            "content": chunk["content"],
+            "embedding": embedding
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
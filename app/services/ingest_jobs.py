@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import uuid4
+from .upload_spool import SpooledUpload
+from ..schemas.document import IngestJobStatus
+from ..core.config import INGEST_WORKERS, INGEST_QUEUE_MAX, INGEST_MAX_ATTEMPTS, INGEST_RETRY_BACKOFF, INGEST_JOB_HISTORY
+
+logger = logging.getLogger(__name__)
+
+class IngestJob:
+    def __init__(self, upload: SpooledUpload, file_name: str, user_id: str, campaign_id: Optional[str]):
+        self.upload = upload
+        self.user_id = user_id
+        self.campaign_id = campaign_id
+        self.document_id = str(uuid4())  # Fixed across retries so a retry overwrites its own rows
+        self.status = IngestJobStatus(job_id=str(uuid4()), file_name=file_name, created_at=datetime.now(timezone.utc))
+
+class IngestJobQueue:
+    """Runs PDF ingest jobs on a pool of background workers.
+
+    Jobs own their spooled upload and delete it when they finish. Failures other
+    than ValueError (bad input) are retried with exponential backoff. Status,
+    including progress counters, is kept in memory for the most recent jobs.
+    """
+
+    def __init__(self, document_service, workers: int = INGEST_WORKERS, queue_max: int = INGEST_QUEUE_MAX,
+                 max_attempts: int = INGEST_MAX_ATTEMPTS, retry_backoff: float = INGEST_RETRY_BACKOFF,
+                 history: int = INGEST_JOB_HISTORY):
+        self.document_service = document_service
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.history = history
+        self._queue: Optional[asyncio.Queue] = None
+        self._queue_max = queue_max
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "retries": 0, "rejected": 0}
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._queue_max)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+
+    def submit(self, upload: SpooledUpload, file_name: str, user_id: str, campaign_id: Optional[str] = None) -> IngestJobStatus:
+        """Queue a spooled upload; raises asyncio.QueueFull when the backlog is full."""
+        self._ensure_workers()
+        job = IngestJob(upload, file_name, user_id, campaign_id)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise
+        self._jobs[job.status.job_id] = job
+        self._trim()
+        self.stats["submitted"] += 1
+        logger.info(f"Queued ingest job {job.status.job_id} for {file_name}")
+        return job.status
+
+    def get(self, job_id: str) -> Optional[IngestJobStatus]:
+        job = self._jobs.get(job_id)
+        return job.status if job is not None else None
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status.finished_at is not None]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    async def _work(self, worker: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                job.upload.close()
+                self._queue.task_done()
+
+    async def _run(self, job: IngestJob):
+        status = job.status
+        while True:
+            status.attempts += 1
+            status.status = "running"
+            try:
+                result = await self.document_service.ingest(
+                    job.upload, status.file_name, job.user_id, job.campaign_id, status, job.document_id
+                )
+                status.document_id = result["document_id"]
+                status.status = "succeeded"
+                status.error = None
+                self.stats["succeeded"] += 1
+                logger.info(f"Ingest job {status.job_id} succeeded after {status.attempts} attempt(s)")
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                status.error = str(e)
+                if isinstance(e, ValueError) or status.attempts >= self.max_attempts:
+                    status.status = "failed"
+                    self.stats["failed"] += 1
+                    logger.error(f"Ingest job {status.job_id} failed: {str(e)}", exc_info=True)
+                    break
+                status.status = "retrying"
+                self.stats["retries"] += 1
+                delay = self.retry_backoff * 2 ** (status.attempts - 1)
+                logger.warning(f"Ingest job {status.job_id} attempt {status.attempts} failed, retrying in {delay}s: {str(e)}")
+                await asyncio.sleep(delay)
+        status.finished_at = datetime.now(timezone.utc)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._jobs.values():
+            job.upload.close()
+
+    def metrics(self) -> dict:
+        return {"queued": self._queue.qsize() if self._queue is not None else 0, "workers": len(self._tasks), **self.stats}
@@ -0,0 +1,168 @@
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from pydantic import Field
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from .openai_scheduler import INTERACTIVE, ScheduledChatOpenAI
+from ..core.metrics import LatencyRecorder
+from ..core.config import LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES, LLM_HEDGE_MAX_RATE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class HedgePolicy:
+    """Per-stage LLM latency, hedge delays and deadline counts.
+
+    A stage's hedge delay is the `percentile` of its recent time-to-first-token
+    (or completion time for non-streamed calls). Hedging starts after
+    `min_samples` calls and stops while more than `max_rate` of the stage's calls
+    have been hedged, which bounds the extra spend.
+    """
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE, min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+                 max_rate: float = LLM_HEDGE_MAX_RATE):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self.latency = LatencyRecorder()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _stage(self, stage: str) -> Dict[str, int]:
+        return self.stats.setdefault(stage, {"calls": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0})
+
+    def delay(self, stage: str) -> Optional[float]:
+        """Seconds to wait before hedging a call of this stage, or None to not hedge it."""
+        stats = self._stage(stage)
+        if not self.min_samples or stats["calls"] < self.min_samples or stats["hedged"] >= self.max_rate * stats["calls"]:
+            return None
+        return self.latency.percentile(stage, self.percentile) / 1000
+
+    def record(self, stage: str, elapsed_ms: float, hedged: bool, hedge_won: bool):
+        stats = self._stage(stage)
+        stats["calls"] += 1
+        stats["hedged"] += hedged
+        stats["hedge_wins"] += hedge_won
+        self.latency.record(stage, elapsed_ms)
+
+    def record_timeout(self, stage: str):
+        self._stage(stage)["deadline_exceeded"] += 1
+
+    def metrics(self) -> dict:
+        latency = self.latency.summary()
+        return {
+            stage: {
+                **stats,
+                "hedge_rate": round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else 0.0,
+                "win_rate": round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else 0.0,
+                "hedge_delay_ms": round((self.delay(stage) or 0.0) * 1000, 2),
+                "latency": latency.get(stage)
+            }
+            for stage, stats in self.stats.items()
+        }
+
+_hedge_policy: Optional[HedgePolicy] = None
+
+def get_hedge_policy() -> HedgePolicy:
+    global _hedge_policy
+    if _hedge_policy is None:
+        _hedge_policy = HedgePolicy()
+    return _hedge_policy
+
+async def with_deadline(stage: str, awaitable: Awaitable[T], seconds: float,
+                        policy: Optional[HedgePolicy] = None) -> T:
+    """Await with a deadline, counting expiries for the stage; raises asyncio.TimeoutError."""
+    try:
+        return await asyncio.wait_for(awaitable, seconds)
+    except asyncio.TimeoutError:
+        (policy or get_hedge_policy()).record_timeout(stage)
+        logger.warning(f"LLM stage {stage} exceeded its {seconds}s deadline")
+        raise
+
+async def race(make: Callable[[], Awaitable[T]], delay: Optional[float],
+               discard: Optional[Callable[[T], Awaitable[None]]] = None) -> Tuple[T, bool, bool]:
+    """Run make(); if it has not finished after `delay` seconds, run a second copy and take the first success.
+
+    Returns (result, hedged, hedge_won). The slower copy is cancelled, or passed to
+    `discard` if it also finished. An error only surfaces if every copy fails.
+    """
+    tasks: List[asyncio.Task] = [asyncio.create_task(make())]
+    winner: Optional[asyncio.Task] = None
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(asyncio.create_task(make()))
+        pending = set(tasks)
+        while winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in tasks if task in done and task.exception() is None]
+            if succeeded:
+                winner = succeeded[0]
+            elif not pending:
+                await next(iter(done))  # Every copy failed: raise the last error
+        return winner.result(), len(tasks) > 1, winner is not tasks[0]
+    finally:
+        for task in tasks:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None and discard is not None:
+                await discard(task.result())
+
+async def _first_chunk(stream: AsyncIterator[T]) -> Tuple[AsyncIterator[T], Optional[T]]:
+    try:
+        return stream, await stream.__anext__()
+    except StopAsyncIteration:
+        return stream, None
+
+async def _close(started: Tuple[AsyncIterator, Any]):
+    await started[0].aclose()
+
+class HedgedChatOpenAI(ScheduledChatOpenAI):
+    """ScheduledChatOpenAI that hedges slow interactive calls of its stage.
+
+    A streamed call is hedged on time to first token: the copy that produces a
+    token first carries the rest of the reply. Calls are not hedged while the
+    scheduler is congested, where a duplicate would only deepen the queue.
+    """
+
+    stage: str = "llm"
+    hedge: Any = Field(default_factory=get_hedge_policy, exclude=True)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.priority != INTERACTIVE or self.scheduler.congested():
+            return None
+        return self.hedge.delay(self.stage)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        result, hedged, hedge_won = await race(
+            lambda: super(HedgedChatOpenAI, self)._agenerate(messages, stop, run_manager, **kwargs),
+            self._hedge_delay()
+        )
+        self.hedge.record(self.stage, (time.perf_counter() - start) * 1000, hedged, hedge_won)
+        return result
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        start = time.perf_counter()
+        # Token callbacks are raised by the caller for the chunks yielded here, so the losing copy stays silent
+        (stream, first), hedged, hedge_won = await race(
+            lambda: _first_chunk(super(HedgedChatOpenAI, self)._astream(messages, stop, None, **kwargs)),
+            self._hedge_delay(), _close
+        )
+        self.hedge.record(self.stage, (time.perf_counter() - start) * 1000, hedged, hedge_won)
+        if hedged:
+            logger.debug(f"Hedged {self.stage} call, {'hedge' if hedge_won else 'primary'} answered first")
+        try:
+            if first is not None:
+                yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
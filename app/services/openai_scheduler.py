@@ -0,0 +1,299 @@
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, TypeVar
+import openai
+from pydantic import Field
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from ..core.metrics import LatencyRecorder
+from ..core.config import (
+    OPENAI_RPM, OPENAI_TPM, OPENAI_BULK_RESERVE, OPENAI_MAX_RETRIES, OPENAI_RETRY_BASE, OPENAI_RETRY_MAX,
+    LLM_COMPLETION_TOKENS_ESTIMATE
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priority classes, lowest value first
+INTERACTIVE = 0  # A user is waiting on the reply: chat answers, handoff checks, query embeddings
+BACKGROUND = 1  # Off the reply path: summary folds
+BULK = 2  # Document ingest; only uses capacity the other classes leave
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BULK: "bulk"}
+
+# Retried by the scheduler; the SDK's own retries are off so that 429s go through the shared budgets
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token); settled against reported usage afterwards."""
+    return len(text) // 4 + 1
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second, holding at most one minute of budget."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, floor: float, now: float) -> float:
+        """Seconds until `amount` can be taken while leaving `floor` in the bucket.
+
+        Requests larger than the bucket only wait for it to fill; taking them leaves
+        the bucket in debt, which later requests wait out.
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity - floor)
+        return max(0.0, (amount + floor - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+class OpenAIScheduler:
+    """Process-wide admission control for OpenAI calls.
+
+    Every call takes one request from the RPM bucket and its estimated tokens
+    from the TPM bucket before it is sent. Waiting calls are granted in priority
+    order, FIFO within a class; bulk calls must also leave `bulk_reserve` of each
+    budget untouched, so ingest soaks up idle capacity without delaying chat.
+    A 429 pauses all dispatch for a jittered backoff (or the server's Retry-After)
+    and the call is queued again; connection errors, timeouts and 5xx are
+    retried with the same backoff.
+    """
+
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM, bulk_reserve: float = OPENAI_BULK_RESERVE,
+                 max_retries: int = OPENAI_MAX_RETRIES, retry_base: float = OPENAI_RETRY_BASE,
+                 retry_max: float = OPENAI_RETRY_MAX):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.bulk_reserve = bulk_reserve
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._lock = threading.Lock()  # Blocking callers acquire from executor threads
+        self._waiters: List[tuple] = []  # Heap of (priority, seq, tokens, future)
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._paused_until = 0.0
+        self.latency = LatencyRecorder()  # Time spent queued, per priority class
+        self.stats = {"granted": 0, "rate_limited": 0, "transient_errors": 0, "retries": 0, "failed": 0}
+
+    def _wait_time(self, priority: int, tokens: int, now: float) -> float:
+        reserve = self.bulk_reserve if priority == BULK else 0.0
+        return max(
+            self._paused_until - now,
+            self.requests.wait_time(1, self.requests.capacity * reserve, now),
+            self.tokens.wait_time(tokens, self.tokens.capacity * reserve, now)
+        )
+
+    def _take(self, tokens: int):
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.stats["granted"] += 1
+
+    async def acquire(self, priority: int, tokens: int):
+        """Wait until the call may be sent; its budget is spent once this returns."""
+        self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        start = time.perf_counter()
+        with self._lock:
+            heapq.heappush(self._waiters, (priority, next(self._seq), tokens, future))
+        self._dispatch()
+        try:
+            await future
+        finally:
+            if future.cancelled():
+                self._dispatch()  # The cancelled waiter may have been holding the timer
+        self.latency.record(f"wait_{PRIORITY_NAMES[priority]}", (time.perf_counter() - start) * 1000)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with self._lock:
+            while self._waiters:
+                priority, _, tokens, future = self._waiters[0]
+                if future.done():
+                    heapq.heappop(self._waiters)
+                    continue
+                wait = self._wait_time(priority, tokens, time.monotonic())
+                if wait > 0:
+                    self._timer = self._loop.call_later(wait, self._dispatch)
+                    return
+                heapq.heappop(self._waiters)
+                self._take(tokens)
+                future.set_result(None)
+
+    def acquire_blocking(self, priority: int, tokens: int):
+        """acquire() for code running outside the event loop; yields to any async waiter at or above its priority."""
+        start = time.perf_counter()
+        while True:
+            with self._lock:
+                ahead = any(p <= priority and not f.done() for p, _, _, f in self._waiters)
+                wait = self._wait_time(priority, tokens, time.monotonic())
+                if not ahead and wait <= 0:
+                    self._take(tokens)
+                    break
+            time.sleep(max(wait, 0.05))
+        self.latency.record(f"wait_{PRIORITY_NAMES[priority]}", (time.perf_counter() - start) * 1000)
+
+    def congested(self) -> bool:
+        """True while calls are queued or dispatch is paused after a 429; extra calls would only add to it."""
+        with self._lock:
+            return time.monotonic() < self._paused_until or any(not f.done() for _, _, _, f in self._waiters)
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Correct the TPM bucket once the call reports its real token usage."""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.refund(estimated - actual)
+
+    def retry_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """Seconds to wait before queueing a failed call again, or None to give up.
+
+        A 429 pauses all dispatch for the backoff, since the shared budget is exhausted;
+        connection errors, timeouts and 5xx only back off the call that hit them.
+        """
+        rate_limited = isinstance(error, openai.RateLimitError)
+        self.stats["rate_limited" if rate_limited else "transient_errors"] += 1
+        if getattr(error, "code", None) == "insufficient_quota" or attempt >= self.max_retries:
+            self.stats["failed"] += 1
+            return None
+        backoff = min(self.retry_max, self.retry_base * 2 ** attempt)
+        # Jitter keeps callers rejected together from retrying together
+        delay = max(random.uniform(backoff / 2, backoff), self._retry_after(error))
+        self.stats["retries"] += 1
+        if not rate_limited:
+            logger.warning(f"OpenAI call failed ({type(error).__name__}), retrying in {delay:.2f}s (retry {attempt + 1})")
+            return delay
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning(f"OpenAI rate limit hit, pausing dispatch for {delay:.2f}s (retry {attempt + 1})")
+        return 0.0
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        response = getattr(error, "response", None)
+        if response is None:
+            return 0.0
+        try:
+            if "retry-after-ms" in response.headers:
+                return float(response.headers["retry-after-ms"]) / 1000
+            return float(response.headers.get("retry-after", 0))
+        except ValueError:
+            return 0.0
+
+    async def run(self, call: Callable[[], Awaitable[T]], priority: int = INTERACTIVE, tokens: int = 1) -> T:
+        attempt = 0
+        while True:
+            await self.acquire(priority, tokens)
+            try:
+                return await call()
+            except RETRYABLE_ERRORS as e:
+                delay = self.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+            await asyncio.sleep(delay)
+
+    def run_blocking(self, call: Callable[[], T], priority: int = INTERACTIVE, tokens: int = 1) -> T:
+        attempt = 0
+        while True:
+            self.acquire_blocking(priority, tokens)
+            try:
+                return call()
+            except RETRYABLE_ERRORS as e:
+                delay = self.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+            time.sleep(delay)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _, future in self._waiters:
+                if not future.done():
+                    waiting[PRIORITY_NAMES[priority]] += 1
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level),
+                "paused_s": round(max(0.0, self._paused_until - now), 2),
+                "waiting": waiting,
+                "wait": self.latency.summary(),
+                **self.stats
+            }
+
+_scheduler: Optional[OpenAIScheduler] = None
+
+def get_openai_scheduler() -> OpenAIScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = OpenAIScheduler()
+    return _scheduler
+
+class ScheduledChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose async calls are admitted by the shared OpenAIScheduler.
+
+    The client's own retries are off; the scheduler retries 429s and transient
+    errors. A stream is only retried if it failed before its first token.
+    """
+
+    scheduler: Any = Field(default_factory=get_openai_scheduler, exclude=True)
+    priority: int = INTERACTIVE
+    max_retries: int = 0
+
+    def _estimate(self, messages: List[BaseMessage]) -> int:
+        prompt = sum(estimate_tokens(str(message.content)) for message in messages)
+        return prompt + (self.max_tokens or LLM_COMPLETION_TOKENS_ESTIMATE)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        estimate = self._estimate(messages)
+        result = await self.scheduler.run(
+            lambda: super(ScheduledChatOpenAI, self)._agenerate(messages, stop, run_manager, **kwargs),
+            self.priority, estimate
+        )
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        self.scheduler.settle(estimate, usage.get("total_tokens"))
+        return result
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        estimate = self._estimate(messages)
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(self.priority, estimate)
+            produced = 0
+            try:
+                async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                    produced += 1
+                    yield chunk
+                break
+            except RETRYABLE_ERRORS as e:
+                delay = None if produced else self.scheduler.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+            await asyncio.sleep(delay)
+        # One streamed chunk is about one completion token
+        self.scheduler.settle(estimate, estimate - (self.max_tokens or LLM_COMPLETION_TOKENS_ESTIMATE) + produced)
@@ -0,0 +1,70 @@
+import mmap
+import asyncio
+import logging
+import PyPDF2
+from io import BytesIO
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
+from ..core.config import PDF_EXTRACT_WORKERS, PDF_PAGES_PER_TASK
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[bytes, str]  # Raw PDF bytes or a path to the file
+
+@contextmanager
+def _reader(source: PdfSource) -> Iterator[PyPDF2.PdfReader]:
+    if isinstance(source, bytes):
+        yield PyPDF2.PdfReader(BytesIO(source))
+        return
+    # A memory-mapped file is parsed straight from the page cache instead of being read into the heap
+    with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PyPDF2.PdfReader(mapped)
+
+def _page_count(source: PdfSource) -> int:
+    with _reader(source) as reader:
+        return len(reader.pages)
+
+def _extract_range(source: PdfSource, start: int, stop: int) -> List[str]:
+    """Runs in a worker process: text of pages [start, stop)."""
+    with _reader(source) as reader:
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+    return _pool
+
+def shutdown_pdf_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def extract_pages(source: PdfSource, pages_per_task: int = PDF_PAGES_PER_TASK) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (page_number, text) in page order, extracted in worker processes.
+
+    Page ranges are submitted to the pool at once so large documents are parsed in
+    parallel; each range is yielded as soon as it and all earlier ranges are done.
+    The event loop only waits on futures, so chats on this worker keep flowing.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_pool()
+    count = await loop.run_in_executor(pool, _page_count, source)
+    futures = [
+        loop.run_in_executor(pool, _extract_range, source, start, min(start + pages_per_task, count))
+        for start in range(0, count, pages_per_task)
+    ]
+    logger.debug(f"Extracting {count} pages in {len(futures)} tasks")
+    try:
+        page_number = 0
+        for future in futures:
+            for text in await future:
+                page_number += 1
+                yield page_number, text
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,59 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+from ..core.config import AUTH_PROFILE_CACHE_TTL, AUTH_PROFILE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class ProfileCache:
+    """Profiles read by auth checks (chiefly for role), kept for a short TTL.
+
+    Updates made through this worker invalidate the entry at once; changes made
+    elsewhere are picked up when the entry expires. The political standpoint
+    embedding is not cached.
+    """
+
+    def __init__(self, ttl: float = AUTH_PROFILE_CACHE_TTL, max_entries: int = AUTH_PROFILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()  # user_id -> (expires_at, profile)
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(user_id, None)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, user_id: str, profile: dict):
+        slim = {key: value for key, value in profile.items() if key != "political_standpoint"}
+        self._entries[user_id] = (time.monotonic() + self.ttl, slim)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        if self._entries.pop(user_id, None) is not None:
+            self.stats["invalidations"] += 1
+            logger.debug(f"Profile cache entry invalidated for user_id: {user_id}")
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self._entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            **self.stats
+        }
+
+_profile_cache: Optional[ProfileCache] = None
+
+def get_profile_cache() -> ProfileCache:
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = ProfileCache()
+    return _profile_cache
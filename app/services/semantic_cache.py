@@ -0,0 +1,91 @@
+import time
+import logging
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from ..core.config import SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """Answers keyed by query embedding, reused for near-identical questions.
+
+    Embeddings live in a preallocated matrix so a lookup is one matrix-vector
+    product. Entries carry the document set version and a scope (the user's
+    document set); a hit requires both to match. Eviction is LRU with a TTL.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl: float = SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._matrix: Optional[np.ndarray] = None
+        self._versions = np.full(max_entries, -1, dtype=np.int64)  # -1 marks a free slot
+        self._scopes = np.full(max_entries, -1, dtype=np.int64)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._scope_ids: Dict[str, int] = {}
+        self._entries: "OrderedDict[int, str]" = OrderedDict()  # slot -> answer, least recently used first
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._versions[slot] = -1
+        self._free.append(slot)
+
+    def lookup(self, embedding, version: int, scope: str = "") -> Optional[str]:
+        scope_id = self._scope_ids.get(scope)
+        if not self._entries or scope_id is None:
+            self.stats["misses"] += 1
+            return None
+        expired = (self._versions >= 0) & (self._created < time.monotonic() - self.ttl)
+        for slot in np.flatnonzero(expired):
+            self._release(int(slot))
+            self.stats["expirations"] += 1
+        similarities = self._matrix @ self._normalize(embedding)
+        similarities[(self._versions != version) | (self._scopes != scope_id)] = -np.inf
+        slot = int(np.argmax(similarities))
+        if similarities[slot] < self.threshold:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(slot)
+        self.stats["hits"] += 1
+        logger.debug(f"Semantic cache hit with similarity {similarities[slot]:.4f}")
+        return self._entries[slot]
+
+    def store(self, embedding, answer: str, version: int, scope: str = ""):
+        vector = self._normalize(embedding)
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+        if not self._free:
+            self._release(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+        slot = self._free.pop()
+        self._matrix[slot] = vector
+        self._versions[slot] = version
+        self._scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+        self._created[slot] = time.monotonic()
+        self._entries[slot] = answer
+        self.stats["stores"] += 1
+
+    def invalidate(self, *_):
+        for slot in list(self._entries):
+            self._release(slot)
+        self._scope_ids.clear()
+        self.stats["invalidations"] += 1
+        logger.info("Semantic answer cache invalidated")
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            **self.stats
+        }
@@ -0,0 +1,94 @@
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import jwt
+from ..db.sql import run_blocking
+from ..core.config import SUPABASE_JWT_SECRET, SUPABASE_JWKS_URL, AUTH_JWT_AUDIENCE, AUTH_JWT_LEEWAY
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+JWKS_REFRESH_INTERVAL = 60  # Min seconds between key set fetches for the same unknown key id
+JWKS_MAX_FETCHES = 10  # Key set fetches allowed per refresh interval, so made-up key ids cannot force a fetch per request
+
+class TokenVerifier:
+    """Checks Supabase access tokens locally instead of calling Supabase Auth.
+
+    HS256 tokens are verified with the project's JWT secret; asymmetric tokens
+    with the signing key from the project's JWKS, fetched once per key id; an
+    unknown key id is refetched at most once per JWKS_REFRESH_INTERVAL.
+    Signature, expiry and audience are checked; sub is the user id.
+    """
+
+    def __init__(self, secret: str = SUPABASE_JWT_SECRET, jwks_url: str = SUPABASE_JWKS_URL,
+                 audience: str = AUTH_JWT_AUDIENCE, leeway: float = AUTH_JWT_LEEWAY):
+        self.secret = secret
+        self.audience = audience
+        self.leeway = leeway
+        self._jwks = jwt.PyJWKClient(jwks_url) if jwks_url else None
+        self._keys: Dict[str, Any] = {}
+        self._fetches: Deque[float] = deque()  # Times of the key set fetches in the last refresh interval
+        self._attempts: "OrderedDict[str, float]" = OrderedDict()  # kid -> time of its last fetch
+        self.stats = {"verified": 0, "rejected": 0, "key_fetches": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret or self._jwks)
+
+    async def _key(self, token: str) -> Tuple[Any, List[str]]:
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        if algorithm == "HS256" and self.secret:
+            return self.secret, ["HS256"]
+        if self._jwks is None or algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm {algorithm}")
+        kid = header.get("kid")
+        key = self._keys.get(kid)
+        if key is None:
+            if not self._may_fetch(kid, time.monotonic()):
+                raise jwt.InvalidKeyError(f"Unknown signing key {kid}")
+            # First use of this key id (or a key rotation): fetch the key set off the event loop
+            self.stats["key_fetches"] += 1
+            key = self._keys[kid] = (await run_blocking(self._jwks.get_signing_key_from_jwt, token)).key
+            logger.info(f"Loaded JWT signing key {kid}")
+        return key, [algorithm]
+
+    def _may_fetch(self, kid: str, now: float) -> bool:
+        last = self._attempts.get(kid)
+        if last is not None and now - last < JWKS_REFRESH_INTERVAL:
+            return False
+        while self._fetches and now - self._fetches[0] >= JWKS_REFRESH_INTERVAL:
+            self._fetches.popleft()
+        if len(self._fetches) >= JWKS_MAX_FETCHES:
+            return False
+        self._fetches.append(now)
+        self._attempts[kid] = now
+        self._attempts.move_to_end(kid)
+        # Older attempts are outside the interval, since fetches within it are capped
+        while len(self._attempts) > JWKS_MAX_FETCHES:
+            self._attempts.popitem(last=False)
+        return True
+
+    async def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises jwt.PyJWTError otherwise."""
+        try:
+            key, algorithms = await self._key(token)
+            claims = jwt.decode(token, key, algorithms=algorithms, audience=self.audience, leeway=self.leeway,
+                                options={"require": ["exp", "sub"]})
+        except jwt.PyJWTError:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["verified"] += 1
+        return claims
+
+    def metrics(self) -> dict:
+        return {"enabled": self.enabled, "signing_keys": len(self._keys), **self.stats}
+
+_token_verifier: Optional[TokenVerifier] = None
+
+def get_token_verifier() -> TokenVerifier:
+    global _token_verifier
+    if _token_verifier is None:
+        _token_verifier = TokenVerifier()
+    return _token_verifier
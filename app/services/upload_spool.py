@@ -0,0 +1,54 @@
+import os
+import hashlib
+import logging
+import tempfile
+from fastapi import UploadFile
+from ..core.config import UPLOAD_CHUNK_SIZE, MAX_UPLOAD_BYTES, UPLOAD_SPOOL_DIR
+
+logger = logging.getLogger(__name__)
+
+class SpooledUpload:
+    """An upload copied to a temp file, with its size and sha256. Removes the file on close."""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+async def spool_upload(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE, max_bytes: int = MAX_UPLOAD_BYTES,
+                       directory: str = UPLOAD_SPOOL_DIR) -> SpooledUpload:
+    """Copy the request body to disk chunk by chunk, hashing as it goes.
+
+    Only one chunk of the upload is in memory at a time, whatever the file size.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    logger.debug(f"Spooled {size} bytes of {file.filename} to {path}")
+    return SpooledUpload(path, size, digest.hexdigest())
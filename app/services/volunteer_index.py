@@ -0,0 +1,200 @@
+import json
+import asyncio
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from supabase import Client
+from ..db.sql import changed_rows
+from ..core.config import VOLUNTEER_INDEX_PAGE_SIZE, VOLUNTEER_INDEX_SYNC_INTERVAL, CHANGE_CURSOR_LAG
+
+logger = logging.getLogger(__name__)
+
+def parse_embedding(value) -> Optional[np.ndarray]:
+    """pgvector columns come back from PostgREST as "[0.1,...]" strings."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+class VolunteerIndex:
+    """In-memory matrix of normalized political_standpoint embeddings.
+
+    Rows are profiles; role and location are kept as integer-coded columns so
+    filtering and scoring are a single vectorized pass. Updates are applied
+    incrementally and removals swap the last row into the freed slot. Profiles
+    changed by other workers arrive through an (updated_at, user_id) change
+    cursor (scripts/sql/profiles_changes.sql) that re-reads CHANGE_CURSOR_LAG
+    seconds behind itself for late commits.
+    """
+
+    def __init__(self, dim: int = 1536, capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._roles = np.zeros(capacity, dtype=np.int32)
+        self._locations = np.zeros(capacity, dtype=np.int32)
+        self._ids: List[str] = []
+        self._emails: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._versions: Dict[str, Optional[str]] = {}  # user_id -> updated_at of the applied profile
+        self._codes: Dict[str, Dict[str, int]] = {"role": {}, "location": {}}
+        self._names: Dict[str, List[str]] = {"role": [], "location": []}
+        self._cursor: Optional[Tuple[str, str]] = None  # (updated_at, user_id) of the last applied profile
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.stats = {"syncs": 0, "sync_failures": 0}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _code(self, column: str, value: Optional[str]) -> int:
+        value = value or ""
+        if value not in self._codes[column]:
+            self._codes[column][value] = len(self._names[column])
+            self._names[column].append(value)
+        return self._codes[column][value]
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_matrix", "_roles", "_locations"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self)] = old[:len(self)]
+            setattr(self, name, new)
+
+    def upsert(self, profile: dict) -> bool:
+        """Apply a profile; False when this version of it is already applied."""
+        if profile.get("updated_at") is not None and self._versions.get(profile["user_id"]) == profile["updated_at"]:
+            return False
+        vector = parse_embedding(profile.get("political_standpoint"))
+        if vector is None:
+            return self.remove(profile["user_id"])
+        row = self._rows.get(profile["user_id"])
+        if row is None:
+            row = len(self)
+            self._grow(row + 1)
+            self._rows[profile["user_id"]] = row
+            self._ids.append(profile["user_id"])
+            self._emails.append(profile.get("email"))
+        else:
+            self._emails[row] = profile.get("email")
+        self._matrix[row] = vector
+        self._roles[row] = self._code("role", profile.get("role"))
+        self._locations[row] = self._code("location", profile.get("location"))
+        self._versions[profile["user_id"]] = profile.get("updated_at")
+        return True
+
+    def remove(self, user_id: str) -> bool:
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return False
+        del self._versions[user_id]
+        last = len(self) - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._roles[row] = self._roles[last]
+            self._locations[row] = self._locations[last]
+            self._ids[row] = self._ids[last]
+            self._emails[row] = self._emails[last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._emails.pop()
+        return True
+
+    def top_k(self, query, k: int, role: str = "volunteer", exclude: Optional[str] = None,
+              location: Optional[str] = None) -> List[dict]:
+        """Return up to k profiles with the given role, most similar first."""
+        n = len(self)
+        if n == 0 or role not in self._codes["role"]:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        scores = self._matrix[:n] @ (query / np.linalg.norm(query))
+        mask = self._roles[:n] != self._codes["role"][role]
+        if location is not None:
+            mask |= self._locations[:n] != self._codes["location"].get(location, -1)
+        if exclude in self._rows:
+            mask[self._rows[exclude]] = True
+        scores[mask] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "user_id": self._ids[row],
+                "email": self._emails[row],
+                "location": self._names["location"][self._locations[row]],
+                "similarity": float(scores[row])
+            }
+            for row in top if scores[row] != -np.inf
+        ]
+
+    async def sync(self, supabase: Client) -> int:
+        """Apply profiles changed since the last sync; returns the number of changes."""
+        async with self._lock:
+            changes = 0
+            async for profiles in changed_rows(
+                supabase, "profiles", "user_id, email, location, role, political_standpoint, updated_at",
+                "updated_at", self._cursor, VOLUNTEER_INDEX_PAGE_SIZE, key="user_id", lag=CHANGE_CURSOR_LAG
+            ):
+                changes += sum(self.upsert(profile) for profile in profiles)
+                self._cursor = (profiles[-1]["updated_at"], str(profiles[-1]["user_id"]))
+            self.loaded = True
+            self.stats["syncs"] += 1
+            return changes
+
+    async def ensure_loaded(self, supabase: Client):
+        if not self.loaded:
+            await self.sync(supabase)
+            logger.info(f"Volunteer index loaded with {len(self)} profiles")
+
+    async def start(self, supabase: Client, interval: float = VOLUNTEER_INDEX_SYNC_INTERVAL):
+        """Load the index, then keep following the change cursor in the background."""
+        await self.ensure_loaded(supabase)
+        if self._task is None:
+            self._task = asyncio.create_task(self._follow(supabase, interval))
+
+    async def _follow(self, supabase: Client, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changes = await self.sync(supabase)
+                if changes:
+                    logger.debug(f"Volunteer index applied {changes} changes")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["sync_failures"] += 1
+                logger.error(f"Volunteer index sync failed: {str(e)}", exc_info=True)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "profiles": len(self),
+            "capacity": self._matrix.shape[0],
+            "loaded": self.loaded,
+            "cursor": self._cursor[0] if self._cursor else None,
+            **self.stats
+        }
+
+_volunteer_index: Optional[VolunteerIndex] = None
+
+def get_volunteer_index() -> VolunteerIndex:
+    global _volunteer_index
+    if _volunteer_index is None:
+        _volunteer_index = VolunteerIndex()
+    return _volunteer_index
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.document_index import DocumentIndex
+from app.db.sql import execute
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("benchmark_document_index.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def recall(found: list, expected: list) -> float:
+    return len(set(found) & set(expected)) / len(expected) if expected else 1.0
+
+def timed_search(index: DocumentIndex, queries: np.ndarray, k: int, nprobe: int = None):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([row["chunk_id"] for row in index.search(query, k, nprobe=nprobe)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+def run_synthetic(sizes: list, dim: int, queries: int, k: int, nprobes: list):
+    """Recall and latency of IVF probing against an exact scan of the same rows."""
+    rng = np.random.default_rng(42)
+    for size in sizes:
+        # Clustered data: real document embeddings are far from uniformly spread
+        centers = rng.standard_normal((max(1, size // 100), dim), dtype=np.float32)
+        vectors = centers[rng.integers(0, len(centers), size)] + 0.3 * rng.standard_normal((size, dim), dtype=np.float32)
+        index = DocumentIndex(dim=dim, capacity=size, min_ivf_rows=size + 1)
+        for i, vector in enumerate(vectors):
+            index.upsert({"chunk_id": str(i), "document_id": str(i), "embedding": vector})
+        query_vectors = vectors[rng.integers(0, size, queries)] + 0.3 * rng.standard_normal((queries, dim), dtype=np.float32)
+
+        expected, latencies = timed_search(index, query_vectors, k)
+        logger.info(f"{size:>8} rows, dim {dim}: exact p50={percentile(latencies, 0.5):.3f}ms p95={percentile(latencies, 0.95):.3f}ms")
+        start = time.perf_counter()
+        index.train()
+        logger.info(f"{size:>8} rows: trained {index.metrics()['ivf_lists']} lists in {time.perf_counter() - start:.2f}s")
+        for nprobe in nprobes:
+            found, latencies = timed_search(index, query_vectors, k, nprobe)
+            logger.info(f"{size:>8} rows: nprobe={nprobe:<4} recall@{k}={np.mean([recall(f, e) for f, e in zip(found, expected)]):.3f} "
+                        f"p50={percentile(latencies, 0.5):.3f}ms p95={percentile(latencies, 0.95):.3f}ms")
+
+async def run_rpc(queries: int, k: int, nprobes: list):
+    """Local mirror against the match_campaign_documents RPC on the live corpus."""
+    load_dotenv()
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    index = DocumentIndex()
+    start = time.perf_counter()
+    await index.sync(supabase)
+    logger.info(f"Loaded {len(index)} rows in {time.perf_counter() - start:.2f}s")
+    if len(index) == 0:
+        logger.warning("document_embeddings is empty; nothing to compare")
+        return
+    if len(index) >= index.min_ivf_rows:
+        index.train()
+
+    rng = np.random.default_rng(42)
+    rows = rng.integers(0, len(index), queries)
+    query_vectors = index._matrix[rows] + 0.05 * rng.standard_normal((queries, index.dim), dtype=np.float32)
+    campaign_ids = sorted({meta["campaign_id"] for meta in index._meta if meta["campaign_id"]})
+
+    expected, rpc_latencies = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        response = await execute(supabase.rpc("match_campaign_documents", {
+            "query_embedding": query.tolist(),
+            "match_count": k,
+            "filter_campaign_ids": campaign_ids,
+            "filter_document_ids": list(index._document_codes),
+            "include_shared": True
+        }))
+        rpc_latencies.append((time.perf_counter() - start) * 1000)
+        expected.append([str(row["chunk_id"]) for row in response.data])
+    logger.info(f"RPC: p50={percentile(rpc_latencies, 0.5):.1f}ms p95={percentile(rpc_latencies, 0.95):.1f}ms")
+    for nprobe in nprobes:
+        found, latencies = timed_search(index, query_vectors, k, nprobe)
+        logger.info(f"Local nprobe={nprobe:<4} recall@{k} vs RPC={np.mean([recall(f, e) for f, e in zip(found, expected)]):.3f} "
+                    f"p50={percentile(latencies, 0.5):.3f}ms p95={percentile(latencies, 0.95):.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-process document index: recall versus latency")
+    parser.add_argument("--rpc", action="store_true", help="Compare against match_campaign_documents on the configured Supabase project")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated row counts for the synthetic run")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--nprobes", default="1,4,8,16,32")
+    args = parser.parse_args()
+    nprobes = [int(n) for n in args.nprobes.split(",")]
+    if args.rpc:
+        asyncio.run(run_rpc(args.queries, args.k, nprobes))
+    else:
+        run_synthetic([int(s) for s in args.sizes.split(",")], args.dim, args.queries, args.k, nprobes)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"Document index benchmark failed: {str(e)}", exc_info=True)
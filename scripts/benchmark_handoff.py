@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.config import HANDOFF_SIMILARITY_LOW, HANDOFF_SIMILARITY_HIGH
+from app.services.handoff_classifier import HandoffClassifier, HANDOFF_PROMPT
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("benchmark_handoff.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "handoff_benchmark.jsonl")
+
+def load_dataset(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def run_benchmark(dataset: list, mode: str, low: float, high: float):
+    embeddings = llm = None
+    if mode != "regex":
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model="text-embedding-ada-002", openai_api_key=os.getenv("OPENAI_API_KEY"))
+    if mode == "full":
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(model="gpt-4o-mini", openai_api_key=os.getenv("OPENAI_API_KEY"))
+    classifier = HandoffClassifier(embeddings, low=low, high=high)
+    if embeddings is not None:
+        await classifier._intent_matrix()  # Precompute outside the timed loop, as the service does once
+
+    tp = fp = fn = tn = 0
+    latencies = []
+    tiers = {}
+    for example in dataset:
+        message, expected = example["message"], example["handoff"]
+        start = time.perf_counter()
+        if mode == "regex":
+            decision, tier, score = classifier.match_phrase(message), "regex", 0.0
+        else:
+            decision, tier, score = await classifier.classify(message)
+            if decision is None:
+                if llm is not None:
+                    response = await llm.ainvoke(HANDOFF_PROMPT.format(message=message))
+                    decision = response.content.strip().lower() == "true"
+                else:
+                    decision = False  # Local mode: count ambiguous messages as non-handoffs
+        latencies.append((time.perf_counter() - start) * 1000)
+        tiers[tier] = tiers.get(tier, 0) + 1
+        if decision and expected:
+            tp += 1
+        elif decision:
+            fp += 1
+            logger.info(f"False positive ({tier}, {score:.3f}): {message}")
+        elif expected:
+            fn += 1
+            logger.info(f"False negative ({tier}, {score:.3f}): {message}")
+        else:
+            tn += 1
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    logger.info(f"Mode: {mode}, thresholds: low={low}, high={high}, examples: {len(dataset)}")
+    logger.info(f"Precision: {precision:.3f}, Recall: {recall:.3f}, TP={tp} FP={fp} FN={fn} TN={tn}")
+    logger.info(f"Decisions by tier: {tiers}")
+    logger.info(f"Latency ms: mean={sum(latencies) / len(latencies):.2f}, p50={percentile(latencies, 0.5):.2f}, p95={percentile(latencies, 0.95):.2f}")
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Measure handoff classifier precision/recall and latency on a labelled set")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--mode", choices=["regex", "local", "full"], default="local",
+                        help="regex: phrase tier only; local: regex + similarity; full: local tiers with LLM escalation")
+    parser.add_argument("--low", type=float, default=HANDOFF_SIMILARITY_LOW)
+    parser.add_argument("--high", type=float, default=HANDOFF_SIMILARITY_HIGH)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(load_dataset(args.dataset), args.mode, args.low, args.high))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"Handoff benchmark failed: {str(e)}", exc_info=True)
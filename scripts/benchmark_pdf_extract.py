@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import PyPDF2
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.pdf_extract import extract_pages, get_pdf_pool, shutdown_pdf_pool
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("benchmark_pdf_extract.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "data", "pdfs", "president-trump-platinum-plan-final-version.pdf")
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def inline_extract(content: bytes) -> str:
+    """The previous upload_pdf path: PyPDF2 on the event loop with repeated concatenation."""
+    pdf_reader = PyPDF2.PdfReader(BytesIO(content))
+    text = ""
+    for page in pdf_reader.pages:
+        text += page.extract_text() or ""
+    return text
+
+async def pooled_extract(content: bytes) -> str:
+    return "".join([text async for _, text in extract_pages(content)])
+
+async def chat_probe(stop: asyncio.Event, interval: float, delays: list):
+    """Stands in for a websocket chat turn: how late does a coroutine that wants the loop every interval get it?"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        delays.append((time.perf_counter() - start - interval) * 1000)
+
+async def measure(name: str, extract, content: bytes, uploads: int, interval: float):
+    delays: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(chat_probe(stop, interval, delays))
+    await asyncio.sleep(interval * 3)
+    start = time.perf_counter()
+    texts = await asyncio.gather(*(extract(content) for _ in range(uploads)))
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    await probe
+    logger.info(f"{name:<8} {uploads} concurrent upload(s): {elapsed:8.1f}ms total, {len(texts[0])} chars; "
+                f"chat delay while extracting p50={percentile(delays, 0.5):.1f}ms "
+                f"p99={percentile(delays, 0.99):.1f}ms max={max(delays, default=0.0):.1f}ms")
+
+async def run_benchmark(path: str, uploads: int, repeat: int, interval: float):
+    with open(path, "rb") as f:
+        content = f.read()
+    logger.info(f"{os.path.basename(path)}: {len(content)} bytes, {len(PyPDF2.PdfReader(BytesIO(content)).pages)} pages, "
+                f"{get_pdf_pool()._max_workers} extraction workers")
+    await pooled_extract(content)  # Start the worker processes outside the measurement
+    for _ in range(repeat):
+        await measure("inline", inline_extract, content, uploads, interval)
+        await measure("pool", pooled_extract, content, uploads, interval)
+    shutdown_pdf_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction on the event loop versus the process pool")
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--uploads", type=int, default=1, help="Concurrent uploads of the same file")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="How often the simulated chat wants the event loop")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.pdf, args.uploads, args.repeat, args.interval_ms / 1000))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"PDF extraction benchmark failed: {str(e)}", exc_info=True)
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.volunteer_index import VolunteerIndex
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("benchmark_volunteer_index.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+LOCATIONS = ["Boston", "New York", "Chicago", "Atlanta", "Houston", "Phoenix", "Denver", "Seattle"]
+
+def build_index(size: int, dim: int, rng: np.random.Generator) -> VolunteerIndex:
+    index = VolunteerIndex(dim=dim, capacity=size)
+    batch = 10000
+    for start in range(0, size, batch):
+        vectors = rng.standard_normal((min(batch, size - start), dim), dtype=np.float32)
+        for offset, vector in enumerate(vectors):
+            i = start + offset
+            index.upsert({
+                "user_id": f"user-{i}",
+                "email": f"user-{i}@example.com",
+                "location": LOCATIONS[i % len(LOCATIONS)],
+                "role": "volunteer" if i % 3 == 0 else "user",
+                "political_standpoint": vector
+            })
+    return index
+
+def naive_best_match(index: VolunteerIndex, query: np.ndarray) -> str:
+    """The old per-profile loop, minus the network round trip per profile."""
+    volunteer = index._codes["role"]["volunteer"]
+    best, best_score = None, -np.inf
+    for row in range(len(index)):
+        if index._roles[row] != volunteer:
+            continue
+        score = float(np.dot(index._matrix[row], query))
+        if score > best_score:
+            best, best_score = index._ids[row], score
+    return best
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def run_benchmark(sizes: list, dim: int, queries: int, k: int, naive_limit: int, rtt_ms: float):
+    rng = np.random.default_rng(42)
+    for size in sizes:
+        start = time.perf_counter()
+        index = build_index(size, dim, rng)
+        build_s = time.perf_counter() - start
+        query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+        query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+        latencies = []
+        for query in query_vectors:
+            start = time.perf_counter()
+            matches = index.top_k(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        logger.info(f"{size:>9} profiles, dim {dim}: build {build_s:.2f}s ({size / build_s:,.0f} upserts/s), "
+                    f"top-{k} p50={percentile(latencies, 0.5):.3f}ms p95={percentile(latencies, 0.95):.3f}ms, "
+                    f"matrix {index._matrix.nbytes / 2**20:,.0f} MiB")
+
+        if size <= naive_limit:
+            start = time.perf_counter()
+            for query in query_vectors[:5]:
+                assert naive_best_match(index, query) == index.top_k(query, 1)[0]["user_id"]
+            naive_ms = (time.perf_counter() - start) * 1000 / 5
+            logger.info(f"{size:>9} profiles: per-profile loop {naive_ms:.1f}ms CPU only, "
+                        f"plus ~{size * rtt_ms / 1000:,.1f}s of cosine_distance RPCs at {rtt_ms}ms each")
+        del index
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VolunteerIndex top-k against the per-profile matching loop")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="Comma-separated profile counts; 1M profiles at dim 1536 need about 6 GiB")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--naive-limit", type=int, default=100000, help="Largest size to also time the per-profile loop on")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="Assumed Supabase round trip for the old RPC-per-profile cost")
+    args = parser.parse_args()
+    run_benchmark([int(s) for s in args.sizes.split(",")], args.dim, args.queries, args.k, args.naive_limit, args.rtt_ms)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"Volunteer index benchmark failed: {str(e)}", exc_info=True)
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.config import UPLOAD_CHUNK_SIZE
+from app.schemas.document import IngestJobStatus
+from app.services.document_service import DocumentService
+from app.services.ingest import chunk_pages
+from app.services.pdf_extract import extract_pages, shutdown_pdf_pool
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("bulk_ingest.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "pdfs")
+
+class FileItem:
+    """One PDF moving through the pipeline; each stage fills in its part."""
+
+    def __init__(self, path: str, root: str, sha256: str, size: int):
+        self.path = path
+        # The path under the ingest root names the document, so a/report.pdf and b/report.pdf stay apart
+        self.file_name = os.path.relpath(path, root).replace(os.sep, "/")
+        self.sha256 = sha256
+        self.size = size
+        self.document_id: Optional[str] = None
+        self.replace = False
+        self.pages: List[str] = []
+        self.chunks: List[dict] = []
+        self.embeddings: List[List[float]] = []
+        self.progress = IngestJobStatus(job_id=sha256, file_name=self.file_name, created_at=datetime.now(timezone.utc))
+
+class Checkpoint:
+    """Files already stored, as {path: sha256}; rewritten atomically after every file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = json.load(f)
+            logger.info(f"Resuming from {path}: {len(self.done)} files already ingested")
+
+    def contains(self, path: str, sha256: str) -> bool:
+        return self.done.get(path) == sha256
+
+    def mark(self, path: str, sha256: str):
+        self.done[path] = sha256
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.done, f)
+        os.replace(tmp, self.path)
+
+class Stage:
+    """A pool of workers between two bounded queues, with throughput counters.
+
+    A None on the inbox means upstream is done; once every worker has seen it the
+    stage sends one None per downstream worker. Items that fail are logged and
+    dropped, so they stay out of the checkpoint and the next run retries them.
+    """
+
+    def __init__(self, name: str, unit: str, func: Callable[[FileItem], Awaitable[int]], workers: int,
+                 inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        self.name = name
+        self.unit = unit
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream_workers = 0
+        self.files = 0
+        self.units = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    async def _work(self):
+        while True:
+            item = await self.inbox.get()
+            if item is None:
+                return
+            if self.started is None:
+                self.started = time.perf_counter()
+            begin = time.perf_counter()
+            try:
+                units = await self.func(item)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"{self.name} failed for {item.path}: {str(e)}", exc_info=True)
+                continue
+            finally:
+                self.busy += time.perf_counter() - begin
+            self.files += 1
+            self.units += units
+            if self.outbox is not None:
+                await self.outbox.put(item)
+
+    async def run(self):
+        await asyncio.gather(*(self._work() for _ in range(self.workers)))
+        self.finished = time.perf_counter()
+        if self.outbox is not None:
+            for _ in range(self.downstream_workers):
+                await self.outbox.put(None)
+
+    def report(self) -> str:
+        elapsed = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        rate = self.units / elapsed if elapsed else 0.0
+        return (f"{self.name}: {self.files} files, {self.units} {self.unit} "
+                f"({rate:.1f} {self.unit}/sec, busy {self.busy:.1f}s, {self.failed} failed, "
+                f"{self.inbox.qsize()} waiting)")
+
+def find_pdfs(directory: str) -> List[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+    return sorted(os.path.abspath(path) for path in paths)
+
+def hash_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def ingest_directory(args):
+    service = DocumentService()
+    if args.campaign_id:
+        try:
+            await service.check_campaign(args.campaign_id)
+        except ValueError:
+            await service.close()
+            raise
+    checkpoint = Checkpoint(args.checkpoint)
+    root = os.path.abspath(args.directory)
+    paths = find_pdfs(root)
+    logger.info(f"Found {len(paths)} PDFs under {args.directory}")
+
+    async def extract(item: FileItem) -> int:
+        async for _, text in extract_pages(item.path):
+            item.pages.append(text)
+        return len(item.pages)
+
+    async def chunk(item: FileItem) -> int:
+        item.chunks = await asyncio.to_thread(chunk_pages, item.pages)
+        item.pages = []  # Page text is no longer needed once chunked
+        if not item.chunks:
+            raise ValueError(f"No extractable text in {item.file_name}")
+        return len(item.chunks)
+
+    async def embed(item: FileItem) -> int:
+        item.embeddings = await service.embed_new_chunks(item.chunks, item.progress)
+        return len(item.chunks)
+
+    async def store(item: FileItem) -> int:
+        # Nothing searches in this process; the server's indexes follow the change cursor, and their
+        # syncs bump the document set version, which clears its answer and graph caches
+        stored = await service.store(item.path, item.sha256, item.document_id, item.chunks, item.embeddings,
+                                     item.file_name, args.user_id, args.campaign_id, item.replace, item.progress,
+                                     update_indexes=False)
+        checkpoint.mark(item.path, item.sha256)
+        logger.info(f"Ingested {item.file_name}: {stored} chunks, {item.progress.chunks_reused} embeddings reused")
+        return stored
+
+    queues = [asyncio.Queue(maxsize=args.queue_size) for _ in range(4)]
+    stages = [
+        Stage("extract", "pages", extract, args.extract_workers, queues[0], queues[1]),
+        Stage("chunk", "chunks", chunk, args.chunk_workers, queues[1], queues[2]),
+        Stage("embed", "chunks", embed, args.embed_workers, queues[2], queues[3]),
+        Stage("store", "chunks", store, args.store_workers, queues[3], None),
+    ]
+    for stage, downstream in zip(stages, stages[1:]):
+        stage.downstream_workers = downstream.workers
+
+    queued = set()  # Hashes sent down the pipeline in this run
+    duplicates: List[FileItem] = []  # Same bytes as a queued file; not in the database until that one is stored
+
+    async def feed():
+        """Hash each file and skip what the checkpoint, the database or this run already has."""
+        skipped = 0
+        for path in paths:
+            sha256 = await asyncio.to_thread(hash_file, path)
+            if checkpoint.contains(path, sha256):
+                skipped += 1
+                continue
+            item = FileItem(path, root, sha256, os.path.getsize(path))
+            if sha256 in queued:
+                duplicates.append(item)
+                continue
+            existing, previous = await service.check_existing(sha256, item.file_name, args.campaign_id)
+            if existing:
+                await service.reuse(existing, item.file_name, sha256, args.campaign_id)
+                checkpoint.mark(path, sha256)
+                skipped += 1
+                continue
+            item.replace = previous is not None
+            item.document_id = previous["document_id"] if previous else str(uuid4())
+            queued.add(sha256)
+            await queues[0].put(item)  # Blocks while extraction is behind, bounding memory
+        for _ in range(stages[0].workers):
+            await queues[0].put(None)
+        logger.info(f"Queued {len(queued)} PDFs, skipped {skipped} already ingested and {len(duplicates)} duplicates")
+
+    async def reuse_duplicates() -> int:
+        """Point duplicates at the document stored for their bytes; returns how many had none."""
+        unresolved = 0
+        for item in duplicates:
+            existing, _ = await service.check_existing(item.sha256, item.file_name, args.campaign_id)
+            if existing is None:
+                unresolved += 1
+                logger.warning(f"{item.file_name} duplicates a file that failed to ingest; run again to retry it")
+                continue
+            await service.reuse(existing, item.file_name, item.sha256, args.campaign_id)
+            checkpoint.mark(item.path, item.sha256)
+        return unresolved
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.report_interval)
+            for stage in stages:
+                logger.info(stage.report())
+
+    started = time.perf_counter()
+    reporter = asyncio.create_task(report())
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(stage.run()) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+        unresolved = await reuse_duplicates()
+    finally:
+        # A failed feed or stage would leave the others waiting on their queues
+        for task in tasks + [reporter]:
+            task.cancel()
+        shutdown_pdf_pool()
+        await service.close()
+    logger.info(f"Finished in {time.perf_counter() - started:.1f}s")
+    for stage in stages:
+        logger.info(stage.report())
+    return sum(stage.failed for stage in stages) + unresolved
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDFs with a concurrent, resumable pipeline")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_DIRECTORY, help="Directory searched for *.pdf")
+    parser.add_argument("--user-id", required=True, help="Profile id recorded as uploaded_by")
+    parser.add_argument("--campaign-id", default=None, help="Campaign to ingest into (shared when omitted)")
+    parser.add_argument("--checkpoint", default="bulk_ingest.checkpoint.json", help="Progress file used to resume")
+    parser.add_argument("--queue-size", type=int, default=4, help="Files buffered between stages")
+    parser.add_argument("--extract-workers", type=int, default=2)
+    parser.add_argument("--chunk-workers", type=int, default=1)
+    parser.add_argument("--embed-workers", type=int, default=2)
+    parser.add_argument("--store-workers", type=int, default=2)
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    try:
+        failed = asyncio.run(ingest_directory(args))
+        if failed:
+            logger.warning(f"{failed} files failed; run again to retry them")
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"Bulk ingest failed: {str(e)}", exc_info=True)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -54,6 +54,7 @@ def setup_supabase():
     
     # Verify pgvector extension (requires direct SQL, suggest manual check)
     logger.info("Please ensure 'pgvector' extension is enabled via Supabase SQL Editor with: CREATE EXTENSION IF NOT EXISTS vector;")
+    logger.info("Apply the SQL files in scripts/sql/ via Supabase SQL Editor (match_volunteers.sql is needed for VOLUNTEER_MATCH_STRATEGY=pgvector, document_embeddings_changes.sql for DOCUMENT_RETRIEVAL_BACKEND=local)")
     
     logger.info("Supabase client verification completed. Schema setup should be done via SQL Editor.")
 
@@ -0,0 +1,60 @@
+-- One row per chunk in document_embeddings. Run in the Supabase SQL Editor after
+-- match_campaign_documents.sql and document_embeddings_changes.sql.
+-- document_id stays the id of the uploaded file and is shared by its chunks.
+
+alter table document_embeddings add column if not exists chunk_id uuid not null default gen_random_uuid();
+alter table document_embeddings add column if not exists chunk_index int not null default 0;
+alter table document_embeddings add column if not exists page_number int;
+alter table document_embeddings add column if not exists start_offset int;
+alter table document_embeddings add column if not exists end_offset int;
+alter table document_embeddings add column if not exists token_count int;
+
+alter table document_embeddings drop constraint if exists document_embeddings_pkey;
+alter table document_embeddings add primary key (chunk_id);
+create unique index if not exists document_embeddings_chunk_idx on document_embeddings (document_id, chunk_index);
+-- Mirrors page through changes with an (updated_at, chunk_id) keyset
+drop index if exists document_embeddings_updated_idx;
+create index if not exists document_embeddings_updated_chunk_idx on document_embeddings (updated_at, chunk_id);
+
+-- Tombstones are per chunk now
+drop table if exists document_embeddings_deleted;
+create table document_embeddings_deleted (
+    chunk_id uuid primary key,
+    document_id uuid not null,
+    deleted_at timestamptz not null default now()
+);
+create index document_embeddings_deleted_at_idx on document_embeddings_deleted (deleted_at, chunk_id);
+
+create or replace function record_document_embedding_delete() returns trigger
+language plpgsql
+as $$
+begin
+    insert into document_embeddings_deleted (chunk_id, document_id) values (old.chunk_id, old.document_id)
+        on conflict (chunk_id) do update set deleted_at = now();
+    return old;
+end;
+$$;
+
+-- The result columns change, so the function has to be dropped first
+drop function if exists match_campaign_documents(vector, int, text[], text[], boolean);
+create function match_campaign_documents(
+    query_embedding vector(1536),
+    match_count int,
+    filter_campaign_ids text[],
+    filter_document_ids text[],
+    include_shared boolean default true
+)
+returns table (
+    chunk_id uuid, document_id uuid, campaign_id text, file_name text, chunk_index int, page_number int,
+    start_offset int, end_offset int, content text, similarity float
+)
+language sql stable
+as $$
+    select d.chunk_id, d.document_id, d.campaign_id, d.file_name, d.chunk_index, d.page_number,
+           d.start_offset, d.end_offset, d.content, 1 - (d.embedding <=> query_embedding) as similarity
+    from document_embeddings d
+    where (d.campaign_id = any(filter_campaign_ids) and d.document_id::text = any(filter_document_ids))
+       or (include_shared and d.campaign_id is null)
+    order by d.embedding <=> query_embedding
+    limit match_count;
+$$;
@@ -0,0 +1,8 @@
+-- Content-addressed ingest. Run in the Supabase SQL Editor after document_file_hash.sql.
+
+-- sha256 of the embedding model and chunk text; equal hashes share an embedding
+alter table document_embeddings add column if not exists chunk_sha256 text;
+create index if not exists document_embeddings_chunk_sha256_idx on document_embeddings (chunk_sha256);
+
+-- A revised upload replaces the document with the same name in the same campaign
+create index if not exists document_embeddings_file_name_idx on document_embeddings (file_name, campaign_id) where chunk_index = 0;
@@ -0,0 +1,39 @@
+-- Change cursor for the in-process document index (DOCUMENT_RETRIEVAL_BACKEND=local).
+-- Run in the Supabase SQL Editor after match_campaign_documents.sql.
+
+alter table document_embeddings add column if not exists updated_at timestamptz not null default now();
+create index if not exists document_embeddings_updated_idx on document_embeddings (updated_at);
+
+create or replace function touch_document_embeddings() returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists document_embeddings_touch on document_embeddings;
+create trigger document_embeddings_touch before update on document_embeddings
+    for each row execute function touch_document_embeddings();
+
+-- Deleted rows leave a tombstone so mirrors can drop them.
+create table if not exists document_embeddings_deleted (
+    document_id uuid primary key,
+    deleted_at timestamptz not null default now()
+);
+create index if not exists document_embeddings_deleted_at_idx on document_embeddings_deleted (deleted_at);
+
+create or replace function record_document_embedding_delete() returns trigger
+language plpgsql
+as $$
+begin
+    insert into document_embeddings_deleted (document_id) values (old.document_id)
+        on conflict (document_id) do update set deleted_at = now();
+    return old;
+end;
+$$;
+
+drop trigger if exists document_embeddings_tombstone on document_embeddings;
+create trigger document_embeddings_tombstone after delete on document_embeddings
+    for each row execute function record_document_embedding_delete();
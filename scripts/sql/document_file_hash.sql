@@ -0,0 +1,6 @@
+-- sha256 of the uploaded file, computed while the upload is spooled.
+-- Set on chunk 0 only after every chunk of the document is stored, so it also marks the document complete.
+-- Run in the Supabase SQL Editor after document_chunks.sql.
+
+alter table document_embeddings add column if not exists file_sha256 text;
+create index if not exists document_embeddings_file_sha256_idx on document_embeddings (file_sha256);
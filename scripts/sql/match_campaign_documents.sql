@@ -0,0 +1,29 @@
+-- Campaign-scoped document retrieval used by CampaignDocumentRetriever.
+-- Run in the Supabase SQL Editor.
+
+alter table document_embeddings add column if not exists campaign_id text;
+alter table document_embeddings add column if not exists content text;
+
+-- Rows of one campaign are found through this index and ranked exactly, so a
+-- query only touches the vectors of the campaigns the user belongs to.
+create index if not exists document_embeddings_campaign_idx
+    on document_embeddings (campaign_id, document_id);
+
+-- Rows without a campaign predate scoping and stay visible to every user.
+create or replace function match_campaign_documents(
+    query_embedding vector(1536),
+    match_count int,
+    filter_campaign_ids text[],
+    filter_document_ids text[],
+    include_shared boolean default true
+)
+returns table (document_id uuid, campaign_id text, file_name text, content text, similarity float)
+language sql stable
+as $$
+    select d.document_id, d.campaign_id, d.file_name, d.content, 1 - (d.embedding <=> query_embedding) as similarity
+    from document_embeddings d
+    where (d.campaign_id = any(filter_campaign_ids) and d.document_id::text = any(filter_document_ids))
+       or (include_shared and d.campaign_id is null)
+    order by d.embedding <=> query_embedding
+    limit match_count;
+$$;
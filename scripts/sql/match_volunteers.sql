@@ -0,0 +1,19 @@
+-- Server-side volunteer kNN used when VOLUNTEER_MATCH_STRATEGY=pgvector.
+-- Run in the Supabase SQL Editor.
+
+create index if not exists profiles_volunteer_standpoint_idx
+    on profiles using hnsw (political_standpoint vector_cosine_ops)
+    where role = 'volunteer';
+
+create or replace function match_volunteers(query_embedding vector(1536), match_count int, exclude_user_id uuid)
+returns table (user_id uuid, email text, location text, distance float)
+language sql stable
+as $$
+    select p.user_id, p.email, p.location, p.political_standpoint <=> query_embedding as distance
+    from profiles p
+    where p.role = 'volunteer'
+      and p.political_standpoint is not null
+      and p.user_id <> exclude_user_id
+    order by p.political_standpoint <=> query_embedding
+    limit match_count;
+$$;
@@ -0,0 +1,18 @@
+-- Change cursor for the in-process volunteer index (VOLUNTEER_MATCH_STRATEGY=index).
+-- Run in the Supabase SQL Editor.
+
+alter table profiles add column if not exists updated_at timestamptz not null default now();
+create index if not exists profiles_updated_idx on profiles (updated_at, user_id);
+
+create or replace function touch_profiles() returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists profiles_touch on profiles;
+create trigger profiles_touch before update on profiles
+    for each row execute function touch_profiles();
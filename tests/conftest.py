@@ -0,0 +1,85 @@
+import re
+import pytest
+from postgrest.exceptions import APIError
+
+KEYSET_FILTER = re.compile(r'(\w+)\.gt\."([^"]+)",and\(\w+\.eq\."[^"]+",(\w+)\.gt\.(.+)\)$')
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    """The slice of the PostgREST query builder used by changed_rows() and the write-behind log.
+
+    Timestamps compare as strings, so tests use one ISO format throughout.
+    """
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.order_by = []
+        self.after = None
+        self.since = None
+        self.rows = None
+        self.count = None
+
+    def select(self, columns: str):
+        return self
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def or_(self, filters: str):
+        column, timestamp, key, last = KEYSET_FILTER.match(filters).groups()
+        self.after = (timestamp, last)
+        return self
+
+    def gte(self, column: str, value: str):
+        self.since = (column, value)
+        return self
+
+    def order(self, column: str):
+        self.order_by.append(column)
+        return self
+
+    def limit(self, count: int):
+        self.count = count
+        return self
+
+    def execute(self):
+        self.db.requests += 1
+        if self.rows is not None:
+            self.db.insert(self.table, self.rows)
+            return FakeResponse(self.rows)
+        ordering = lambda row: tuple(str(row[column]) for column in self.order_by)
+        rows = sorted(self.db.tables.get(self.table, []), key=ordering)
+        if self.after is not None:
+            rows = [row for row in rows if ordering(row) > self.after]
+        if self.since is not None:
+            column, value = self.since
+            rows = [row for row in rows if str(row[column]) >= value]
+        return FakeResponse(rows[:self.count])
+
+class FakeSupabase:
+    """In-memory tables; `reject` decides which inserted rows make the whole insert fail."""
+
+    def __init__(self, **tables):
+        self.tables = {name: list(rows) for name, rows in tables.items()}
+        self.requests = 0
+        self.down = False
+        self.reject = lambda row: False
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def insert(self, table: str, rows):
+        if self.down:
+            raise ConnectionError("database unavailable")
+        if any(self.reject(row) for row in rows):
+            raise APIError({"code": "23503", "message": "insert violates foreign key constraint"})
+        self.tables.setdefault(table, []).extend(rows)
+
+@pytest.fixture
+def supabase():
+    return FakeSupabase()
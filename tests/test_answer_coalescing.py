@@ -0,0 +1,132 @@
+import asyncio
+import pytest
+from app.core.metrics import LatencyRecorder
+from app.services.chat_service import QA_FALLBACK, QA_TIMEOUT_FALLBACK, STILL_WORKING, ChatService, normalize_query
+from app.services.llm_hedging import HedgePolicy
+
+KEY = (normalize_query("What is the plan?"), 1, "scope")
+
+class FakeChain:
+    """RetrievalQA stand-in that streams `tokens` through the run's callbacks."""
+
+    def __init__(self, tokens=("Hel", "lo"), delay: float = 0.02, error: Exception = None):
+        self.tokens = tokens
+        self.delay = delay
+        self.error = error
+        self.runs = 0
+
+    async def ainvoke(self, inputs: dict, config: dict) -> dict:
+        self.runs += 1
+        handler = config["callbacks"][0]
+        for token in self.tokens:
+            await asyncio.sleep(self.delay)
+            await handler.on_llm_new_token(token)
+        if self.error is not None:
+            raise self.error
+        return {"result": "".join(self.tokens)}
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_json(self, frame: dict):
+        self.frames.append((frame["type"], frame.get("content")))
+
+def chat_service() -> ChatService:
+    service = object.__new__(ChatService)
+    service.inflight = {}
+    service.stats = {"answers_coalesced": 0}
+    service.latency = LatencyRecorder()
+    service.hedge = HedgePolicy()
+    return service
+
+def test_normalize_query_folds_retyped_questions():
+    assert normalize_query("  What is   the PLAN?! ") == normalize_query("what is the plan")
+
+def test_concurrent_readers_share_one_run():
+    async def run():
+        service, chain = chat_service(), FakeChain()
+        first = service.start_answer(chain, "What is the plan?", KEY)
+        await asyncio.sleep(0.03)  # The first token is buffered before the others join
+        second = service.start_answer(chain, "what is the plan", KEY)
+        third = service.start_answer(chain, "What is the plan", KEY)
+        replies = await asyncio.gather(
+            service.send_stream(FakeWebSocket(), first.tokens()),
+            service.send_stream(FakeWebSocket(), second.tokens()),
+            third.result()
+        )
+        return service, chain, replies, [first.claim_cache(), second.claim_cache()]
+
+    service, chain, replies, claims = asyncio.run(run())
+    assert replies == ["Hello"] * 3
+    assert chain.runs == 1
+    assert service.stats["answers_coalesced"] == 2
+    assert service.inflight == {}
+    assert claims == [True, False]  # Only one reader stores the shared answer
+
+def test_run_is_cancelled_once_every_reader_released():
+    async def run():
+        service = chat_service()
+        first = service.start_answer(FakeChain(), "q", KEY)
+        second = service.start_answer(FakeChain(), "q", KEY)
+        first.release()
+        await asyncio.sleep(0)
+        still_running = not first.task.done()
+        second.release()
+        await asyncio.gather(first.task, return_exceptions=True)
+        return service, first, still_running
+
+    service, answer, still_running = asyncio.run(run())
+    assert still_running
+    assert answer.task.cancelled()
+    assert KEY not in service.inflight
+
+def test_reader_past_its_deadline_does_not_cancel_the_others():
+    async def run():
+        service, chain = chat_service(), FakeChain(delay=0.05)
+        impatient = service.start_answer(chain, "q", KEY)
+        patient = service.start_answer(chain, "q", KEY)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(impatient.result(), 0.01)
+        return await patient.result(), chain.runs
+
+    assert asyncio.run(run()) == ("Hello", 1)
+
+def test_failed_run_reaches_every_reader_and_is_forgotten():
+    async def run():
+        service, chain = chat_service(), FakeChain(error=RuntimeError("LLM down"))
+        readers = [service.start_answer(chain, "q", KEY) for _ in range(2)]
+        results = await asyncio.gather(*(reader.result() for reader in readers), return_exceptions=True)
+        retry = service.start_answer(chain, "q", KEY)
+        retry.release()
+        return results, readers[0].succeeded(), retry is not readers[0]
+
+    results, succeeded, fresh = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not succeeded
+    assert fresh
+
+def test_stream_sends_status_then_fallback_after_deadline():
+    async def run():
+        service, websocket = chat_service(), FakeWebSocket()
+        pending = service.start_answer(FakeChain(delay=1.0), "q", KEY)
+        reply = await service.send_stream(websocket, pending.tokens(), lambda: "cached answer",
+                                           soft_deadline=0.01, deadline=0.05)
+        await asyncio.gather(pending.task, return_exceptions=True)
+        return service, websocket.frames, reply, pending
+
+    service, frames, reply, pending = asyncio.run(run())
+    assert [frame[0] for frame in frames] == ["start", "status", "delta", "end"]
+    assert frames[1][1] == STILL_WORKING
+    assert reply == "cached answer"
+    assert pending.task.cancelled()  # The stream was the only reader
+    assert service.hedge.stats["answer"]["deadline_exceeded"] == 1
+
+def test_stream_without_fallback_and_failed_run():
+    async def run(chain: FakeChain, **deadlines):
+        service, websocket = chat_service(), FakeWebSocket()
+        pending = service.start_answer(chain, "q", KEY)
+        return await service.send_stream(websocket, pending.tokens(), **deadlines)
+
+    assert asyncio.run(run(FakeChain(delay=1.0), deadline=0.01)) == QA_TIMEOUT_FALLBACK
+    assert asyncio.run(run(FakeChain(tokens=(), error=RuntimeError("LLM down")))) == QA_FALLBACK
@@ -61,8 +61,46 @@ async def test_chat():
     except Exception as e:
         logger.error(f"Chat test failed: {str(e)}", exc_info=True)
 
+async def test_chat_stream():
+    try:
+        # Login to get JWT token
+        response = requests.post(f"{HTTP_BASE_URL}/auth/login", json=ADMIN_CREDENTIALS)
+        logger.info(f"POST /auth/login - Status: {response.status_code}, Response: {response.text}")
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        # Connect to WebSocket in streaming mode
+        async with websockets.connect(f"{WS_BASE_URL}/chat/ws?stream=true") as websocket:
+            await websocket.send(token)
+            logger.debug(f"Sent JWT token: {token}")
+
+            for message in TEST_MESSAGES:
+                logger.debug(f"Sending message: {message}")
+                await websocket.send(message)
+                tokens = []
+                while True:
+                    frame = await websocket.recv()
+                    try:
+                        frame = json.loads(frame)
+                    except json.JSONDecodeError:
+                        logger.info(f"Received non-stream frame: {frame}")
+                        continue
+                    if frame.get("type") == "delta":
+                        tokens.append(frame["content"])
+                    elif frame.get("type") == "end":
+                        assert frame["content"] == "".join(tokens)
+                        logger.info(f"Received streamed response ({len(tokens)} deltas): {frame['content']}")
+                        break
+
+            await websocket.close()
+            logger.info("WebSocket closed")
+
+    except Exception as e:
+        logger.error(f"Streaming chat test failed: {str(e)}", exc_info=True)
+
 def run_tests():
     asyncio.run(test_chat())
+    asyncio.run(test_chat_stream())
 
 if __name__ == "__main__":
     run_tests()
\ No newline at end of file
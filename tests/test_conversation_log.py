@@ -0,0 +1,56 @@
+import asyncio
+from app.db.sql import ConversationLogWriter
+
+def buffer(writer: ConversationLogWriter, messages):
+    for message in messages:
+        writer._buffer.append({"user_id": "u1", "conversation_id": "c1", "message": message, "sender": "user",
+                               "created_at": message})
+
+def writer_with(supabase, messages) -> ConversationLogWriter:
+    writer = ConversationLogWriter(supabase, batch_size=10)
+    buffer(writer, messages)
+    return writer
+
+def test_rows_are_kept_while_the_database_is_down(supabase):
+    supabase.down = True
+    writer = writer_with(supabase, ["a", "b", "c"])
+    for _ in range(3):
+        asyncio.run(writer.flush())
+    assert supabase.requests == 3  # One insert per flush; an outage is not bisected
+    assert writer.metrics()["queue_depth"] == 3
+    assert writer.stats["rejected"] == 0
+    supabase.down = False
+    asyncio.run(writer.flush())
+    assert [row["message"] for row in supabase.tables["conversations"]] == ["a", "b", "c"]
+    assert writer.metrics()["queue_depth"] == 0
+
+def test_bad_rows_are_dropped_and_the_rest_written_in_order(supabase):
+    supabase.reject = lambda row: row["message"] == "bad"
+    writer = writer_with(supabase, ["a", "bad", "c", "d"])
+    asyncio.run(writer.flush())
+    assert [row["message"] for row in supabase.tables["conversations"]] == ["a", "c", "d"]
+    assert writer.stats["rejected"] == 1
+    assert writer.metrics()["queue_depth"] == 0
+
+def test_a_batch_of_only_bad_rows_does_not_block_the_log(supabase):
+    supabase.reject = lambda row: row["message"].startswith("bad")
+    writer = writer_with(supabase, ["bad 1", "bad 2"])
+    asyncio.run(writer.flush())
+    buffer(writer, ["e"])
+    asyncio.run(writer.flush())
+    assert [row["message"] for row in supabase.tables["conversations"]] == ["e"]
+    assert writer.stats["rejected"] == 2
+
+def test_outage_during_a_split_requeues_only_unwritten_rows(supabase):
+    supabase.reject = lambda row: row["message"] == "bad"
+    writer = writer_with(supabase, ["a", "b", "bad", "d"])
+    inserts = supabase.insert
+
+    def insert(table, rows):
+        inserts(table, rows)
+        supabase.down = True  # The database goes away after the first successful insert
+
+    supabase.insert = insert
+    asyncio.run(writer.flush())
+    assert [row["message"] for row in supabase.tables["conversations"]] == ["a", "b"]
+    assert [row["message"] for row in writer._buffer] == ["bad", "d"]
@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+from app.services import conversation_summarizer
+from app.services.conversation_summarizer import ConversationSummarizer
+
+class FakeLLM:
+    """Answers each fold with a numbered summary once `release` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.prompts = []
+
+    async def ainvoke(self, prompt: str):
+        self.prompts.append(prompt)
+        await self.release.wait()
+        return SimpleNamespace(content=f"summary {len(self.prompts)}")
+
+def test_fold_keeps_messages_that_arrived_while_it_ran():
+    async def run():
+        llm = FakeLLM()
+        summarizer = ConversationSummarizer(llm, every_n_turns=1)
+        summarizer.add_turn("c1", "q1", "a1")
+        await asyncio.sleep(0)
+        summarizer.add_turn("c1", "q2", "a2")
+        llm.release.set()
+        await summarizer._tasks["c1"]
+        return summarizer.current("c1")
+
+    assert asyncio.run(run()) == "summary 1\nRecent messages:\nuser: q2\nbot: a2"
+
+def test_fold_does_not_drop_unfolded_messages_after_overflow(monkeypatch):
+    monkeypatch.setattr(conversation_summarizer, "MAX_PENDING_MESSAGES", 4)
+
+    async def run():
+        llm = FakeLLM()
+        summarizer = ConversationSummarizer(llm, every_n_turns=1)
+        summarizer.add_turn("c1", "q1", "a1")
+        await asyncio.sleep(0)
+        for turn in (2, 3):  # Pushes q1/a1 out of the full deque while the fold runs
+            summarizer.add_turn("c1", f"q{turn}", f"a{turn}")
+        llm.release.set()
+        await summarizer._tasks["c1"]
+        return summarizer.current("c1")
+
+    assert asyncio.run(run()).endswith("user: q2\nbot: a2\nuser: q3\nbot: a3")
@@ -1,6 +1,7 @@
 import requests
 import logging
 import os
+import time
 from dotenv import load_dotenv
 
 # Configure logging
@@ -55,11 +56,32 @@ def test_upload_pdf(token):
             response = requests.post(f"{BASE_URL}/document/upload", files=files, headers=headers)
             logger.info(f"POST /document/upload - Status: {response.status_code}, Headers: {response.headers}, Response: {response.text}")
             response.raise_for_status()
+            assert response.status_code == 202, f"Expected 202 Accepted, got {response.status_code}"
             return response.json()
     except Exception as e:
         logger.error(f"POST /document/upload failed: {str(e)}", exc_info=True)
         raise
 
+def test_job_status(token, job_id, timeout=300):
+    """Test GET /document/jobs/{job_id}, polling until the ingest job finishes"""
+    try:
+        headers = {"Authorization": f"Bearer {token}"}
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = requests.get(f"{BASE_URL}/document/jobs/{job_id}", headers=headers)
+            logger.info(f"GET /document/jobs/{job_id} - Status: {response.status_code}, Response: {response.text}")
+            response.raise_for_status()
+            job = response.json()
+            if job["status"] == "succeeded":
+                return job
+            if job["status"] == "failed":
+                raise Exception(f"Ingest job failed: {job['error']}")
+            time.sleep(1)
+        raise TimeoutError(f"Ingest job {job_id} did not finish within {timeout}s")
+    except Exception as e:
+        logger.error(f"GET /document/jobs/{job_id} failed: {str(e)}", exc_info=True)
+        raise
+
 def run_tests():
     """Run all document endpoint tests"""
     try:
@@ -71,6 +93,10 @@ def run_tests():
         upload_response = test_upload_pdf(token)
         logger.info(f"Upload response: {upload_response}")
 
+        logger.info("Starting test: Ingest job status")
+        job = test_job_status(token, upload_response["job_id"])
+        logger.info(f"Ingest job: {job}")
+
         logger.info("All tests completed successfully")
     except Exception as e:
         logger.error(f"Test suite failed: {str(e)}", exc_info=True)
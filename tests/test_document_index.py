@@ -0,0 +1,77 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services.document_index import DocumentIndex
+
+DIM = 16
+T1, T2 = "2026-01-01T00:00:00+00:00", "2026-01-01T00:00:30+00:00"
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def row(index: int, vector, campaign_id=None, document_id=None, updated_at=T1) -> dict:
+    return {"chunk_id": f"c{index}", "document_id": document_id or f"d{index}", "campaign_id": campaign_id,
+            "chunk_index": 0, "content": f"chunk {index}", "embedding": vector.tolist(), "updated_at": updated_at}
+
+def test_ivf_search_finds_the_exact_neighbours():
+    vectors = unit_vectors(400)
+    index = DocumentIndex(dim=DIM, capacity=8, nprobe=20, min_ivf_rows=100)
+    for i, vector in enumerate(vectors):
+        index.upsert(row(i, vector))
+    index._maybe_train()
+    assert index.metrics()["ivf_lists"] == 20
+    hits = 0
+    for query in unit_vectors(20, seed=1):
+        exact = {f"c{i}" for i in np.argsort(-(vectors @ query))[:5]}
+        hits += len(exact & {result["chunk_id"] for result in index.search(query, 5)})
+    assert hits == 100  # Probing every list scores every row
+    approximate = index.search(unit_vectors(1, seed=2)[0], 5, nprobe=1)
+    assert 0 < len(approximate) <= 5
+
+def test_search_filters_campaigns_and_documents():
+    vectors = unit_vectors(3)
+    index = DocumentIndex(dim=DIM)
+    index.upsert(row(0, vectors[0], campaign_id="c1", document_id="d1"))
+    index.upsert(row(1, vectors[1], campaign_id="c1", document_id="d2"))
+    index.upsert(row(2, vectors[2]))
+    visible = index.search(vectors[0], 3, campaign_ids=["c1"], document_ids=["d1"])
+    assert sorted(result["chunk_id"] for result in visible) == ["c0", "c2"]
+    scoped = index.search(vectors[0], 3, campaign_ids=["c1"], document_ids=["d1"], include_shared=False)
+    assert [result["chunk_id"] for result in scoped] == ["c0"]
+    assert scoped[0]["similarity"] == pytest.approx(1.0)
+
+def test_remove_moves_the_last_row_into_the_gap():
+    vectors = unit_vectors(3)
+    index = DocumentIndex(dim=DIM)
+    for i, vector in enumerate(vectors):
+        index.upsert(row(i, vector))
+    index.remove("c0")
+    index.remove("missing")
+    assert len(index) == 2
+    assert index.search(vectors[2], 1)[0]["chunk_id"] == "c2"
+    assert index.search(vectors[0], 2)[0]["chunk_id"] != "c0"
+
+def test_sync_applies_only_new_changes_and_tombstones(supabase):
+    vectors = unit_vectors(3)
+    supabase.tables["document_embeddings"] = [row(i, vector) for i, vector in enumerate(vectors[:2])]
+    index = DocumentIndex(dim=DIM)
+    assert asyncio.run(index.sync(supabase)) == 2
+    assert asyncio.run(index.sync(supabase)) == 0  # Rows re-read behind the cursor are not changes
+    # Same timestamp as the cursor but a later chunk_id must still be picked up
+    supabase.tables["document_embeddings"].append(row(2, vectors[2]))
+    supabase.tables["document_embeddings_deleted"] = [{"chunk_id": "c0", "deleted_at": T2}]
+    assert asyncio.run(index.sync(supabase)) == 2
+    assert sorted(index._rows) == ["c1", "c2"]
+    assert index.metrics()["cursor"] == T1
+
+def test_sync_picks_up_rows_committed_behind_the_cursor(supabase):
+    vectors = unit_vectors(3)
+    supabase.tables["document_embeddings"] = [row(0, vectors[0], updated_at=T2)]
+    index = DocumentIndex(dim=DIM)
+    asyncio.run(index.sync(supabase))
+    # A transaction that started at T1 commits only now, behind the cursor at T2
+    supabase.tables["document_embeddings"].append(row(1, vectors[1], updated_at=T1))
+    assert asyncio.run(index.sync(supabase)) == 1
+    assert sorted(index._rows) == ["c0", "c1"]
+    assert asyncio.run(index.sync(supabase)) == 0
@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from app.db.neo4j import GraphReadCache
+
+DOCUMENTS = [{"campaign_id": "c1", "document_id": "d1"}]
+
+def campaigns(documents):
+    return [document["campaign_id"] for document in documents]
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache, loads = GraphReadCache(ttl=60), []
+
+        async def loader():
+            loads.append(None)
+            await asyncio.sleep(0.01)
+            return DOCUMENTS
+
+        results = await asyncio.gather(*(cache.get_or_load("u1", None, loader, campaigns) for _ in range(3)))
+        await cache.get_or_load("u1", None, loader, campaigns)
+        return results, len(loads), cache.stats
+
+    results, loads, stats = asyncio.run(run())
+    assert results == [DOCUMENTS] * 3
+    assert loads == 1
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 2, 1)
+
+def test_waiters_reload_when_the_leading_request_is_cancelled():
+    async def run():
+        cache = GraphReadCache(ttl=60)
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            return DOCUMENTS
+
+        leader = asyncio.create_task(cache.get_or_load("u1", "c1", loader, campaigns))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("u1", "c1", loader, campaigns))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == DOCUMENTS
+
+def test_empty_results_are_not_cached():
+    async def run():
+        cache, members = GraphReadCache(ttl=60), []
+
+        async def loader():
+            return list(members)
+
+        before = await cache.get_or_load("u1", "c1", loader, campaigns)
+        members.extend(DOCUMENTS)  # The user joins the campaign
+        return before, await cache.get_or_load("u1", "c1", loader, campaigns)
+
+    assert asyncio.run(run()) == ([], DOCUMENTS)
+
+def test_invalidation_by_user_and_campaign():
+    async def run():
+        cache = GraphReadCache(ttl=60)
+
+        async def loader():
+            return DOCUMENTS
+
+        for user_id in ("u1", "u2"):
+            await cache.get_or_load(user_id, None, loader, campaigns)
+        cache.invalidate_user("u1")
+        remaining = cache.metrics()["entries"]
+        cache.invalidate_campaign("c1")  # u2's "*" lookup includes c1
+        return remaining, cache.metrics()["entries"]
+
+    assert asyncio.run(run()) == (1, 0)
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from app.services.handoff_classifier import HandoffClassifier
+
+class FakeEmbeddings:
+    """Every text embeds to the same direction, so any message is as similar as `score`."""
+
+    def __init__(self, score: float):
+        self.vector = [score, (1 - score ** 2) ** 0.5]
+
+    async def aembed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def aembed_query(self, text):
+        return self.vector
+
+@pytest.mark.parametrize("message", [
+    "Can I speak with a real human please?",
+    "I need to talk to a person about volunteering.",
+    "Connect me to a volunteer",
+    "Put me through to a staff member",
+    "Transfer me to a live agent",
+    "I want human help with my registration",
+])
+def test_explicit_requests_match(message):
+    assert HandoffClassifier(None).match_phrase(message)
+
+@pytest.mark.parametrize("message", [
+    "Is the candidate a real person or an AI?",
+    "Can you connect me to the voter registration page?",
+    "put me through the steps to register",
+    "Will the president speak with an actual human rights group?",
+    "I want to talk to voters about human rights, what does the plan say?",
+    "Which volunteers will speak with the press?",
+])
+def test_questions_that_mention_people_do_not_match(message):
+    assert not HandoffClassifier(None).match_phrase(message)
+
+def test_messages_without_a_phrase_go_through_the_similarity_band():
+    def classify(score: float):
+        classifier = HandoffClassifier(FakeEmbeddings(score), low=0.8, high=0.9)
+        return asyncio.run(classifier.classify("Is the candidate a real person or an AI?"))[:2]
+
+    assert classify(0.95) == (True, "similarity")
+    assert classify(0.85) == (None, "llm")
+    assert classify(0.5) == (False, "similarity")
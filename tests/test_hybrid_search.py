@@ -0,0 +1,77 @@
+import asyncio
+from langchain_core.documents import Document
+from app.db.vector import document_set_version
+from app.services.hybrid_search import BM25Index, HybridRetriever, tokenize
+
+T1, T2, T3 = "2026-01-01T00:00:00+00:00", "2026-01-01T00:00:30+00:00", "2026-01-01T00:01:00+00:00"
+
+def row(chunk_id, document_id, chunk_index, content, updated_at, campaign_id=None):
+    return {"chunk_id": chunk_id, "document_id": document_id, "chunk_index": chunk_index, "content": content,
+            "updated_at": updated_at, "campaign_id": campaign_id, "file_name": "policy.pdf", "page_number": 1}
+
+def test_tokenize_drops_stopwords_and_keeps_compounds():
+    assert tokenize("What is the 2024 tax-credit for U.S. families?") == ["2024", "tax-credit", "u.s", "families"]
+
+def test_bm25_ranks_rarer_terms_higher_and_filters_campaigns():
+    index = BM25Index()
+    index.add_document("d1", [{"chunk_index": 0, "content": "housing policy and rent control"}], campaign_id="c1")
+    index.add_document("d2", [{"chunk_index": 0, "content": "housing policy and zoning"}], campaign_id="c2")
+    index.add_document("d3", [{"chunk_index": 0, "content": "housing policy overview"}])
+    hits = index.search("rent control housing", 3)
+    assert hits[0]["document_id"] == "d1"
+    visible = index.search("housing", 3, campaign_ids={"c2"}, include_shared=False)
+    assert [hit["document_id"] for hit in visible] == ["d2"]
+
+def test_add_document_replaces_earlier_revision():
+    index = BM25Index()
+    index.add_document("d1", [{"chunk_index": 0, "content": "old wording"}, {"chunk_index": 1, "content": "more"}])
+    index.add_document("d1", [{"chunk_index": 0, "content": "new wording"}])
+    assert len(index) == 1
+    assert index.search("old", 5) == []
+    index.remove_document("d1")
+    assert len(index) == 0 and index.metrics()["terms"] == 0
+
+def test_sync_follows_changes_and_tombstones_from_other_writers(supabase):
+    supabase.tables["document_embeddings"] = [row("a0", "d1", 0, "voter registration deadline", T1),
+                                              row("a1", "d1", 1, "polling station hours", T1)]
+    index = BM25Index()
+    assert asyncio.run(index.sync(supabase)) == 2
+    assert asyncio.run(index.sync(supabase)) == 0  # Rows re-read behind the cursor are not changes
+    # Another worker ingests d2 and revises d1: chunk 1 gets a new row, the old one a tombstone
+    supabase.tables["document_embeddings"][1] = row("a9", "d1", 1, "early voting locations", T2)
+    supabase.tables["document_embeddings"].append(row("b0", "d2", 0, "absentee ballot request", T2))
+    supabase.tables["document_embeddings_deleted"] = [{"chunk_id": "a1", "deleted_at": T2}]
+    asyncio.run(index.sync(supabase))
+    assert sorted(hit["text"] for hit in index.search("ballot voting polling", 5)) == \
+        ["absentee ballot request", "early voting locations"]
+    supabase.tables["document_embeddings_deleted"].append({"chunk_id": "b0", "deleted_at": T3})
+    assert asyncio.run(index.sync(supabase)) == 1
+    assert index.search("ballot", 5) == []
+
+def test_sync_picks_up_chunks_committed_behind_the_cursor(supabase):
+    supabase.tables["document_embeddings"] = [row("a0", "d1", 0, "voter registration deadline", T2)]
+    index = BM25Index()
+    asyncio.run(index.sync(supabase))
+    # A concurrent ingest that started at T1 commits only now, behind the cursor at T2
+    supabase.tables["document_embeddings"].append(row("b0", "d2", 0, "absentee ballot request", T1))
+    assert asyncio.run(index.sync(supabase)) == 1
+    assert [hit["document_id"] for hit in index.search("ballot", 5)] == ["d2"]
+    assert asyncio.run(index.sync(supabase)) == 0
+
+def test_sync_bumps_the_document_set_version_only_on_changes(supabase):
+    supabase.tables["document_embeddings"] = [row("a0", "d1", 0, "voter registration deadline", T1)]
+    index = BM25Index()
+    version = document_set_version.value
+    asyncio.run(index.sync(supabase))
+    assert document_set_version.value == version + 1  # Cached answers from before the ingest are dropped
+    asyncio.run(index.sync(supabase))
+    assert document_set_version.value == version + 1
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    def ranking(*names):
+        return [Document(page_content=name, metadata={"document_id": "d"}) for name in names]
+
+    retriever = HybridRetriever.model_construct(k=3, rrf_k=60)
+    fused = retriever.fuse(ranking("a", "b", "c", "d"), ranking("c", "a"))
+    assert [document.page_content for document in fused] == ["a", "c", "b"]
+    assert fused[0].metadata["rrf_score"] == 1 / 61 + 1 / 62
@@ -0,0 +1,33 @@
+import pytest
+from app.services.ingest import chunk_hash, chunk_pages
+
+class CharEncoding:
+    """One token per character, so token windows are easy to read off."""
+
+    def encode(self, text: str):
+        return [ord(char) for char in text]
+
+    def decode_with_offsets(self, tokens):
+        return "".join(chr(token) for token in tokens), list(range(len(tokens)))
+
+def test_windows_overlap_and_stay_within_a_page():
+    chunks = chunk_pages(["abcdefghij", "klm"], chunk_tokens=4, overlap=1, encoding=CharEncoding())
+    assert [chunk["content"] for chunk in chunks] == ["abcd", "defg", "ghij", "klm"]
+    assert [chunk["page_number"] for chunk in chunks] == [1, 1, 1, 2]
+    assert [chunk["chunk_index"] for chunk in chunks] == [0, 1, 2, 3]
+    assert (chunks[3]["start_offset"], chunks[3]["end_offset"]) == (10, 13)
+
+def test_offsets_point_into_the_concatenated_text():
+    pages = ["first page ", "   ", "second page"]
+    text = "".join(pages)
+    chunks = chunk_pages(pages, chunk_tokens=5, overlap=0, encoding=CharEncoding())
+    assert all(text[chunk["start_offset"]:chunk["end_offset"]] == chunk["content"] for chunk in chunks)
+    assert 2 not in {chunk["page_number"] for chunk in chunks}  # Blank pages yield no chunks
+
+def test_overlap_must_be_smaller_than_the_window():
+    with pytest.raises(ValueError):
+        chunk_pages(["text"], chunk_tokens=4, overlap=4, encoding=CharEncoding())
+
+def test_chunk_hash_depends_on_the_model():
+    assert chunk_hash("text", "model-a") != chunk_hash("text", "model-b")
+    assert chunk_hash("text", "model-a") == chunk_hash("text", "model-a")
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from app.services.llm_hedging import HedgePolicy, race, with_deadline
+
+def test_no_hedge_until_enough_samples():
+    policy = HedgePolicy(percentile=0.9, min_samples=3, max_rate=0.5)
+    for elapsed_ms in (100, 200):
+        policy.record("answer", elapsed_ms, hedged=False, hedge_won=False)
+    assert policy.delay("answer") is None
+    policy.record("answer", 300, hedged=False, hedge_won=False)
+    assert policy.delay("answer") == pytest.approx(0.3)
+
+def test_hedging_stops_at_max_rate():
+    policy = HedgePolicy(min_samples=1, max_rate=0.5)
+    policy.record("answer", 100, hedged=True, hedge_won=True)
+    assert policy.delay("answer") is None
+    for _ in range(2):
+        policy.record("answer", 100, hedged=False, hedge_won=False)
+    assert policy.delay("answer") is not None  # 1 hedged in 3 calls
+
+def test_deadline_counts_expiry_per_stage():
+    policy = HedgePolicy()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(with_deadline("handoff", asyncio.sleep(1), 0.01, policy))
+    assert policy.metrics()["handoff"]["deadline_exceeded"] == 1
+
+def test_race_returns_first_success_and_cancels_the_loser():
+    delays = iter([0.2, 0.01])
+    started = []
+
+    async def call():
+        delay = next(delays)
+        task = asyncio.current_task()
+        started.append(task)
+        await asyncio.sleep(delay)
+        return delay
+
+    result, hedged, hedge_won = asyncio.run(race(call, 0.02))
+    assert (result, hedged, hedge_won) == (0.01, True, True)
+    assert started[0].cancelled()
+
+def test_race_without_delay_never_hedges():
+    calls = []
+
+    async def call():
+        calls.append(None)
+        return "ok"
+
+    assert asyncio.run(race(call, None)) == ("ok", False, False)
+    assert len(calls) == 1
+
+def test_race_survives_one_failed_copy_and_raises_when_all_fail():
+    outcomes = iter([RuntimeError("primary failed"), "hedge"])
+
+    async def flaky():
+        outcome = next(outcomes)
+        await asyncio.sleep(0.02)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(race(flaky, 0.01))[0] == "hedge"
+
+    async def broken():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(race(broken, 0.01))
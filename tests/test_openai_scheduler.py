@@ -0,0 +1,142 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from app.services.openai_scheduler import BACKGROUND, BULK, INTERACTIVE, OpenAIScheduler, TokenBucket
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+def api_error(cls, status: int, code: str = None):
+    body = {"code": code} if code else None  # The SDK passes the "error" object as the body
+    return cls("error", response=httpx.Response(status, request=REQUEST), body=body)
+
+def test_token_bucket_leaves_floor_untouched():
+    bucket = TokenBucket(60)  # One per second
+    bucket.take(30)
+    assert bucket.wait_time(20, 0, bucket.updated) == 0
+    assert bucket.wait_time(20, 20, bucket.updated) == pytest.approx(10)
+    bucket.take(30)
+    assert bucket.wait_time(1, 0, bucket.updated + 0.5) == pytest.approx(0.5)
+
+def test_token_bucket_oversized_request_waits_for_full_bucket_only():
+    bucket = TokenBucket(60)
+    bucket.take(30)
+    assert bucket.wait_time(1000, 0, bucket.updated) == pytest.approx(30)
+
+def test_waiters_are_granted_in_priority_order():
+    async def run():
+        scheduler = OpenAIScheduler(rpm=600, tpm=1_000_000, bulk_reserve=0)
+        scheduler.requests.level = 0  # Next grant in 0.1 s, once all three are queued
+        order = []
+
+        async def call(name, priority):
+            await scheduler.acquire(priority, 1)
+            order.append(name)
+            scheduler.requests.level = scheduler.requests.capacity  # Let the rest through at once
+
+        tasks = [asyncio.create_task(call("bulk", BULK)), asyncio.create_task(call("background", BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("interactive", INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "background", "bulk"]
+
+def test_bulk_calls_leave_the_reserve_to_interactive_calls():
+    async def run():
+        scheduler = OpenAIScheduler(rpm=600, tpm=1000, bulk_reserve=0.5)
+        scheduler.tokens.level = 400
+        bulk = asyncio.create_task(scheduler.acquire(BULK, 100))
+        await asyncio.sleep(0.01)
+        assert not bulk.done()  # 400 - 100 would dip into the 500 token reserve
+        await asyncio.wait_for(scheduler.acquire(INTERACTIVE, 100), 0.1)
+        bulk.cancel()
+        await asyncio.gather(bulk, return_exceptions=True)
+        return scheduler.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics["granted"] == 1
+    assert metrics["waiting"]["bulk"] == 0
+
+def test_rate_limit_pauses_dispatch_and_retries():
+    async def run():
+        scheduler = OpenAIScheduler(retry_base=0.01, retry_max=0.01)
+        attempts = []
+
+        async def call():
+            attempts.append(len(attempts))
+            if len(attempts) == 1:
+                raise api_error(openai.RateLimitError, 429)
+            return "ok"
+
+        result = await scheduler.run(call)
+        return result, attempts, scheduler.stats
+
+    result, attempts, stats = asyncio.run(run())
+    assert result == "ok"
+    assert len(attempts) == 2
+    assert stats["rate_limited"] == 1 and stats["retries"] == 1
+
+@pytest.mark.parametrize("error", [
+    openai.APIConnectionError(request=REQUEST),
+    openai.APITimeoutError(request=REQUEST),
+    api_error(openai.InternalServerError, 502),
+])
+def test_transient_errors_are_retried_without_pausing_others(error):
+    async def run():
+        scheduler = OpenAIScheduler(retry_base=0.01, retry_max=0.01)
+        attempts = []
+
+        async def call():
+            attempts.append(None)
+            if len(attempts) == 1:
+                raise error
+            return "ok"
+
+        return await scheduler.run(call), scheduler
+
+    result, scheduler = asyncio.run(run())
+    assert result == "ok"
+    assert scheduler.stats["transient_errors"] == 1
+    assert scheduler.metrics()["paused_s"] == 0
+
+def test_retries_stop_after_max_retries():
+    async def run():
+        scheduler = OpenAIScheduler(max_retries=2, retry_base=0.001, retry_max=0.001)
+
+        async def call():
+            raise openai.APIConnectionError(request=REQUEST)
+
+        with pytest.raises(openai.APIConnectionError):
+            await scheduler.run(call)
+        return scheduler.stats
+
+    stats = asyncio.run(run())
+    assert stats["retries"] == 2 and stats["failed"] == 1
+
+def test_quota_errors_and_bad_requests_are_not_retried():
+    async def run(error):
+        scheduler = OpenAIScheduler(retry_base=0.001)
+
+        async def call():
+            raise error
+
+        with pytest.raises(type(error)):
+            await scheduler.run(call)
+        return scheduler.stats["retries"]
+
+    assert asyncio.run(run(api_error(openai.RateLimitError, 429, "insufficient_quota"))) == 0
+    assert asyncio.run(run(api_error(openai.BadRequestError, 400))) == 0
+
+def test_blocking_calls_are_retried_too():
+    scheduler = OpenAIScheduler(retry_base=0.001, retry_max=0.001)
+    attempts = []
+
+    def call():
+        attempts.append(None)
+        if len(attempts) < 3:
+            raise api_error(openai.InternalServerError, 503)
+        return "ok"
+
+    assert scheduler.run_blocking(call, BULK) == "ok"
+    assert len(attempts) == 3
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from app.services import token_verifier
+from app.services.token_verifier import JWKS_MAX_FETCHES, TokenVerifier
+
+SECRET = "test-secret-at-least-thirty-two-bytes"
+OTHER_SECRET = "other-secret-at-least-thirty-two-bytes"
+
+def hs256(secret: str = SECRET, **claims) -> str:
+    payload = {"sub": "user-1", "email": "user@example.com", "aud": "authenticated", "exp": int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode({key: value for key, value in payload.items() if value is not None}, secret, algorithm="HS256")
+
+def rs256(private_key, kid: str) -> str:
+    payload = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 60}
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+def new_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+class FakeJWKS:
+    """Stands in for PyJWKClient; serves the public halves of `keys` by kid."""
+
+    def __init__(self):
+        self.keys = {}
+        self.fetches = 0
+
+    def get_signing_key_from_jwt(self, token: str):
+        self.fetches += 1
+        kid = jwt.get_unverified_header(token)["kid"]
+        if kid not in self.keys:
+            raise jwt.PyJWKClientError(f"Unable to find a signing key that matches: {kid}")
+        return jwt.PyJWK.from_dict({**jwt.algorithms.RSAAlgorithm.to_jwk(self.keys[kid].public_key(), as_dict=True),
+                                    "kid": kid, "alg": "RS256"})
+
+def jwks_verifier(monkeypatch, now: float = 0.0):
+    """A JWKS-only verifier whose clock reads `now`, as on a host that has just booted."""
+    monkeypatch.setattr(token_verifier.time, "monotonic", lambda: now)
+    verifier = TokenVerifier(secret="", jwks_url="https://project.supabase.co/auth/v1/.well-known/jwks.json")
+    verifier._jwks = FakeJWKS()
+    return verifier
+
+def verify(verifier: TokenVerifier, token: str) -> dict:
+    return asyncio.run(verifier.verify(token))
+
+def test_valid_hs256_token():
+    claims = verify(TokenVerifier(secret=SECRET, jwks_url=""), hs256())
+    assert claims["sub"] == "user-1"
+
+@pytest.mark.parametrize("token", [
+    hs256(exp=int(time.time()) - 3600),
+    hs256(secret=OTHER_SECRET),
+    hs256(aud="anon"),
+    hs256(sub=None),
+    "not-a-jwt",
+], ids=["expired", "wrong-signature", "wrong-audience", "no-subject", "malformed"])
+def test_invalid_tokens_are_rejected(token):
+    verifier = TokenVerifier(secret=SECRET, jwks_url="")
+    with pytest.raises(jwt.PyJWTError):
+        verify(verifier, token)
+    assert verifier.stats["rejected"] == 1
+
+def test_first_jwks_fetch_is_allowed_right_after_boot(monkeypatch):
+    verifier = jwks_verifier(monkeypatch, now=5.0)
+    verifier._jwks.keys["k1"] = new_key()
+    assert verify(verifier, rs256(verifier._jwks.keys["k1"], "k1"))["sub"] == "user-1"
+    verify(verifier, rs256(verifier._jwks.keys["k1"], "k1"))
+    assert verifier._jwks.fetches == 1
+
+def test_rotated_key_is_fetched_within_the_refresh_interval(monkeypatch):
+    verifier = jwks_verifier(monkeypatch)
+    verifier._jwks.keys["k1"] = new_key()
+    verify(verifier, rs256(verifier._jwks.keys["k1"], "k1"))
+    verifier._jwks.keys["k2"] = new_key()
+    assert verify(verifier, rs256(verifier._jwks.keys["k2"], "k2"))["sub"] == "user-1"
+    assert verifier._jwks.fetches == 2
+
+def test_unknown_kid_is_refetched_once_per_interval(monkeypatch):
+    verifier = jwks_verifier(monkeypatch)
+    forged = rs256(new_key(), "unknown")
+    for _ in range(3):
+        with pytest.raises(jwt.PyJWTError):
+            verify(verifier, forged)
+    assert verifier._jwks.fetches == 1
+    monkeypatch.setattr(token_verifier.time, "monotonic", lambda: token_verifier.JWKS_REFRESH_INTERVAL + 1.0)
+    with pytest.raises(jwt.PyJWTError):
+        verify(verifier, forged)
+    assert verifier._jwks.fetches == 2
+
+def test_made_up_kids_cannot_force_unbounded_fetches(monkeypatch):
+    verifier = jwks_verifier(monkeypatch)
+    key = new_key()
+    for index in range(JWKS_MAX_FETCHES * 2):
+        with pytest.raises(jwt.PyJWTError):
+            verify(verifier, rs256(key, f"random-{index}"))
+    assert verifier._jwks.fetches == JWKS_MAX_FETCHES
+
+def auth_service_with(get_profile):
+    auth_service = pytest.importorskip("app.services.auth_service")
+    from app.services.profile_cache import ProfileCache
+
+    service = object.__new__(auth_service.AuthService)
+    service.token_verifier = TokenVerifier(secret=SECRET, jwks_url="")
+    service.profile_cache = ProfileCache()
+    service.get_profile = get_profile
+    return service
+
+def current_user_status(service, token: str) -> int:
+    from fastapi import HTTPException
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(service.get_current_user(token))
+    return rejected.value.status_code
+
+def test_role_comes_from_the_profile_not_the_token():
+    async def profile(user_id):
+        return {"user_id": user_id, "role": "volunteer"}
+
+    service = auth_service_with(profile)
+    user = asyncio.run(service.get_current_user(hs256(user_metadata={"role": "admin"})))
+    assert user == {"user_id": "user-1", "email": "user@example.com", "role": "volunteer"}
+    assert current_user_status(service, hs256(secret=OTHER_SECRET)) == 401
+
+def test_current_user_fails_closed_without_a_profile():
+    async def missing_profile(user_id):
+        raise LookupError("Profile not found")
+
+    async def database_down(user_id):
+        raise ConnectionError("database unavailable")
+
+    token = hs256(user_metadata={"role": "admin"})
+    assert current_user_status(auth_service_with(missing_profile), token) == 401
+    assert current_user_status(auth_service_with(database_down), token) == 503
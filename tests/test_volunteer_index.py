@@ -0,0 +1,35 @@
+import asyncio
+import numpy as np
+from app.services.volunteer_index import VolunteerIndex
+
+T1, T2 = "2026-01-01T00:00:00+00:00", "2026-01-01T00:00:30+00:00"
+
+def profile(user_id: str, standpoint, role="volunteer", location="Berlin", updated_at=T1) -> dict:
+    return {"user_id": user_id, "email": f"{user_id}@example.com", "role": role, "location": location,
+            "political_standpoint": None if standpoint is None else list(standpoint), "updated_at": updated_at}
+
+def test_top_k_filters_role_location_and_the_asker():
+    index = VolunteerIndex(dim=2, capacity=1)
+    index.upsert(profile("v1", [1, 0]))
+    index.upsert(profile("v2", [1, 1], location="Hamburg"))
+    index.upsert(profile("u1", [1, 0], role="user"))
+    assert [match["user_id"] for match in index.top_k([1, 0], 5)] == ["v1", "v2"]
+    assert [match["user_id"] for match in index.top_k([1, 0], 5, location="Hamburg")] == ["v2"]
+    assert [match["user_id"] for match in index.top_k([1, 0], 5, exclude="v1")] == ["v2"]
+    assert index.top_k([1, 0], 5)[0]["similarity"] == np.float32(1.0)
+
+def test_profile_without_standpoint_is_removed():
+    index = VolunteerIndex(dim=2)
+    index.upsert(profile("v1", [1, 0]))
+    assert index.upsert(profile("v1", None, updated_at=T2))
+    assert len(index) == 0
+
+def test_sync_picks_up_profiles_committed_behind_the_cursor(supabase):
+    supabase.tables["profiles"] = [profile("v1", [1, 0], updated_at=T2)]
+    index = VolunteerIndex(dim=2)
+    assert asyncio.run(index.sync(supabase)) == 1
+    # An update that started at T1 commits only now, behind the cursor at T2
+    supabase.tables["profiles"].append(profile("v2", [0, 1], updated_at=T1))
+    assert asyncio.run(index.sync(supabase)) == 1
+    assert asyncio.run(index.sync(supabase)) == 0
+    assert [match["user_id"] for match in index.top_k([0, 1], 1)] == ["v2"]